@@ -0,0 +1,79 @@
+"""Benchmark: cold-start loading of a synthetic cube list from cubes.json and from its
+binary snapshot (see utils.cube_snapshot).
+
+Run from the repository root:
+    python -m benchmarks.bench_cube_loading [--cubes C] [--cube-size N]
+
+Each load runs in a fresh interpreter, as it would at bot startup, and reports the load
+time, the peak memory traced during (a separate) load, and the process's peak resident size.
+"""
+
+import os
+import sys
+import json
+import argparse
+import tempfile
+import subprocess
+
+from models.cubelist import CubeList
+from utils.cube_snapshot import snapshot_path
+from utils.update_cube_cards import write_cube_list
+from benchmarks.generators import make_cube_list_json
+
+LOAD_SCRIPT = """
+import sys, json, time, resource, tracemalloc
+from models.cubelist import CubeList
+from utils.cube_snapshot import load_snapshot
+path, use_snapshot, trace = sys.argv[1], sys.argv[2] == "snapshot", sys.argv[3] == "trace"
+if trace:
+    tracemalloc.start()
+start = time.perf_counter()
+if use_snapshot:
+    cube_list = load_snapshot(path)
+else:
+    with open(path, 'rb') as cubes_file:
+        cube_list = CubeList.from_json(json.load(cubes_file))
+duration = time.perf_counter() - start
+peak = tracemalloc.get_traced_memory()[1] if trace else None
+assert cube_list is not None
+print(json.dumps({"seconds": duration, "peak_bytes": peak,
+                  "max_rss_kib": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss}))
+"""
+
+
+def load_in_fresh_process(cube_file_path: str, mode: str, trace: bool = False):
+    """Returns the measurements LOAD_SCRIPT prints for one load. Tracing memory slows
+    the load down a lot, so timed loads aren't traced."""
+    output = subprocess.run([sys.executable, "-c", LOAD_SCRIPT, cube_file_path, mode,
+                             "trace" if trace else "time"],
+                            check=True, capture_output=True, text=True,
+                            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    return json.loads(output.stdout)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cubes", type=int, default=50, help="number of synthetic cubes")
+    parser.add_argument("--cube-size", type=int, default=540, help="cards per cube")
+    parser.add_argument("--repeat", type=int, default=5, help="loads per path (best is shown)")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as directory:
+        cube_file_path = os.path.join(directory, "cubes.json")
+        cube_json = make_cube_list_json(args.cubes, args.cube_size,
+                                        card_pool=args.cubes * args.cube_size // 4)
+        write_cube_list(CubeList.from_json(cube_json), cube_file_path)
+        print(f"{args.cubes} cubes of {args.cube_size} cards: "
+              f"cubes.json {os.path.getsize(cube_file_path) / 1024:.0f} KiB, "
+              f"snapshot {os.path.getsize(snapshot_path(cube_file_path)) / 1024:.0f} KiB")
+        for mode in ("json", "snapshot"):
+            runs = [load_in_fresh_process(cube_file_path, mode) for _ in range(args.repeat)]
+            best = min(runs, key=lambda run: run["seconds"])
+            traced = load_in_fresh_process(cube_file_path, mode, trace=True)
+            print(f"    {mode:8} {best['seconds'] * 1000:8.2f} ms, "
+                  f"traced peak {traced['peak_bytes'] / 1024:8.0f} KiB, "
+                  f"max RSS {best['max_rss_kib'] / 1024:6.1f} MiB")
+
+
+if __name__ == "__main__":
+    main()
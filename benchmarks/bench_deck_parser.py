@@ -0,0 +1,98 @@
+"""Micro-benchmark: DeckList.parse against the original per-call-regex implementation.
+
+Run from the repository root:
+    python -m benchmarks.bench_deck_parser
+"""
+
+import io
+import re
+import json
+import timeit
+import datetime
+
+from draftdata import DeckList
+
+SAMPLE_LOG_PATH = "tests/sample_DraftLog.json"
+
+
+def legacy_parse(data: str):
+    """The DeckList.parse implementation this benchmark is measured against."""
+    deck = {"maindeck": [], "sideboard": [], "companion": "", "commander": ""}
+    card_regex = re.compile(r'1 ([^\(]+)')
+
+    def add_card_to_maindeck(card_name):
+        deck["maindeck"].append(card_name)
+
+    def add_card_to_sideboard(card_name):
+        if (card_name != deck["companion"]) and (card_name != deck["commander"]):
+            deck["sideboard"].append(card_name)
+
+    def add_card_as_companion(card_name):
+        deck["companion"] = card_name
+
+    def add_card_as_commander(card_name):
+        deck["commander"] = card_name
+
+    add_methods = {
+        0: add_card_to_maindeck,
+        1: add_card_to_sideboard,
+        2: add_card_as_companion,
+        3: add_card_as_commander
+    }
+
+    for line in [l.rstrip() for l in data.split('\n')]:
+        if line == "Deck":
+            i = 0
+        elif line == "Sideboard":
+            i = 1
+        elif line == "Companion":
+            i = 2
+        elif line == "Commander":
+            i = 3
+        elif line.startswith('1 '):
+            card_name = card_regex.match(line).group(1).rstrip().replace("////", "//").replace("///", "//")
+            if card_name not in ["Island", "Plains", "Swamp", "Mountain", "Forest"]:
+                add_methods[i](card_name)
+    return deck
+
+
+def load_export_strings(path: str = SAMPLE_LOG_PATH):
+    """Returns every player's exportString from a sample draft log."""
+    with open(path, 'r', encoding="utf-8") as log_file:
+        return [user["exportString"] for user in json.load(log_file)["users"].values()]
+
+
+def main(number: int = 2000):
+    exports = load_export_strings()
+    now = datetime.datetime.now()
+    deck = DeckList("bench", now)
+
+    def run_legacy():
+        for export in exports:
+            legacy_parse(export)
+
+    def run_current():
+        for export in exports:
+            deck.parse(export)
+
+    def run_current_lines():
+        for export in exports:
+            deck.parse(io.StringIO(export))
+
+    for export in exports:
+        deck.parse(export)
+        expected = legacy_parse(export)
+        assert (deck.maindeck, deck.sideboard) == (expected["maindeck"], expected["sideboard"])
+
+    legacy = min(timeit.repeat(run_legacy, number=number, repeat=5))
+    current = min(timeit.repeat(run_current, number=number, repeat=5))
+    current_lines = min(timeit.repeat(run_current_lines, number=number, repeat=5))
+    decks = number * len(exports)
+    print(f"legacy:          {legacy / decks * 1e6:8.2f} us/deck")
+    print(f"current (str):   {current / decks * 1e6:8.2f} us/deck ({legacy / current:.2f}x)")
+    print(f"current (lines): {current_lines / decks * 1e6:8.2f} us/deck "
+          f"({legacy / current_lines:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+"""Benchmark: decode_attachment against running chardet over the whole file.
+
+Run from the repository root:
+    python -m benchmarks.bench_decoding
+"""
+
+import json
+import timeit
+
+import chardet
+
+from utils.decoding import decode_attachment
+
+SAMPLE_LOG_PATH = "tests/sample_DraftLog.json"
+
+
+def chardet_decode(data: bytes):
+    """How attachments were decoded before decode_attachment. (Errors are replaced here
+    only so the benchmark can run: chardet sometimes misdetects the sample log as ASCII.)"""
+    return data.decode(chardet.detect(data)["encoding"], errors="replace")
+
+
+def load_samples(path: str = SAMPLE_LOG_PATH):
+    """Returns (name, bytes) pairs: the sample draft log, one of its decks,
+    and the same deck in cp1252 (which has to go through chardet)."""
+    with open(path, 'rb') as log_file:
+        log_bytes = log_file.read()
+    deck = next(iter(json.loads(log_bytes)["users"].values()))["exportString"]
+    deck += "1 Lim-Dûl's Vault (ALL) 48\n"
+    return [("draft log", log_bytes, log_bytes.decode("utf-8")),
+            ("deck (utf-8)", deck.encode("utf-8"), deck),
+            ("deck (cp1252)", deck.encode("cp1252"), deck)]
+
+
+def main(number: int = 5):
+    for name, data, text in load_samples():
+        decoded = decode_attachment(data)
+        assert decoded.text == text
+        before = min(timeit.repeat(lambda: chardet_decode(data), number=number, repeat=3))
+        after = min(timeit.repeat(lambda: decode_attachment(data), number=number, repeat=3))
+        print(f"{name:14} {len(data):8} bytes  chardet: {before / number * 1000:9.3f} ms  "
+              f"decode_attachment ({decoded.path}): {after / number * 1000:9.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
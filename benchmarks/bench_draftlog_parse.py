@@ -0,0 +1,39 @@
+"""Benchmark: DraftLog's incremental parse against json.loads on synthetic 8-16 player logs.
+
+Run from the repository root:
+    python -m benchmarks.bench_draftlog_parse
+"""
+
+import time
+import tracemalloc
+
+from draftdata import DraftLog
+from benchmarks.generators import make_draft_log
+
+
+def measure(log: str, incremental: bool):
+    """Returns (seconds, peak traced bytes) for one parse."""
+    start = time.perf_counter()
+    DraftLog(log, "bench", incremental=incremental)
+    duration = time.perf_counter() - start
+    tracemalloc.start()
+    DraftLog(log, "bench", incremental=incremental)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return duration, peak
+
+
+def main():
+    for players in (8, 12, 16):
+        log = make_draft_log(players)
+        assert DraftLog(log, "bench").to_json() == \
+            DraftLog(log, "bench", incremental=False).to_json()
+        print(f"{players:2} players, {len(log) / 1024:7.0f} KiB:")
+        for incremental in (False, True):
+            duration, peak = min(measure(log, incremental) for _ in range(3))
+            mode = "incremental" if incremental else "json.loads "
+            print(f"    {mode} {duration * 1000:8.2f} ms, peak {peak / 1024:8.0f} KiB")
+
+
+if __name__ == "__main__":
+    main()
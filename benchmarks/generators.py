@@ -0,0 +1,77 @@
+"""Synthetic cubes, decks and draft logs for the benchmarks."""
+
+import json
+import uuid
+import random
+
+PICKS_PER_PLAYER = 45
+PACK_SIZE = 15
+DECK_SIZE = 40
+
+
+def card_name(i: int):
+    return f"Synthetic Card {i}"
+
+
+def make_cube_list_json(cubes: int, cube_size: int, card_pool: int = None, seed: int = 0):
+    """Returns a cubes.json-shaped dict of `cubes` cubes, each with `cube_size` cards drawn
+    from a shared pool of `card_pool` names (by default, twice the cube size)."""
+    rng = random.Random(seed)
+    pool = [card_name(i) for i in range(card_pool or 2 * cube_size)]
+    return {f"Cube {i}": {"cards": rng.sample(pool, cube_size), "cube_cobra_id": f"cube{i}",
+                          "submission_info": {"spreadsheet_id": f"sheet{i}",
+                                              "maindeck": "Decks!A1",
+                                              "sideboard": "Sideboards!A1",
+                                              "draftlog": "Drafts!A1"}}
+            for i in range(cubes)}
+
+
+def make_deck(cards, sideboard_size: int = 5):
+    """Returns an Arena-style deck export of the given card names, with a few basics."""
+    maindeck, sideboard = cards[sideboard_size:], cards[:sideboard_size]
+    return "Deck\n" + "".join(f"1 {name} (M20) 178\n" for name in maindeck) + \
+        "17 Island (M20) 264\n\nSideboard\n" + \
+        "".join(f"1 {name} (M20) 178\n" for name in sideboard)
+
+
+def make_card(name: str):
+    """A carddata entry shaped like the ones draft logs carry (including the bulky parts)."""
+    card_id = str(uuid.uuid4())
+    languages = ["it", "fr", "pt", "ru", "es", "ja", "ko", "zht", "de", "zhs", "en"]
+    return card_id, {
+        "id": card_id, "oracle_id": str(uuid.uuid4()), "arena_id": random.randint(1, 99999),
+        "name": name, "mana_cost": "{1}{G}", "set": "m20", "collector_number": "178",
+        "rarity": "common", "type": "Creature", "subtypes": ["Elemental", "Druid"],
+        "rating": 3, "in_booster": True,
+        "printed_names": {language: f"{name} ({language})" for language in languages},
+        "image_uris": {language: f"https://example.com/cards/{language}/{card_id}.jpg"
+                       for language in languages},
+        "cmc": 2, "colors": ["G"],
+    }
+
+
+def make_draft_log(players: int, seed: int = 0):
+    """Returns a synthetic draft log (as a string) for the given number of players."""
+    random.seed(seed)
+    carddata = dict(make_card(card_name(i)) for i in range(players * PICKS_PER_PLAYER))
+    card_ids = list(carddata)
+    users = {}
+    for seat in range(players):
+        picks = card_ids[seat * PICKS_PER_PLAYER:(seat + 1) * PICKS_PER_PLAYER]
+        user_id = str(uuid.uuid4())
+        export = "Deck\n" + "".join(f"1 {carddata[key]['name']} (M20) 178\n" for key in picks)
+        users[user_id] = {
+            "userName": f"player{seat}", "userID": user_id,
+            "picks": [{"pick": [0], "burn": [], "booster": random.sample(card_ids, PACK_SIZE)}
+                      for _ in picks],
+            "cards": picks,
+            "decklist": {"main": picks[:23], "side": picks[23:], "lands": {},
+                         "timestamp": 0, "hashes": {}},
+            "exportString": export,
+        }
+    return json.dumps({
+        "version": "2.0", "type": "Draft", "users": users, "sessionID": "bench",
+        "time": 1645818379000, "boosters": [random.sample(card_ids, PACK_SIZE)
+                                            for _ in range(players * 3)],
+        "carddata": carddata, "delayed": False,
+    })
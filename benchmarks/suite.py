@@ -0,0 +1,158 @@
+"""Benchmark suite: parsing, matching and saving on synthetic data, with results saved as JSON.
+
+Run from the repository root:
+    python -m benchmarks.suite [--cubes C] [--cube-size N] [--players P]
+                               [--output PATH] [--compare PREVIOUS.json]
+
+Each benchmark reports seconds per operation, operations (and, where it makes sense,
+cards) per second, and the peak memory traced by tracemalloc during one operation.
+Results go to benchmarks/results/<time>.json by default; pass --compare with an
+earlier results file to print the speed change for each benchmark.
+"""
+
+import os
+import sys
+import json
+import timeit
+import argparse
+import datetime
+import platform
+import tracemalloc
+from contextlib import contextmanager
+
+from draftdata import DeckList, DraftLog
+from models.cubelist import CubeList
+from save_to_google_sheet import GoogleDraftDataSaver
+from benchmarks.generators import (make_cube_list_json, make_deck, make_draft_log, card_name,
+                                   DECK_SIZE)
+
+RESULTS_DIRECTORY = os.path.join(os.path.dirname(__file__), "results")
+
+
+class FakeSheetsService:
+    """Stands in for the Sheets API client: every append succeeds without any I/O."""
+    def __init__(self):
+        self.appended_rows = 0
+
+    def spreadsheets(self):
+        return self
+
+    def values(self):
+        return self
+
+    def append(self, body, **_kwargs):
+        self.appended_rows += len(body["values"])
+        return self
+
+    def execute(self):
+        return {}
+
+
+class FakeSheetsClient:
+    """Stands in for a SheetsClient: one FakeSheetsService, and no rate limit."""
+    def __init__(self):
+        self.service = FakeSheetsService()
+        self.limiter = self
+
+    def acquire(self, _count: int = 1):
+        return 0.0
+
+    @contextmanager
+    def session(self):
+        yield self.service
+
+
+def mocked_google_saver():
+    """A GoogleDraftDataSaver that writes to a FakeSheetsService instead of logging in."""
+    return GoogleDraftDataSaver(FakeSheetsClient())
+
+
+def measure(operation, repeat: int = 5, min_time: float = 0.2):
+    """Times operation(), returning (best seconds per call, peak traced bytes of one call)."""
+    number = 1
+    while timeit.timeit(operation, number=number) < min_time / repeat and number < 1 << 20:
+        number *= 2
+    seconds = min(timeit.repeat(operation, number=number, repeat=repeat)) / number
+    tracemalloc.start()
+    operation()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return seconds, peak
+
+
+def run(cubes: int = 20, cube_size: int = 540, players: int = 8):
+    """Runs every benchmark. Returns {name: result dict}."""
+    now = datetime.datetime(2022, 2, 26, 12, 0)
+    cube_json = make_cube_list_json(cubes, cube_size)
+    cube_list = CubeList.from_json(cube_json)
+    first_cube = cube_list["Cube 0"]
+    deck_cards = cube_json["Cube 0"]["cards"][:DECK_SIZE]
+    deck_text = make_deck(deck_cards)
+    deck = DeckList("bench", now, data_stream=deck_text)
+    log = make_draft_log(players)
+    draft_log = DraftLog(log, "bench")
+    log_cards = len(draft_log.card_ids())
+    saver = mocked_google_saver()
+
+    benchmarks = {
+        # name: (operation, cards handled per operation)
+        "DeckList.parse": (lambda: DeckList("bench", now, data_stream=deck_text), DECK_SIZE),
+        "DraftLog.parse (incremental)": (lambda: DraftLog(log, "bench"), log_cards),
+        "DraftLog.parse (json.loads)": (lambda: DraftLog(log, "bench", incremental=False),
+                                        log_cards),
+        "CubeList.get_matches": (lambda: cube_list.get_matches(deck_cards), DECK_SIZE),
+        "CubeList.get_matches (no match)": (
+            lambda: cube_list.get_matches(deck_cards + [card_name(10 ** 6)]), DECK_SIZE + 1),
+        "CubeList.from_json": (lambda: CubeList.from_json(cube_json), cubes * cube_size),
+        "DeckList.save_to_spreadsheet (mocked)": (
+            lambda: deck.save_to_spreadsheet(saver, first_cube), DECK_SIZE),
+        "DraftLog.save_to_spreadsheet (mocked)": (
+            lambda: draft_log.save_to_spreadsheet(saver, first_cube), log_cards),
+    }
+    results = {}
+    for name, (operation, cards) in benchmarks.items():
+        seconds, peak = measure(operation)
+        results[name] = {"seconds_per_op": seconds, "ops_per_second": 1 / seconds,
+                         "cards_per_second": cards / seconds, "peak_bytes": peak}
+        print(f"{name:40} {seconds * 1e6:12.1f} us/op {1 / seconds:12.1f} ops/s "
+              f"{cards / seconds:14.0f} cards/s  peak {peak / 1024:9.1f} KiB")
+    return results
+
+
+def compare(results: dict, previous: dict):
+    """Prints how much faster (>1) or slower (<1) each benchmark is than in `previous`."""
+    for name, result in results.items():
+        before = previous.get("results", {}).get(name)
+        if before:
+            print(f"{name:40} {before['seconds_per_op'] / result['seconds_per_op']:6.2f}x")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cubes", type=int, default=20, help="number of synthetic cubes")
+    parser.add_argument("--cube-size", type=int, default=540, help="cards per cube")
+    parser.add_argument("--players", type=int, default=8, help="players per draft log")
+    parser.add_argument("--output", help="where to save the results (JSON)")
+    parser.add_argument("--compare", help="an earlier results file to compare against")
+    args = parser.parse_args(argv)
+
+    results = run(args.cubes, args.cube_size, args.players)
+    finished = datetime.datetime.now()
+    report = {"time": finished.isoformat(timespec="seconds"),
+              "python": sys.version.split()[0], "platform": platform.platform(),
+              "parameters": {"cubes": args.cubes, "cube_size": args.cube_size,
+                             "players": args.players},
+              "results": results}
+    output = args.output or os.path.join(RESULTS_DIRECTORY,
+                                         f"{finished:%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as output_file:
+        json.dump(report, output_file, indent=2)
+    print(f"Saved results to {output}.")
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as previous_file:
+            compare(results, json.load(previous_file))
+
+
+if __name__ == "__main__":
+    main()
@@ -4,22 +4,37 @@ Google spreadsheet."""
 
 import os
 import re
-import json
-from typing import Sequence
+import asyncio
+import inspect
+import functools
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Dict, Sequence
+from collections import Counter
 from datetime import datetime
 
-import chardet
 from dotenv import load_dotenv
 import discord
 
-from models.cubelist import CubeList
+from utils.cube_reloader import CubeListReloader
+from utils.decoding import decode_attachment
 from save_to_google_sheet import GoogleDraftDataSaver
+from sheets_client import SheetsClient, REQUESTS_PER_MINUTE
+from sheet_write_queue import SheetWriteQueue
+from save_to_sqlite import SQLiteDraftDataSaver, MirroredDraftDataSaver, CARD_STATISTICS
+from utils.card_stats import format_card_statistics
+from metrics import Metrics, serve_metrics, log_metrics
+from submission_cache import SubmissionCache, content_key, raw_key
+from submission_scheduler import SubmissionScheduler, Admission, QUEUED, COALESCED, SHED
+from disambiguation_store import (PendingSubmission, MemoryDisambiguationStore,
+                                  SQLiteDisambiguationStore, reacted_cube)
 from draftdata import DraftData, DeckList, DraftDataParseError
+from models.cubelist import CubeList, CubeMatchScore
 
 CUBE_LIST = None
+cube_reloader = CubeListReloader("config/cubes.json")
 try:
-    with open("config/cubes.json", 'r') as cubes_file:
-        CUBE_LIST = CubeList.from_json(json.load(cubes_file))
+    CUBE_LIST, _ = cube_reloader.reload()
 except FileNotFoundError as ex:
     print("Couldn't find cube list.")
     quit()
@@ -27,29 +42,180 @@ except FileNotFoundError as ex:
 load_dotenv()
 DISCORD_TOKEN = os.getenv('DISCORD_TOKEN')
 CHANNEL = os.getenv('CHANNEL')
+# Set DISAMBIGUATION_DB to a file path to keep pending disambiguations across restarts.
+DISAMBIGUATION_DB = os.getenv('DISAMBIGUATION_DB')
+DISAMBIGUATION_TTL = float(os.getenv('DISAMBIGUATION_TTL', 24 * 60 * 60))
+DISAMBIGUATION_MAX_SIZE = int(os.getenv('DISAMBIGUATION_MAX_SIZE', 1000))
+EXPIRY_CHECK_INTERVAL = 60
+# Set ANALYTICS_DB to a file path to record submissions in a local SQLite database. The
+# Google Sheets then become an asynchronous mirror, unless MIRROR_TO_SHEETS is "false".
+ANALYTICS_DB = os.getenv('ANALYTICS_DB')
+MIRROR_TO_SHEETS = os.getenv('MIRROR_TO_SHEETS', 'true').lower() != 'false'
+# How often to check config/cubes.json for changes, in seconds (0 to only reload on command).
+CUBE_RELOAD_INTERVAL = float(os.getenv('CUBE_RELOAD_INTERVAL', 60))
+# Where to remember submissions that have already been recorded, so reposts are skipped.
+SUBMISSION_CACHE_DB = os.getenv('SUBMISSION_CACHE_DB', 'submission_cache.db')
+SUBMISSION_CACHE_MAX_SIZE = int(os.getenv('SUBMISSION_CACHE_MAX_SIZE', 10000))
+# Worker processes to parse draft log players in (0 parses them one at a time). The workers
+# are forked, so on platforms without fork (Windows) this is ignored with a warning.
+DRAFT_LOG_WORKERS = int(os.getenv('DRAFT_LOG_WORKERS', 0))
+# When no cube has every card, save to the best-fitting cube anyway if it has at least
+# MATCH_MIN_FRACTION of the cards, and MATCH_CONFIDENCE_MARGIN more of them than the next best.
+MATCH_MIN_FRACTION = float(os.getenv('MATCH_MIN_FRACTION', 0.9))
+MATCH_CONFIDENCE_MARGIN = float(os.getenv('MATCH_CONFIDENCE_MARGIN', 0.1))
+# Reactions for picking a cube: keycaps 1-10, then the letters A-Z.
+DISAMBIGUATION_EMOJIS = ["1️⃣", "2️⃣", "3️⃣", "4️⃣", "5️⃣", "6️⃣", "7️⃣", "8️⃣", "9️⃣", "🔟"] + \
+    [chr(ord("🇦") + i) for i in range(26)]
+# Stage timings, queue depths and counts: set METRICS_PORT to serve them in the Prometheus
+# text format on localhost, and/or METRICS_LOG_INTERVAL (seconds) to print them periodically.
+METRICS_PORT = int(os.getenv('METRICS_PORT', 0))
+METRICS_LOG_INTERVAL = float(os.getenv('METRICS_LOG_INTERVAL', 0))
+# How many Sheets API connections writes can use at once, and the quota to keep them under.
+SHEETS_POOL_SIZE = int(os.getenv('SHEETS_POOL_SIZE', 4))
+SHEETS_REQUESTS_PER_MINUTE = float(os.getenv('SHEETS_REQUESTS_PER_MINUTE', REQUESTS_PER_MINUTE))
+# How many submissions to handle at once, and how many may wait before new ones are turned
+# away. A repost of the same file within SUBMISSION_COALESCE_WINDOW seconds replaces the
+# user's waiting post of it.
+SUBMISSION_CONCURRENCY = int(os.getenv('SUBMISSION_CONCURRENCY', 2))
+SUBMISSION_BACKLOG = int(os.getenv('SUBMISSION_BACKLOG', 50))
+SUBMISSION_COALESCE_WINDOW = float(os.getenv('SUBMISSION_COALESCE_WINDOW', 30))
+RELOAD_COMMAND = "!reloadcubes"
+# "!topcards [statistic] <cube>" / "!bottomcards [statistic] <cube>"; needs ANALYTICS_DB.
+TOP_CARDS_COMMAND, BOTTOM_CARDS_COMMAND = "!topcards", "!bottomcards"
 
-service = GoogleDraftDataSaver()
-disambiguation_holding_tank = {}
+sheets_client = SheetsClient(pool_size=SHEETS_POOL_SIZE,
+                             requests_per_minute=SHEETS_REQUESTS_PER_MINUTE)
+service = GoogleDraftDataSaver(sheets_client)
+write_queue = SheetWriteQueue(service)
+analytics_store = None
+# Runs the analytics database's writes and queries off the event loop, one at a time.
+analytics_executor = ThreadPoolExecutor(1, thread_name_prefix="analytics")
+saver = write_queue
+if ANALYTICS_DB:
+    analytics_store = SQLiteDraftDataSaver(ANALYTICS_DB, CUBE_LIST)
+    saver = MirroredDraftDataSaver(analytics_store, *([write_queue] if MIRROR_TO_SHEETS else []),
+                                   executor=analytics_executor)
+if DISAMBIGUATION_DB:
+    pending_submissions = SQLiteDisambiguationStore(DISAMBIGUATION_DB, DISAMBIGUATION_MAX_SIZE,
+                                                    DISAMBIGUATION_TTL)
+else:
+    pending_submissions = MemoryDisambiguationStore(DISAMBIGUATION_MAX_SIZE, DISAMBIGUATION_TTL)
+# Forked, so the workers don't re-run this module's setup when they start. Every worker is
+# forked at startup (see the bottom of this module), before any other thread exists, so
+# none can inherit a lock that another thread holds.
+draft_log_pool = None
+if DRAFT_LOG_WORKERS > 0:
+    if "fork" in multiprocessing.get_all_start_methods():
+        draft_log_pool = ProcessPoolExecutor(DRAFT_LOG_WORKERS,
+                                             multiprocessing.get_context("fork"))
+    else:
+        print("DRAFT_LOG_WORKERS is set, but this platform can't fork worker processes; "
+              "parsing draft log players one at a time.")
+recorded_submissions = SubmissionCache(SUBMISSION_CACHE_DB, SUBMISSION_CACHE_MAX_SIZE)
+# A lambda, because handle_submission is defined below.
+submission_scheduler = SubmissionScheduler(
+    lambda msg: handle_submission(msg),  # pylint: disable=unnecessary-lambda
+    SUBMISSION_CONCURRENCY, SUBMISSION_BACKLOG, SUBMISSION_COALESCE_WINDOW)
+expiry_task = None
+watch_task = None
+reload_lock = asyncio.Lock()
+# How many reactions were dismissed from the raw payload alone vs. actually handled.
+reaction_counts = Counter()
+metrics = Metrics(enabled=METRICS_PORT > 0 or METRICS_LOG_INTERVAL > 0)
+metrics.gauge("write_queue_depth", lambda: write_queue.depth)
+metrics.gauge("submission_backlog", lambda: submission_scheduler.depth)
+metrics.gauge("submissions_active", lambda: submission_scheduler.active)
+metrics.gauge("pending_disambiguations", lambda: len(pending_submissions))
+metrics.gauge("reactions_short_circuited", lambda: reaction_counts["short_circuited"])
+metrics.gauge("reactions_handled", lambda: reaction_counts["handled"])
+metrics_tasks = []
 client = discord.Client()
 
 
 @client.event
 async def on_ready():
     """The function that handles the 'bot is connected' event."""
+    global expiry_task, watch_task  # pylint: disable=global-statement
+    write_queue.start()
+    sheets_client.start_refresh()
+    if expiry_task is None:
+        expiry_task = asyncio.ensure_future(expire_pending_submissions())
+    if watch_task is None and CUBE_RELOAD_INTERVAL > 0:
+        watch_task = asyncio.ensure_future(watch_cube_list())
+    if not metrics_tasks:
+        if METRICS_PORT > 0:
+            metrics_tasks.append(await serve_metrics(metrics, port=METRICS_PORT))
+        if METRICS_LOG_INTERVAL > 0:
+            metrics_tasks.append(asyncio.ensure_future(log_metrics(metrics,
+                                                                   METRICS_LOG_INTERVAL)))
     print(f'{client.user} has connected to Discord!')
 
 
+async def reload_cube_list():
+    """Rebuilds the cube list off the event loop, then swaps it in.
+    Returns the ReloadStats for the reload."""
+    global CUBE_LIST  # pylint: disable=global-statement
+    async with reload_lock:
+        cube_list, stats = await asyncio.get_event_loop().run_in_executor(
+            None, cube_reloader.reload)
+        CUBE_LIST = cube_list
+        if analytics_store is not None:
+            analytics_store.set_cube_list(cube_list)
+    print(stats)
+    return stats
+
+
+async def watch_cube_list():
+    """Reloads the cube list whenever config/cubes.json changes."""
+    while True:
+        await asyncio.sleep(CUBE_RELOAD_INTERVAL)
+        if cube_reloader.has_changed():
+            try:
+                await reload_cube_list()
+            except (OSError, ValueError, KeyError) as ex:
+                print(f"Couldn't reload the cube list: {ex!r}")
+
+
+async def expire_pending_submissions():
+    """Periodically drops pending disambiguations that have timed out."""
+    while True:
+        await send_expiry_notices(pending_submissions.expire())
+        await asyncio.sleep(EXPIRY_CHECK_INTERVAL)
+
+
 @client.event
 async def on_message(msg):
     """The function that handles the 'a message was posted' event."""
     # main channel processing -- handles users posting decklists
     if msg.channel.type != discord.ChannelType.text:
         return
-    if msg.channel.name == CHANNEL and len(msg.attachments) > 0:
+    if msg.content.strip() == RELOAD_COMMAND and msg.author.guild_permissions.administrator:
         try:
+            stats = await reload_cube_list()
+            await msg.channel.send(str(stats))
+        except (OSError, ValueError, KeyError) as ex:
+            await msg.channel.send(f"Couldn't reload the cube list: {ex!r}")
+        return
+    command, _, arguments = msg.content.strip().partition(" ")
+    if command in (TOP_CARDS_COMMAND, BOTTOM_CARDS_COMMAND) and analytics_store is not None:
+        await send_card_statistics(msg.channel, arguments, command == BOTTOM_CARDS_COMMAND)
+        return
+    if msg.channel.name == CHANNEL and len(msg.attachments) > 0:
+        attachment = msg.attachments[0]
+        admission = submission_scheduler.submit(msg.author.id, msg,
+                                                key=(attachment.filename, attachment.size))
+        metrics.count(f"submission.{admission.status}")
+        if admission.status in (QUEUED, COALESCED, SHED):
+            await send_admission_notice(msg.author, admission)
+
+
+async def handle_submission(msg):
+    """Parses and saves a submission, once submission_scheduler gets to it."""
+    try:
+        with metrics.span("submission"):
             await parse_submission(msg)
-        except DraftDataParseError as ex:
-            await msg.channel.send(ex.message)
+    except DraftDataParseError as ex:
+        await msg.channel.send(ex.message)
 
 
 async def parse_submission(msg):
@@ -73,19 +239,90 @@ async def parse_submission(msg):
     if not attachment.size > 0:
         await send_empty_file_alert(msg.author, attachment.filename)
         return
-    file_of_message = await attachment.read()
-    stream = file_of_message.decode(chardet.detect(file_of_message)["encoding"])
-    data = DraftData.create(stream, msg.author.name, date, wins)
+    with metrics.span("submission.download"):
+        file_of_message = await attachment.read()
+    with metrics.span("submission.dedup"):
+        file_key = raw_key(msg.author.name, date, file_of_message, msg.content)
+        recorded_at = recorded_submissions.lookup_raw(file_key)
+    if recorded_at is not None:
+        metrics.count("submission.duplicate")
+        await send_duplicate_notice(msg.author, recorded_at)
+        return
+    with metrics.span("submission.decode"):
+        decoded = decode_attachment(file_of_message)
+    metrics.count(f"submission.decoded.{decoded.path}")
+    if os.getenv("DEBUG"):
+        print(f"Decoded {attachment.filename} as {decoded.encoding} ({decoded.path}).")
+    stream = decoded.text
+    # Parse off the event loop; draft log players are fanned out to draft_log_pool.
+    with metrics.span("submission.parse"):
+        data = await asyncio.get_event_loop().run_in_executor(
+            None, functools.partial(DraftData.create, stream, msg.author.name, date, wins,
+                                    executor=draft_log_pool))
     if (isinstance(data, DeckList) and data.commander):
         await send_commander_admonishment(msg.author)
         return
-    candidate_cubes = data.match_cubes(CUBE_LIST)
+    with metrics.span("submission.dedup"):
+        data_key = content_key(data)
+        recorded_at = recorded_submissions.lookup(data_key)
+    if recorded_at is not None:
+        metrics.count("submission.duplicate")
+        recorded_submissions.add(data_key, file_key)
+        await send_duplicate_notice(msg.author, recorded_at)
+        return
+    cube_list = CUBE_LIST  # Keep one snapshot, even if a reload swaps in a new list.
+    with metrics.span("submission.match"):
+        candidate_cubes = data.match_cubes(cube_list)
+    if candidate_cubes and data.substitutions:
+        await send_substitution_notice(msg.author, data.substitutions)
     if len(candidate_cubes) == 0:
-        await send_disambiguation_request(msg.author, CUBE_LIST.keys(), data)
+        if os.getenv("DEBUG"):
+            print(cube_list.get_exclusions(data.card_list()))
+        with metrics.span("submission.rank"):
+            scores = cube_list.rank_cubes_by_id(data.card_ids())
+            best_fit = CubeList.best_fit(scores, MATCH_CONFIDENCE_MARGIN, MATCH_MIN_FRACTION)
+        if best_fit is None:
+            metrics.count("submission.disambiguation")
+            await send_disambiguation_request(msg.author, [score.cube_name for score in scores],
+                                              data, scores, data_key, file_key)
+            return
+        metrics.count("submission.best_fit")
+        with metrics.span("submission.save"):
+            await wait_for_writes(data.save_to_spreadsheet(saver, cube_list[best_fit]))
+        recorded_submissions.add(data_key, file_key)
+        await send_best_fit_notice(msg.author, scores[0], data.suggestions)
     elif len(candidate_cubes) == 1:
-        data.save_to_spreadsheet(service, CUBE_LIST[candidate_cubes[0]])
+        metrics.count("submission.matched")
+        with metrics.span("submission.save"):
+            await wait_for_writes(data.save_to_spreadsheet(saver,
+                                                           cube_list[candidate_cubes[0]]))
+        recorded_submissions.add(data_key, file_key)
     else:  # len(candidate_cubes) > 1
-        await send_disambiguation_request(msg.author, candidate_cubes, data)
+        metrics.count("submission.disambiguation")
+        await send_disambiguation_request(msg.author, candidate_cubes, data,
+                                          data_key=data_key, file_key=file_key)
+
+
+async def send_card_statistics(channel, arguments: str, bottom: bool):
+    """Replies with the best or worst cards in a cube, from the running card statistics."""
+    statistic, _, cube_name = arguments.partition(" ")
+    if statistic not in CARD_STATISTICS:
+        statistic, cube_name = "maindeck_rate", arguments
+    cube_name = cube_name.strip()
+    if cube_name not in CUBE_LIST:
+        await channel.send(f"I don't know a cube called \"{cube_name}\". "
+                           f"Statistics: {', '.join(sorted(CARD_STATISTICS))}.")
+        return
+    rows = await asyncio.get_event_loop().run_in_executor(
+        analytics_executor, functools.partial(analytics_store.card_statistics, cube_name,
+                                              statistic, limit=10, bottom=bottom))
+    await channel.send(format_card_statistics(rows, statistic) or
+                       f"No statistics for {cube_name} yet.")
+
+
+async def wait_for_writes(writes):
+    """Waits for the acknowledgements of any writes that weren't completed immediately."""
+    await asyncio.gather(*[write for write in writes if inspect.isawaitable(write)])
 
 
 async def send_empty_file_alert(member: discord.User, attachment_name: str):
@@ -97,6 +334,48 @@ async def send_empty_file_alert(member: discord.User, attachment_name: str):
     await channel.send(content)
 
 
+async def send_duplicate_notice(member: discord.User, recorded_at: float):
+    """Tells a submitter that their submission was already recorded."""
+    content = "Your most recent submission was already recorded on " \
+              f"{datetime.fromtimestamp(recorded_at):%Y-%m-%d at %H:%M}, " \
+              "so I didn't save it again." \
+              "\n\n"\
+              "(If you feel you're receiving this message in error, please alert a server admin.)"
+    channel = await member.create_dm()
+    await channel.send(content)
+
+
+async def send_admission_notice(member: discord.User, admission: Admission):
+    """Tells a submitter that their submission is waiting its turn, replaced their
+    earlier one, or was turned away because too many are waiting."""
+    if admission.status == SHED:
+        content = "Too many submissions are waiting right now, so I couldn't take your " \
+                  "most recent one. Please post it again once your earlier ones are recorded, " \
+                  "or in a few minutes."
+    else:
+        content = f"Your most recent submission is queued behind {admission.position} " \
+                  "other(s), and will be recorded shortly."
+        if admission.status == COALESCED:
+            content += " It replaces your earlier post of " \
+                       f"{admission.replaced.attachments[0].filename}, which won't be recorded."
+    content += "\n\n" \
+               "(If you feel you're receiving this message in error, please alert a server admin.)"
+    channel = await member.create_dm()
+    await channel.send(content)
+
+
+async def send_substitution_notice(member: discord.User, substitutions: Dict[str, str]):
+    """Tells a submitter which card names in their submission were corrected."""
+    corrections = "\n".join(f"\t{submitted} → {name}"
+                            for submitted, name in sorted(substitutions.items()))
+    content = "Some card names in your most recent submission didn't match any cube, " \
+              f"so I read them as the closest cube cards:\n{corrections}" \
+              "\n\n"\
+              "(If you feel you're receiving this message in error, please alert a server admin.)"
+    channel = await member.create_dm()
+    await channel.send(content)
+
+
 async def send_commander_admonishment(member: discord.User):
     """We don't take kindly to your type around here."""
     content = "I can't help but notice that your most recent submission to the deck submission "\
@@ -109,37 +388,122 @@ async def send_commander_admonishment(member: discord.User):
     await channel.send(content)
 
 
+def format_suggestions(suggestions: Dict[str, str]):
+    """Lists similar cube cards for card names that aren't in any cube, if there are any."""
+    if not suggestions:
+        return ""
+    return "\nSome card names aren't in any cube. Did you mean:\n" + \
+        "\n".join(f"\t{submitted} → {name}?" for submitted, name in sorted(suggestions.items()))
+
+
+async def send_best_fit_notice(member: discord.User, score: CubeMatchScore,
+                               suggestions: Dict[str, str] = None):
+    """Tells a submitter which cube their submission was saved to, despite some cards
+    not being in it."""
+    content = f"Your most recent submission was saved to {score.cube_name}, which has " \
+              f"{score.matched} of its {score.total} cards. Not in the cube: " \
+              f"{', '.join(score.missing_cards)}." \
+              f"{format_suggestions(suggestions)}" \
+              "\n\n"\
+              "(If you feel you're receiving this message in error, please alert a server admin.)"
+    channel = await member.create_dm()
+    await channel.send(content)
+
+
 async def send_disambiguation_request(member: discord.User, candidate_cubes: Sequence[str],
-                                      data: DraftData):
-    """Sends a message to a user asking them to specify which cube their submission belongs to."""
+                                      data: DraftData, scores: Sequence[CubeMatchScore] = None,
+                                      data_key: str = None, file_key: str = None):
+    """Sends a message to a user asking them to specify which cube their submission belongs to.
+    With scores (from CubeList.rank_cubes), each cube also shows how many cards it has.
+    data_key and file_key are the submission's SubmissionCache keys, recorded once it's saved."""
     channel = await member.create_dm()
-    emojis = ["1️⃣", "2️⃣", "3️⃣", "4️⃣", "5️⃣"]
     header = "Couldn't determine the cube for your most recent submission. Please " \
              "react to this message with the emoji corresponding to the right cube: \n"
-    emoji_cube_pairs = zip(emojis[0:len(candidate_cubes)], candidate_cubes)
+    emoji_cube_pairs = zip(DISAMBIGUATION_EMOJIS, candidate_cubes)
     cube_reaction_map = {emoji: cubeName for emoji, cubeName in emoji_cube_pairs}
-    cube_reaction_map_strings = [f"\t{emoji}: {name}" for emoji, name in cube_reaction_map.items()]
-    content = header + "\n".join(cube_reaction_map_strings)
+    fractions = {score.cube_name: f" ({score.fraction:.0%} of cards)" for score in scores or []}
+    cube_reaction_map_strings = [f"\t{emoji}: {name}{fractions.get(name, '')}"
+                                 for emoji, name in cube_reaction_map.items()]
+    content = header + "\n".join(cube_reaction_map_strings) + format_suggestions(data.suggestions)
     message = await channel.send(content)
-    disambiguation_holding_tank[message.id] = {"cube_reaction_map": cube_reaction_map, "data": data}
+    evicted = pending_submissions.put(PendingSubmission(message.id, member.id,
+                                                        cube_reaction_map, data,
+                                                        content_key=data_key, raw_key=file_key))
+    await send_expiry_notices(evicted)
+
+
+async def send_save_failure_notice(user_id: int, cube_name: str):
+    """Tells a user that their submission couldn't be saved to the cube they picked."""
+    user = client.get_user(user_id)
+    try:
+        if user is None:
+            user = await client.fetch_user(user_id)
+        channel = await user.create_dm()
+        await channel.send(f"I couldn't save your submission to {cube_name} just now. "
+                           "To retry, remove your reaction to my message and add it again.")
+    except discord.HTTPException as ex:
+        print(f"Couldn't notify user {user_id} of a failed save: {ex}")
+
+
+async def send_expiry_notices(entries: Sequence[PendingSubmission]):
+    """Tells users that their pending submissions were dropped before they picked a cube."""
+    for entry in entries:
+        user = client.get_user(entry.user_id)
+        try:
+            if user is None:
+                user = await client.fetch_user(entry.user_id)
+            channel = await user.create_dm()
+            await channel.send(f"Your submission from {entry.data.timestamp} timed out "
+                               "before you picked a cube, so it wasn't recorded. "
+                               "Please submit it again.")
+        except discord.HTTPException as ex:
+            print(f"Couldn't notify user {entry.user_id} of an expired submission: {ex}")
 
 
 @client.event
 async def on_raw_reaction_add(payload):  # pylint: disable=unused-argument
     """handler for a user disambiguating a deck submission
     that could have been from multiple cubes"""
-    channel = client.get_channel(payload.channel_id)
-    msg = await channel.fetch_message(payload.message_id)
-    emoji = payload.emoji.name #This is the unicode codepoint of the emoji
-    if msg.channel.type == discord.ChannelType.private:
-        if msg.id in disambiguation_holding_tank:
-            disambiguation_data = disambiguation_holding_tank[msg.id]
-            cube_reaction_map = disambiguation_data["cube_reaction_map"]
-            if emoji in cube_reaction_map:
-                correct_cube = CUBE_LIST[cube_reaction_map[emoji]]
-                data = disambiguation_data["data"]
-                data.save_to_spreadsheet(service, correct_cube)
-                await msg.delete()
-                del disambiguation_holding_tank[msg.id]
-
-client.run(DISCORD_TOKEN)
+    # Everything up to the fetch only looks at the raw payload, so the bulk of reactions
+    # (anywhere in the server, or on messages that aren't pending) cost no API calls.
+    cube_name = reacted_cube(pending_submissions, payload, reaction_counts)
+    if cube_name is None:
+        return
+    if os.getenv("DEBUG"):
+        print(dict(reaction_counts))
+    with metrics.span("reaction.lookup"):
+        pending = pending_submissions.get(payload.message_id)
+    if pending is None:  # Another reaction got to it first.
+        return
+    correct_cube = CUBE_LIST.get(cube_name)
+    if correct_cube is None:  # The cube was removed by a reload since the request was sent.
+        print(f"Cube {cube_name} is no longer in the cube list.")
+        return
+    # Remove it before saving, so a second reaction can't save it twice.
+    pending_submissions.remove(payload.message_id)
+    try:
+        with metrics.span("reaction.save"):
+            await wait_for_writes(pending.data.save_to_spreadsheet(saver, correct_cube))
+    except Exception as ex:  # pylint: disable=broad-except
+        # Put it back, so reacting again retries the save.
+        print(f"Couldn't save submission {payload.message_id} to {cube_name}: {ex!r}")
+        await send_expiry_notices(pending_submissions.put(pending))
+        await send_save_failure_notice(pending.user_id, cube_name)
+        return
+    # Entries stored before the keys were kept only have their (corrected) data.
+    recorded_submissions.add(pending.content_key or content_key(pending.data), pending.raw_key)
+    with metrics.span("reaction.delete_request"):
+        channel = client.get_channel(payload.channel_id)
+        if channel is None:
+            channel = await client.fetch_channel(payload.channel_id)
+        msg = await channel.fetch_message(payload.message_id)
+        await msg.delete()
+
+if __name__ == "__main__":
+    if draft_log_pool is not None:
+        # A forking pool starts all its workers on the first task.
+        draft_log_pool.submit(int).result()
+    # Log into Google now, so a missing or unrefreshable token fails (or prompts) at startup
+    # rather than blocking the first write.
+    sheets_client.setup()
+    client.run(DISCORD_TOKEN)
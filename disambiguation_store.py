@@ -0,0 +1,196 @@
+"""Stores for submissions that are waiting on a user to pick their cube."""
+
+import json
+import time
+import sqlite3
+from collections import Counter, OrderedDict
+from typing import Dict, List, Optional
+
+from draftdata import DraftData
+
+
+class PendingSubmission:
+    """A submission waiting for its submitter to react with the right cube's emoji.
+    content_key and raw_key are its SubmissionCache keys, computed when it was parsed
+    (before match_cubes could correct its card names), so they're recorded as they'd
+    be looked up."""
+    def __init__(self, message_id: int, user_id: int, cube_reaction_map: Dict[str, str],
+                 data: DraftData, created_at: float = None, content_key: str = None,
+                 raw_key: str = None):
+        self.message_id = message_id
+        self.user_id = user_id
+        self.cube_reaction_map = cube_reaction_map
+        self.data = data
+        self.created_at = time.time() if created_at is None else created_at
+        self.content_key = content_key
+        self.raw_key = raw_key
+
+
+def reacted_cube(store: "DisambiguationStore", payload, counts: Counter) -> Optional[str]:
+    """Returns the name of the cube a raw reaction event picks, or None if the event can be
+    dismissed from its payload alone: it isn't in a DM (disambiguation requests are always
+    sent by DM), isn't on a pending request, or isn't one of that request's emojis.
+    Counts each event in `counts` as "short_circuited" or "handled"."""
+    cube_reaction_map = None
+    if payload.guild_id is None:
+        cube_reaction_map = store.get_reaction_map(payload.message_id)
+    if cube_reaction_map is None or payload.emoji.name not in cube_reaction_map:
+        counts["short_circuited"] += 1
+        return None
+    counts["handled"] += 1
+    return cube_reaction_map[payload.emoji.name]
+
+
+class DisambiguationStore:
+    """Holds PendingSubmissions by the ID of the DM asking the user to pick a cube.
+
+    Entries older than `ttl` seconds are removed by expire(), and once there are more
+    than `max_size` entries the least recently used ones are evicted. Both expire() and
+    put() return the entries they dropped, so the caller can tell those users."""
+    def __init__(self, max_size: int = 1000, ttl: float = 24 * 60 * 60):
+        self.max_size = max_size
+        self.ttl = ttl
+
+    #Abstract class method stubs
+    def put(self, entry: PendingSubmission) -> List[PendingSubmission]:
+        """Stores an entry, returning any entries evicted to make room for it."""
+        raise NotImplementedError
+    def get(self, message_id: int) -> Optional[PendingSubmission]:
+        """Returns the entry for a message, or None if there isn't one."""
+        raise NotImplementedError
+    def get_reaction_map(self, message_id: int) -> Optional[Dict[str, str]]:
+        """Returns just the emoji -> cube name map for a message, or None."""
+        raise NotImplementedError
+    def remove(self, message_id: int):
+        """Removes the entry for a message, if there is one."""
+        raise NotImplementedError
+    def expire(self, now: float = None) -> List[PendingSubmission]:
+        """Removes and returns every entry older than the TTL."""
+        raise NotImplementedError
+    def __len__(self):
+        raise NotImplementedError
+
+    def __contains__(self, message_id):
+        return self.get_reaction_map(message_id) is not None
+
+
+class MemoryDisambiguationStore(DisambiguationStore):
+    """An in-memory LRU DisambiguationStore. Entries are lost when the bot restarts."""
+    def __init__(self, max_size: int = 1000, ttl: float = 24 * 60 * 60):
+        super().__init__(max_size, ttl)
+        self.entries = OrderedDict()
+
+    def put(self, entry):
+        self.entries[entry.message_id] = entry
+        self.entries.move_to_end(entry.message_id)
+        evicted = []
+        while len(self.entries) > self.max_size:
+            evicted.append(self.entries.popitem(last=False)[1])
+        return evicted
+
+    def get(self, message_id):
+        entry = self.entries.get(message_id)
+        if entry is not None:
+            self.entries.move_to_end(message_id)
+        return entry
+
+    def get_reaction_map(self, message_id):
+        entry = self.entries.get(message_id)
+        return entry.cube_reaction_map if entry is not None else None
+
+    def remove(self, message_id):
+        self.entries.pop(message_id, None)
+
+    def expire(self, now=None):
+        cutoff = (time.time() if now is None else now) - self.ttl
+        expired = [entry for entry in self.entries.values() if entry.created_at < cutoff]
+        for entry in expired:
+            del self.entries[entry.message_id]
+        return expired
+
+    def __len__(self):
+        return len(self.entries)
+
+
+class SQLiteDisambiguationStore(DisambiguationStore):
+    """A DisambiguationStore backed by a local SQLite file, so pending submissions
+    survive restarts and aren't kept in memory. Submissions are stored as JSON
+    (see DraftData.to_json)."""
+    def __init__(self, path: str = "pending_submissions.db", max_size: int = 1000,
+                 ttl: float = 24 * 60 * 60):
+        super().__init__(max_size, ttl)
+        self.connection = sqlite3.connect(path)
+        with self.connection:
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS pending ("
+                "message_id INTEGER PRIMARY KEY, user_id INTEGER NOT NULL, "
+                "created_at REAL NOT NULL, last_used REAL NOT NULL, "
+                "cube_reaction_map TEXT NOT NULL, data TEXT NOT NULL, "
+                "content_key TEXT, raw_key TEXT)")
+            # Databases from before the keys were stored need the columns added.
+            columns = {row[1] for row in self.connection.execute("PRAGMA table_info(pending)")}
+            for column in ("content_key", "raw_key"):
+                if column not in columns:
+                    self.connection.execute(f"ALTER TABLE pending ADD COLUMN {column} TEXT")
+            self.connection.execute(
+                "CREATE INDEX IF NOT EXISTS pending_last_used ON pending (last_used)")
+            self.connection.execute(
+                "CREATE INDEX IF NOT EXISTS pending_created_at ON pending (created_at)")
+
+    @staticmethod
+    def _to_entry(row):
+        message_id, user_id, created_at, cube_reaction_map, data, content_key, raw_key = row
+        return PendingSubmission(message_id, user_id, json.loads(cube_reaction_map),
+                                 DraftData.from_json(json.loads(data)), created_at,
+                                 content_key, raw_key)
+
+    def _select(self, where: str, parameters=()):
+        return [self._to_entry(row) for row in self.connection.execute(
+            "SELECT message_id, user_id, created_at, cube_reaction_map, data, "
+            "content_key, raw_key "
+            f"FROM pending WHERE {where}", parameters)]
+
+    def put(self, entry):
+        with self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO pending (message_id, user_id, created_at, last_used, "
+                "cube_reaction_map, data, content_key, raw_key) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (entry.message_id, entry.user_id, entry.created_at, time.time(),
+                 json.dumps(entry.cube_reaction_map), json.dumps(entry.data.to_json()),
+                 entry.content_key, entry.raw_key))
+            overflow = len(self) - self.max_size
+            if overflow <= 0:
+                return []
+            where = "message_id IN (SELECT message_id FROM pending ORDER BY last_used LIMIT ?)"
+            evicted = self._select(where, (overflow,))
+            self.connection.execute(f"DELETE FROM pending WHERE {where}", (overflow,))
+        return evicted
+
+    def get(self, message_id):
+        entries = self._select("message_id = ?", (message_id,))
+        if not entries:
+            return None
+        with self.connection:
+            self.connection.execute("UPDATE pending SET last_used = ? WHERE message_id = ?",
+                                    (time.time(), message_id))
+        return entries[0]
+
+    def get_reaction_map(self, message_id):
+        row = self.connection.execute(
+            "SELECT cube_reaction_map FROM pending WHERE message_id = ?",
+            (message_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def remove(self, message_id):
+        with self.connection:
+            self.connection.execute("DELETE FROM pending WHERE message_id = ?", (message_id,))
+
+    def expire(self, now=None):
+        cutoff = (time.time() if now is None else now) - self.ttl
+        with self.connection:
+            expired = self._select("created_at < ?", (cutoff,))
+            self.connection.execute("DELETE FROM pending WHERE created_at < ?", (cutoff,))
+        return expired
+
+    def __len__(self):
+        return self.connection.execute("SELECT COUNT(*) FROM pending").fetchone()[0]
@@ -3,160 +3,265 @@
 import re
 import datetime
 import json
+from array import array
 from save_to_google_sheet import GoogleDraftDataSaver
-from models.cubelist import CubeList, Cube
+from models.carddictionary import CARD_DICTIONARY, CARD_ID_TYPECODE
+from models.cubelist import CubeList, Cube, BASIC_LANDS
+
+# Matches either a card line, "<quantity> <card name> (<set>) <collector number>" (the set
+# and number are optional), or a section header. Works per line or over a whole file.
+DECK_LINE_REGEX = re.compile(r'^(?:(\d+) ([^(\n]*[^(\s])|(Deck|Sideboard|Companion|Commander)[ \t\r]*$)',
+                             re.MULTILINE)
+# Split cards are written as "A // B" in cube lists, but some exports use three or four slashes.
+SPLIT_CARD_REGEX = re.compile(r'/{3,4}')
+
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M'
+
+JSON_DECODER = json.JSONDecoder()
+JSON_WHITESPACE_REGEX = re.compile(r'[ \t\n\r]*')
+
+MAINDECK, SIDEBOARD, COMPANION, COMMANDER = range(4)
+SECTION_HEADERS = {
+    "Deck": MAINDECK,
+    "Sideboard": SIDEBOARD,
+    "Companion": COMPANION,
+    "Commander": COMMANDER,
+}
 
 
 class DraftData:
     """A parsed file from the #txt channel - either a deck, or a draft log."""
     @staticmethod
-    def create(input_string, user, timestamp, wins=""):
+    def create(input_string, user, timestamp, wins="", executor=None):
         """Given an input string, looks at first character to see if it's a draft log or deck,
         then returns the proper implementer of DraftData
         Parameters
         ----------
         file : string
         contents of a file downloaded from discord dump channel
+        executor : concurrent.futures.Executor, optional
+        a pool to parse a draft log's players in (see DraftLog)
         """
         if input_string[0] in ["C", "D"]: #To account for companions
             return DeckList(user, timestamp, wins=wins, data_stream=input_string)
         elif input_string[0] == "{":
-            return DraftLog(input_string, user)
+            return DraftLog(input_string, user, executor=executor)
         else:
             raise DraftDataParseError(input_string[0])
 
     def __init__(self):
         self.timestamp = ""
+        # {submitted name: cube card name} for other spellings fixed by match_cubes.
+        self.substitutions = {}
+        # {submitted name: similar cube card name} for cards match_cubes couldn't place.
+        self.suggestions = {}
 
     def set_timestamp(self, timestamp: datetime):
         """Sets the timestamps for the draft data using a standard format."""
-        self.timestamp = timestamp.strftime('%Y-%m-%d %H:%M')
+        self.timestamp = timestamp.strftime(TIMESTAMP_FORMAT)
+
+    @staticmethod
+    def from_json(data: dict):
+        """Given the output of to_json, recreates the DeckList or DraftLog it came from."""
+        if data["type"] == "deck":
+            return DeckList.from_json(data)
+        elif data["type"] == "draftlog":
+            return DraftLog.from_json(data)
+        else:
+            raise ValueError(f"Unknown draft data type {data['type']}.")
 
     def match_cubes(self, cube_list: CubeList):
         """Given a list of known cubes, returns a list of cubes that contain
-        all of the cards in this DraftData."""
-        card_list = self.card_list()
-        return cube_list.get_matches(card_list)
+        all of the cards in this DraftData. If none do, card names that aren't in any
+        cube are corrected to the cube card they're another spelling of, where that gives
+        a match (see CubeList.get_near_matches); the corrections are applied to this
+        DraftData and recorded in self.substitutions. If there's still no match, similar
+        cube cards are recorded in self.suggestions, but not applied."""
+        matches, substitutions = cube_list.get_near_matches_by_id(self.card_ids())
+        if substitutions:
+            self.substitute_ids(substitutions)
+            self.substitutions = {CARD_DICTIONARY.name_for(submitted):
+                                  CARD_DICTIONARY.name_for(card_id)
+                                  for submitted, card_id in substitutions.items()}
+        if not matches:
+            self.suggestions = {CARD_DICTIONARY.name_for(submitted):
+                                CARD_DICTIONARY.name_for(card_id)
+                                for submitted, card_id
+                                in cube_list.get_suggestions_by_id(self.card_ids()).items()}
+        return matches
+
+    def card_list(self):
+        """Returns a list of all the card names present in the data for this object."""
+        return CARD_DICTIONARY.names_for(self.card_ids())
 
     #Abstract class method stubs -- don't change these
+    def substitute_ids(self, id_map: dict):
+        """Replaces card IDs using a {old ID: new ID} map."""
+        raise NotImplementedError
     def parse(self, data: str):
         """Given the contents of a submission file, reads the file into
         a discrete data object."""
         raise NotImplementedError
-    def card_list(self):
-        """Returns a list of all the card names present in the data for this object."""
+    def card_ids(self):
+        """Returns an array of the IDs (see CARD_DICTIONARY) of all the cards
+        present in the data for this object."""
+        raise NotImplementedError
+    def to_json(self):
+        """Returns a JSON-serializable dict of this object, using card names
+        (card IDs aren't stable between runs)."""
         raise NotImplementedError
     def save_to_spreadsheet(self, service: GoogleDraftDataSaver, cube: Cube):
         """Writes the contents of the DraftData to the appropriate sheet location
-        for a given Cube."""
+        for a given Cube. Returns a list of whatever service.write_to_sheet returned
+        for each write (awaitable acknowledgements, for a SheetWriteQueue)."""
         raise NotImplementedError
 
 class DeckList(DraftData):
-    """A parsed deck from a file submitted in the Discord channel."""
+    """A parsed deck from a file submitted in the Discord channel.
+    The maindeck and sideboard are stored as arrays of card IDs; the maindeck and
+    sideboard properties resolve them back to card names."""
     def __init__(self, user, timestamp, wins="", **deck_info):
         super().__init__()
 
         self.user = user
         self.set_timestamp(timestamp)
         self.wins = wins
-        self.maindeck = [] 
-        self.sideboard = [] 
-        self.companion = "" 
+        self.maindeck_ids = array(CARD_ID_TYPECODE)
+        self.sideboard_ids = array(CARD_ID_TYPECODE)
+        self.companion = ""
         self.commander = ""
-        
+
         data_stream = deck_info.get('data_stream', None)
         if data_stream:
             self.parse(data_stream)
         else:
-            self.maindeck = deck_info.get('maindeck',[])
-            self.sideboard = deck_info.get('sideboard',[])
+            if 'maindeck_ids' in deck_info:
+                self.maindeck_ids = array(CARD_ID_TYPECODE, deck_info['maindeck_ids'])
+            else:
+                self.maindeck = deck_info.get('maindeck',[])
+            if 'sideboard_ids' in deck_info:
+                self.sideboard_ids = array(CARD_ID_TYPECODE, deck_info['sideboard_ids'])
+            else:
+                self.sideboard = deck_info.get('sideboard',[])
             self.companion = deck_info.get('companion',"")
             self.commander = deck_info.get('commander',"")
-        
 
-    def parse(self, data: str):
-        """Given a deck as a string, returns a list of card names in the maindeck.
+    @property
+    def maindeck(self):
+        """The names of the cards in the maindeck."""
+        return CARD_DICTIONARY.names_for(self.maindeck_ids)
+
+    @maindeck.setter
+    def maindeck(self, card_list):
+        self.maindeck_ids = CARD_DICTIONARY.ids_for(card_list)
+
+    @property
+    def sideboard(self):
+        """The names of the cards in the sideboard."""
+        return CARD_DICTIONARY.names_for(self.sideboard_ids)
+
+    @sideboard.setter
+    def sideboard(self, card_list):
+        self.sideboard_ids = CARD_DICTIONARY.ids_for(card_list)
+
+    def parse(self, data):
+        """Given a deck, fills in the maindeck, sideboard, companion and commander.
         Parameters
         ----------
-        data : string
-        A whole deck file as a string.
+        data : string, or iterable of lines
+        A whole deck file as a string, or any iterable of its lines (e.g. an open file).
         """
+        parser = DeckParser()
+        if isinstance(data, str):
+            parser.feed_text(data)
+        else:
+            parser.feed_lines(data)
+        self.maindeck_ids, self.sideboard_ids, self.companion, self.commander = parser.result()
 
-        card_regex = re.compile(r'1 ([^\(]+)')
-
-        def add_card_to_maindeck(self, card_name):
-            self.maindeck.append(card_name)
-
-        def add_card_to_sideboard(self, card_name):
-            if (card_name != self.companion) and (card_name != self.commander):
-                self.sideboard.append(card_name)
-
-        def add_card_as_companion(self, card_name):
-            self.companion = card_name
-
-        def add_card_as_commander(self, card_name):
-            self.commander = card_name
-
-        add_methods = {
-            0: add_card_to_maindeck,
-            1: add_card_to_sideboard,
-            2: add_card_as_companion,
-            3: add_card_as_commander
-        }
-
-        for line in [l.rstrip() for l in data.split('\n')]:
-            if line == "Deck":
-                i = 0
-            elif line == "Sideboard":
-                i = 1
-            elif line == "Companion":
-                i = 2
-            elif line == "Commander":
-                i = 3
-            elif line.startswith('1 '):
-                card_name = card_regex.match(line).group(1).rstrip().replace("////","//").replace("///", "//")
-                # Should the basics be dropped?
-                if card_name not in ["Island", "Plains", "Swamp", "Mountain", "Forest"]:
-                    add_methods[i](self, card_name)
+    async def parse_async(self, stream, encoding: str = "utf-8"):
+        """Like parse, but reads lines (str or bytes) from an async iterable,
+        such as an aiohttp response's content stream."""
+        parser = DeckParser(encoding)
+        async for line in stream:
+            parser.feed(line)
+        self.maindeck_ids, self.sideboard_ids, self.companion, self.commander = parser.result()
 
-    def card_list(self):
-        """Returns a list of all the cards in the deck."""
-        cards_in_deck = self.maindeck + self.sideboard
+    def to_json(self):
+        return {"type": "deck", "user": self.user, "timestamp": self.timestamp,
+                "wins": self.wins, "maindeck": self.maindeck, "sideboard": self.sideboard,
+                "companion": self.companion, "commander": self.commander}
+
+    @classmethod
+    def from_json(cls, data: dict):
+        """Given the output of to_json, recreates the DeckList."""
+        timestamp = datetime.datetime.strptime(data["timestamp"], TIMESTAMP_FORMAT)
+        return cls(data["user"], timestamp, wins=data["wins"],
+                   maindeck=data["maindeck"], sideboard=data["sideboard"],
+                   companion=data["companion"], commander=data["commander"])
+
+    def card_ids(self):
+        """Returns an array of the IDs of all the cards in the deck."""
+        cards_in_deck = self.maindeck_ids + self.sideboard_ids
         if self.companion:
-            cards_in_deck.append(self.companion)
+            cards_in_deck.append(CARD_DICTIONARY.id_for(self.companion))
         if self.commander:
-            cards_in_deck.append(self.commander)
+            cards_in_deck.append(CARD_DICTIONARY.id_for(self.commander))
         return cards_in_deck
 
-    def save_to_spreadsheet(self, service: GoogleDraftDataSaver, cube: Cube):
-        # write the main deck
-        # maindeck
+    def maindeck_row(self):
+        """The row for the maindeck sheet."""
         # placeholders for colors
         # Leaving commanders out for now since no cube that we manage uses them
         deck_metadata = [self.user, self.wins, "", self.companion, self.timestamp]
-        cell_data = deck_metadata + self.maindeck
-        service.write_to_sheet([cell_data],
-                               cube.submission_info.spreadsheet_id,
-                               cube.submission_info.maindeck)
+        return deck_metadata + self.maindeck
 
-        #sideboard
+    def sideboard_row(self):
+        """The row for the sideboard sheet."""
         #(no placeholders - no need to fill in that info twice)
         sb_metadata = [self.user, self.timestamp]
-        cell_data = sb_metadata + self.sideboard
-        service.write_to_sheet([cell_data],
-                               cube.submission_info.spreadsheet_id,
-                               cube.submission_info.sideboard)
+        return sb_metadata + self.sideboard
+
+    def substitute_ids(self, id_map: dict):
+        self.maindeck_ids = substitute_ids(self.maindeck_ids, id_map)
+        self.sideboard_ids = substitute_ids(self.sideboard_ids, id_map)
+        for field in ("companion", "commander"):
+            name = getattr(self, field)
+            if name and CARD_DICTIONARY.id_for(name) in id_map:
+                setattr(self, field, CARD_DICTIONARY.name_for(id_map[CARD_DICTIONARY.id_for(name)]))
+
+    def save_to_spreadsheet(self, service: GoogleDraftDataSaver, cube: Cube):
+        # write the main deck
+        writes = [service.write_to_sheet([self.maindeck_row()],
+                                         cube.submission_info.spreadsheet_id,
+                                         cube.submission_info.maindeck)]
+
+        #sideboard
+        writes.append(service.write_to_sheet([self.sideboard_row()],
+                                             cube.submission_info.spreadsheet_id,
+                                             cube.submission_info.sideboard))
+        return writes
 
 class DraftLog(DraftData):
-    """A parsed draft log from a file submitted in the Discord channel."""
-    def __init__(self, data_stream, user):
+    """A parsed draft log from a file submitted in the Discord channel.
+    By default the log is parsed incrementally (see parse_incremental); pass
+    incremental=False to load the whole log with json.loads instead.
+
+    Pass a concurrent.futures executor to parse the players' exports and decklists in
+    it, one player per task (see parse_draft_user). A ProcessPoolExecutor is what
+    actually runs them in parallel; parsing is pure Python, so threads only move it off
+    the calling thread."""
+    def __init__(self, data_stream, user, incremental=True, executor=None):
         super().__init__()
         self.user = user     #holds the user from whom the data was scraped
         self.data = ""       #holds the parsed data
         self.number_of_players = 0
         self.deck_lists = []
-        self.card_data = {}
-        self.parse(data_stream)
+        self.executor = executor
+        if data_stream:
+            if incremental:
+                self.parse_incremental(data_stream)
+            else:
+                self.parse(data_stream)
 
     def parse(self, data: str):
         """Given a draft log as a string, returns players and the picked cards in pick order
@@ -166,55 +271,284 @@ class DraftLog(DraftData):
         a downloaded draft log from mtgadraft.herokuapp.com/
         """
         draft_log = json.loads(data)
+        card_names = {key: card["name"] for key, card in draft_log["carddata"].items()}
+        self._read_users(draft_log["users"].values(), draft_log["time"], card_names)
+
+    def parse_incremental(self, data: str):
+        """Like parse, but walks the log one top-level entry, user and card at a time
+        instead of building the whole document. Only the parts of each user that are
+        used are kept, and only the names of the cards in their decklists are kept
+        from carddata, so the (large) per-card data is never all in memory at once.
+        """
+        users = []
+        card_names = {}
+        time = None
+
+        def read_user(_key, pos):
+            user, end = JSON_DECODER.raw_decode(data, pos)
+            trimmed_user = {"userName": user["userName"], "exportString": user["exportString"]}
+            if "decklist" in user:
+                trimmed_user["decklist"] = {"main": user["decklist"]["main"],
+                                            "side": user["decklist"].get("side", [])}
+            users.append(trimmed_user)
+            return end
 
-        self.card_data = draft_log["carddata"]
+        def needed_card_keys():
+            return {key for user in users if "decklist" in user
+                    for part in ("main", "side") for key in user["decklist"][part]}
 
-        timestamp = datetime.datetime.fromtimestamp(int(draft_log["time"])*.001)
+        def read_card(key, pos):
+            card, end = JSON_DECODER.raw_decode(data, pos)
+            # If carddata comes before users, every name has to be kept.
+            if needed_keys is None or key in needed_keys:
+                card_names[key] = card["name"]
+            return end
+
+        def read_entry(key, pos):
+            nonlocal time, needed_keys
+            if key == "users":
+                return walk_json_object(data, pos, read_user)
+            if key == "carddata":
+                needed_keys = needed_card_keys() if users else None
+                return walk_json_object(data, pos, read_card)
+            value, end = JSON_DECODER.raw_decode(data, pos)
+            if key == "time":
+                time = value
+            return end
+
+        needed_keys = None
+        walk_json_object(data, 0, read_entry)
+        self._read_users(users, time, card_names)
+
+    def _read_users(self, users, time, card_names):
+        """Fills in the seats and decklists from the log's users, its time,
+        and a map from carddata key to card name."""
+        timestamp = datetime.datetime.fromtimestamp(int(time)*.001)
         self.set_timestamp(timestamp)
+        if self.executor is not None:
+            self._read_users_concurrently(users, timestamp, card_names)
+            return
 
         user_representations = []
         number_of_players = 0
-        for _, user in draft_log["users"].items():
+        for user in users:
             try:
                 name = user["userName"]
-                picks = DeckList(name, timestamp, data_stream=user["exportString"]).maindeck
+                picks = DeckList(name, timestamp, data_stream=user["exportString"]).maindeck_ids
                 user_representation = {"name":user["userName"], "picks":picks}
                 user_representations.append(user_representation)
                 number_of_players += 1
                 if "decklist" in user:
-                    maindeck = [self.card_data[key]["name"] for key in user["decklist"]["main"]]
-                    if "side" in user["decklist"]:
-                        sideboard = [self.card_data[key]["name"] for key in user["decklist"]["side"]]
-                    self.deck_lists.append(DeckList(name, timestamp, maindeck=maindeck, sideboard=sideboard))
+                    maindeck = CARD_DICTIONARY.ids_for(card_names[key]
+                                                       for key in user["decklist"]["main"])
+                    sideboard = CARD_DICTIONARY.ids_for(card_names[key]
+                                                        for key in user["decklist"].get("side", []))
+                    self.deck_lists.append(DeckList(name, timestamp, maindeck_ids=maindeck,
+                                                    sideboard_ids=sideboard))
             except DraftDataParseError as inner_ex:
-                inner_ex.message += f" This occurred while parsing a draft log, \
-                in the exportString for user {name}."
+                attribute_to_draft_user(inner_ex, name)
                 raise
         self.data = user_representations
         self.number_of_players = number_of_players
 
-    def card_list(self):
-        return [card for player in self.data for card in player["picks"]]
+    def _read_users_concurrently(self, users, timestamp, card_names):
+        """Like the loop in _read_users, but with one parse_draft_user task per player in
+        self.executor. The results come back by card name (IDs are per-process) and
+        in seat order, so a failing player raises the same error it would sequentially."""
+        tasks = []
+        for user in users:
+            # Only send each task the carddata names its own decklist needs.
+            keys = [key for part in ("main", "side")
+                    for key in user.get("decklist", {}).get(part, [])]
+            trimmed_user = {field: user[field] for field in ("userName", "exportString", "decklist")
+                            if field in user}
+            tasks.append(self.executor.submit(parse_draft_user, trimmed_user, timestamp,
+                                              {key: card_names[key] for key in keys}))
+        user_representations = []
+        for task in tasks:
+            name, picks, maindeck, sideboard = task.result()
+            user_representations.append({"name": name, "picks": CARD_DICTIONARY.ids_for(picks)})
+            if maindeck is not None:
+                self.deck_lists.append(DeckList(name, timestamp,
+                                                maindeck_ids=CARD_DICTIONARY.ids_for(maindeck),
+                                                sideboard_ids=CARD_DICTIONARY.ids_for(sideboard)))
+        self.data = user_representations
+        self.number_of_players = len(user_representations)
+
+    def to_json(self):
+        return {"type": "draftlog", "user": self.user, "timestamp": self.timestamp,
+                "seats": [{"name": player["name"],
+                           "picks": CARD_DICTIONARY.names_for(player["picks"])}
+                          for player in self.data],
+                "deck_lists": [deck.to_json() for deck in self.deck_lists]}
+
+    @classmethod
+    def from_json(cls, data: dict):
+        """Given the output of to_json, recreates the DraftLog."""
+        draft_log = cls(None, data["user"])
+        draft_log.timestamp = data["timestamp"]
+        draft_log.data = [{"name": seat["name"], "picks": CARD_DICTIONARY.ids_for(seat["picks"])}
+                          for seat in data["seats"]]
+        draft_log.number_of_players = len(draft_log.data)
+        draft_log.deck_lists = [DeckList.from_json(deck) for deck in data["deck_lists"]]
+        return draft_log
+
+    def card_ids(self):
+        card_ids = array(CARD_ID_TYPECODE)
+        for player in self.data:
+            card_ids.extend(player["picks"])
+        return card_ids
+
+    def substitute_ids(self, id_map: dict):
+        for player in self.data:
+            player["picks"] = substitute_ids(player["picks"], id_map)
+        for deck in self.deck_lists:
+            deck.substitute_ids(id_map)
 
     def save_to_spreadsheet(self, service: GoogleDraftDataSaver, cube: Cube):
+        """Writes the draft seats, then every player's maindeck and sideboard, with one
+        append per sheet location rather than two per deck."""
         #write the draft seats
         cell_values = []
         for user_representation in self.data:
             cell_values.append([self.timestamp, user_representation["name"]] +
-                               user_representation["picks"])
+                               CARD_DICTIONARY.names_for(user_representation["picks"]))
         cell_values.append([""])
-        service.write_to_sheet(cell_values,
-                               cube.submission_info.spreadsheet_id,
-                               cube.submission_info.draftlog)
-        
-        for deck in self.deck_lists:
-            deck.save_to_spreadsheet(service, cube)
+        writes = [service.write_to_sheet(cell_values,
+                                         cube.submission_info.spreadsheet_id,
+                                         cube.submission_info.draftlog)]
+
+        if self.deck_lists:
+            writes.append(service.write_to_sheet([deck.maindeck_row() for deck in self.deck_lists],
+                                                 cube.submission_info.spreadsheet_id,
+                                                 cube.submission_info.maindeck))
+            writes.append(service.write_to_sheet([deck.sideboard_row() for deck in self.deck_lists],
+                                                 cube.submission_info.spreadsheet_id,
+                                                 cube.submission_info.sideboard))
+        return writes
+
+def substitute_ids(card_ids, id_map: dict):
+    """Returns a copy of an array of card IDs with some replaced, using a {old: new} map."""
+    return array(CARD_ID_TYPECODE, (id_map.get(card_id, card_id) for card_id in card_ids))
+
+def attribute_to_draft_user(ex: "DraftDataParseError", name: str):
+    """Adds which draft log user a parse error came from to its message."""
+    ex.message += f" This occurred while parsing a draft log, \
+                in the exportString for user {name}."
+
+def parse_draft_user(user: dict, timestamp: datetime.datetime, card_names: dict):
+    """Parses one draft log user, for DraftLog's executor. Returns (name, picks, maindeck,
+    sideboard) as lists of card names; the decklists are None if the user has none.
+    Raises DraftDataParseError naming the user."""
+    name = user["userName"]
+    try:
+        picks = DeckList(name, timestamp, data_stream=user["exportString"]).maindeck
+    except DraftDataParseError as inner_ex:
+        attribute_to_draft_user(inner_ex, name)
+        raise
+    if "decklist" not in user:
+        return name, picks, None, None
+    return (name, picks, [card_names[key] for key in user["decklist"]["main"]],
+            [card_names[key] for key in user["decklist"].get("side", [])])
+
+def walk_json_object(text: str, pos: int, read_value):
+    """Walks the JSON object starting at text[pos] (after any whitespace) one entry at a
+    time, without decoding the values. For each entry, calls read_value(key, value_pos),
+    which must consume the value and return the position just past it.
+    Returns the position just past the object."""
+    skip_whitespace = JSON_WHITESPACE_REGEX.match
+    pos = skip_whitespace(text, pos).end()
+    if text[pos:pos + 1] != "{":
+        raise json.JSONDecodeError("Expecting '{'", text, pos)
+    pos = skip_whitespace(text, pos + 1).end()
+    if text[pos:pos + 1] == "}":
+        return pos + 1
+    while True:
+        key, pos = JSON_DECODER.raw_decode(text, pos)
+        pos = skip_whitespace(text, pos).end()
+        if text[pos:pos + 1] != ":":
+            raise json.JSONDecodeError("Expecting ':' delimiter", text, pos)
+        pos = read_value(key, skip_whitespace(text, pos + 1).end())
+        pos = skip_whitespace(text, pos).end()
+        delimiter = text[pos:pos + 1]
+        if delimiter == "}":
+            return pos + 1
+        if delimiter != ",":
+            raise json.JSONDecodeError("Expecting ',' delimiter", text, pos)
+        pos = skip_whitespace(text, pos + 1).end()
+
+class DeckParser:
+    """Single-pass parser for Arena-style deck exports. Feed it one line at a time
+    (str, or bytes in the given encoding), then call result().
+
+    Basic lands are dropped, quantities other than 1 add that many copies, and a
+    companion or commander repeated in the sideboard isn't counted twice."""
+    def __init__(self, encoding: str = "utf-8"):
+        self.encoding = encoding
+        self.section = MAINDECK
+        self.maindeck = array(CARD_ID_TYPECODE)
+        self.sideboard = array(CARD_ID_TYPECODE)
+        self.companion = ""
+        self.commander = ""
+
+    def feed(self, line):
+        """Parses one line of the deck."""
+        self.feed_lines((line,))
+
+    def feed_lines(self, lines):
+        """Parses every line from an iterable of lines."""
+        match_line = DECK_LINE_REGEX.match
+        encoding = self.encoding
+        self._add_cards(match.groups() for match in
+                        (match_line(line.decode(encoding) if isinstance(line, bytes) else line)
+                         for line in lines)
+                        if match)
+
+    def feed_text(self, text: str):
+        """Parses a whole deck file at once."""
+        self._add_cards(DECK_LINE_REGEX.findall(text))
+
+    def _add_cards(self, parsed_lines):
+        """Sorts (quantity, card name, section header) tuples into the deck."""
+        section = self.section
+        maindeck = self.maindeck
+        sideboard = self.sideboard
+        id_for = CARD_DICTIONARY.id_for
+        for quantity, card_name, header in parsed_lines:
+            if header:
+                section = SECTION_HEADERS[header]
+                continue
+            if "///" in card_name:
+                card_name = SPLIT_CARD_REGEX.sub("//", card_name)
+            # Should the basics be dropped?
+            if card_name in BASIC_LANDS:
+                continue
+            if section == MAINDECK:
+                if quantity == "1":
+                    maindeck.append(id_for(card_name))
+                else:
+                    maindeck.extend([id_for(card_name)] * int(quantity))
+            elif section == SIDEBOARD:
+                if card_name != self.companion and card_name != self.commander:
+                    if quantity == "1":
+                        sideboard.append(id_for(card_name))
+                    else:
+                        sideboard.extend([id_for(card_name)] * int(quantity))
+            elif section == COMPANION:
+                self.companion = card_name
+            else:
+                self.commander = card_name
+        self.section = section
+
+    def result(self):
+        """Returns (maindeck IDs, sideboard IDs, companion, commander)."""
+        return self.maindeck, self.sideboard, self.companion, self.commander
 
 class DraftDataParseError(Exception):
     """Raised when a DraftData doesn't recognize the first character of a given input.
     first_char : string
     The character we failed to parse."""
     def __init__(self, first_char):
-        super().__init__()
+        super().__init__(first_char)  # So it can be pickled back from a worker process.
         self.first_char = first_char
         self.message = f"Could not determine data type from beginning character {first_char}."
@@ -0,0 +1,142 @@
+"""Lightweight timing and gauge metrics for the bot, readable as Prometheus text or a log line."""
+
+import time
+import asyncio
+import bisect
+from collections import Counter, OrderedDict
+from contextlib import nullcontext
+from typing import Callable, Dict
+
+# Upper bounds (in seconds) of the latency histogram buckets; the last bucket is +Inf.
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+METRIC_PREFIX = "jankdiver"
+# What span() returns when metrics are disabled: entering and leaving it does nothing.
+NULL_SPAN = nullcontext()
+
+
+class Histogram:
+    """Counts observations into fixed buckets, and keeps their sum."""
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative_counts(self):
+        """(upper bound, observations <= it) for each bucket, ending with +Inf."""
+        total = 0
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            total += count
+            yield bound, total
+
+
+class Span:
+    """Times a `with` block (including any awaits inside it) into a stage's histogram."""
+    __slots__ = ("metrics", "stage", "start")
+
+    def __init__(self, metrics: "Metrics", stage: str):
+        self.metrics = metrics
+        self.stage = stage
+        self.start = None
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.metrics.observe(self.stage, time.perf_counter() - self.start)
+        if exc_type is not None:
+            self.metrics.count(f"{self.stage}.errors")
+        return False
+
+
+class Metrics:
+    """Stage latencies, event counts, and gauges read on demand (such as queue depths).
+
+    With enabled=False, span() hands back a shared no-op context manager and count()
+    returns at once, so instrumented code pays for little more than the call."""
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self.histograms: Dict[str, Histogram] = OrderedDict()
+        self.counters = Counter()
+        self.gauges: Dict[str, Callable[[], float]] = OrderedDict()
+
+    def span(self, stage: str):
+        """A context manager that times its block as `stage`."""
+        if not self.enabled:
+            return NULL_SPAN
+        return Span(self, stage)
+
+    def observe(self, stage: str, seconds: float):
+        histogram = self.histograms.get(stage)
+        if histogram is None:
+            histogram = self.histograms[stage] = Histogram()
+        histogram.observe(seconds)
+
+    def count(self, event: str, amount: int = 1):
+        if self.enabled:
+            self.counters[event] += amount
+
+    def gauge(self, name: str, read: Callable[[], float]):
+        """Registers a function whose value is reported as `name` whenever metrics are read."""
+        self.gauges[name] = read
+
+    def render(self):
+        """The metrics in the Prometheus text exposition format."""
+        lines = [f"# TYPE {METRIC_PREFIX}_stage_seconds histogram"]
+        for stage, histogram in self.histograms.items():
+            for bound, count in histogram.cumulative_counts():
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f'{METRIC_PREFIX}_stage_seconds_bucket{{stage="{stage}",le="{le}"}} '
+                             f'{count}')
+            lines.append(f'{METRIC_PREFIX}_stage_seconds_sum{{stage="{stage}"}} {histogram.sum}')
+            lines.append(f'{METRIC_PREFIX}_stage_seconds_count{{stage="{stage}"}} '
+                         f'{histogram.count}')
+        lines.append(f"# TYPE {METRIC_PREFIX}_events_total counter")
+        for event, count in sorted(self.counters.items()):
+            lines.append(f'{METRIC_PREFIX}_events_total{{event="{event}"}} {count}')
+        for name, read in self.gauges.items():
+            lines.append(f"# TYPE {METRIC_PREFIX}_{name} gauge")
+            lines.append(f"{METRIC_PREFIX}_{name} {read()}")
+        return "\n".join(lines) + "\n"
+
+    def summary(self):
+        """A one-line summary: mean latency and count per stage, counts and gauges."""
+        parts = [f"{stage} {histogram.sum / histogram.count * 1000:.1f}ms x{histogram.count}"
+                 for stage, histogram in self.histograms.items() if histogram.count]
+        parts += [f"{event}={count}" for event, count in sorted(self.counters.items())]
+        parts += [f"{name}={read()}" for name, read in self.gauges.items()]
+        return "; ".join(parts)
+
+
+async def serve_metrics(metrics: Metrics, host: str = "127.0.0.1", port: int = 9108):
+    """Serves metrics.render() to any HTTP GET on host:port. Returns the asyncio Server."""
+    async def handle(reader, writer):
+        try:
+            request_line = await reader.readline()
+            while (await reader.readline()).strip():  # Skip the headers.
+                pass
+            if request_line.startswith(b"GET "):
+                status, body = "200 OK", metrics.render().encode("utf-8")
+            else:
+                status, body = "405 Method Not Allowed", b""
+            writer.write(f"HTTP/1.1 {status}\r\n"
+                         "Content-Type: text/plain; version=0.0.4; charset=utf-8\r\n"
+                         f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n"
+                         .encode("ascii") + body)
+            await writer.drain()
+        finally:
+            writer.close()
+    return await asyncio.start_server(handle, host, port)
+
+
+async def log_metrics(metrics: Metrics, interval: float):
+    """Prints metrics.summary() every `interval` seconds."""
+    while True:
+        await asyncio.sleep(interval)
+        print(f"Metrics: {metrics.summary()}")
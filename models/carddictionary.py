@@ -0,0 +1,63 @@
+"""A process-wide dictionary that interns card names as small integer IDs."""
+import threading
+
+from array import array
+from bisect import bisect_left
+from typing import Iterable, Optional, Sequence
+
+# array typecode for card IDs (unsigned, 4 bytes).
+CARD_ID_TYPECODE = 'I'
+
+class CardDictionary:
+    """Maps each canonical card name to a small integer ID, and back.
+
+    IDs are handed out in the order names are first seen, so they are only meaningful
+    within one process: anything that leaves the process (spreadsheets, Discord messages,
+    files, other worker processes) should be converted back to names first."""
+    def __init__(self):
+        self.ids = {}
+        self.names = []
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.names)
+
+    def id_for(self, name: str) -> int:
+        """Returns the ID for a card name, assigning a new one if it hasn't been seen yet."""
+        card_id = self.ids.get(name)
+        if card_id is None:
+            with self._lock:
+                card_id = self.ids.get(name)
+                if card_id is None:
+                    card_id = len(self.names)
+                    self.names.append(name)
+                    self.ids[name] = card_id
+        return card_id
+
+    def ids_for(self, names: Iterable[str]) -> array:
+        """Returns an array of IDs for the given card names, assigning new IDs as needed."""
+        return array(CARD_ID_TYPECODE, map(self.id_for, names))
+
+    def lookup(self, name: str) -> Optional[int]:
+        """Returns the ID for a card name, or None if it has never been seen."""
+        return self.ids.get(name)
+
+    def name_for(self, card_id: int) -> str:
+        """Returns the card name for an ID."""
+        return self.names[card_id]
+
+    def names_for(self, card_ids: Iterable[int]):
+        """Returns a list of card names for the given IDs."""
+        names = self.names
+        return [names[card_id] for card_id in card_ids]
+
+def sorted_ids(card_ids: Iterable[int]) -> array:
+    """Returns the distinct IDs as a sorted array, suitable for contains_id."""
+    return array(CARD_ID_TYPECODE, sorted(set(card_ids)))
+
+def contains_id(sorted_card_ids: Sequence[int], card_id: int) -> bool:
+    """Is card_id in a sorted array of IDs?"""
+    i = bisect_left(sorted_card_ids, card_id)
+    return i < len(sorted_card_ids) and sorted_card_ids[i] == card_id
+
+CARD_DICTIONARY = CardDictionary()
@@ -0,0 +1,96 @@
+"""Normalized and approximate card name lookup, for submissions whose card names
+don't exactly match the names in the cube lists."""
+import re
+import unicodedata
+from collections import Counter
+from typing import Dict, Iterable, Optional
+
+from models.carddictionary import CARD_DICTIONARY
+
+# Split, adventure and double-faced cards are written with anything from "/" to "////".
+FACE_SEPARATOR_REGEX = re.compile(r'\s*/+\s*')
+WORD_REGEX = re.compile(r'[^\W_]+')
+# Characters that NFKD doesn't decompose, and apostrophes, which are dropped rather than
+# treated as word breaks so that "Urza's" and "Urzas" agree.
+FOLDED_CHARACTERS = str.maketrans({"æ": "ae", "œ": "oe", "ø": "o", "ß": "ss",
+                                   "'": None, "’": None, "‘": None, "`": None})
+# How similar (by the Dice coefficient of their trigrams) a suggestion has to be.
+MIN_SIMILARITY = 0.75
+
+
+def normalize_card_name(name: str):
+    """Casefolds a card name and folds away accents, punctuation and spacing, with faces
+    separated by " // ". For example, "Lim-Dûl's Vault" becomes "lim duls vault"."""
+    decomposed = unicodedata.normalize("NFKD", name.casefold())
+    folded = "".join(char for char in decomposed
+                     if not unicodedata.combining(char)).translate(FOLDED_CHARACTERS)
+    return " // ".join(" ".join(WORD_REGEX.findall(face))
+                       for face in FACE_SEPARATOR_REGEX.split(folded.strip()))
+
+
+def trigrams(normalized_name: str):
+    """The set of three-character substrings of a normalized name, padded at the ends."""
+    padded = f"  {normalized_name} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class CardNameIndex:
+    """Finds the card a submitted name was meant to be, among a fixed set of card IDs.
+
+    Names are compared after normalize_card_name; a multi-faced card can also be named by
+    its front face alone, and explicit aliases (such as Arena renames) can be given as a
+    {submitted name: card name} dict; resolve() only accepts these. closest() also looks
+    names up by trigram similarity, but different cards can have similar names ("Goblin
+    Guide" and "Goblin Guidepost"), so its answers are only suggestions."""
+    def __init__(self, card_ids: Iterable[int], aliases: Dict[str, str] = None):
+        self.by_name: Dict[str, int] = {}
+        front_faces: Dict[str, Optional[int]] = {}
+        for card_id in card_ids:
+            normalized = normalize_card_name(CARD_DICTIONARY.name_for(card_id))
+            self.by_name[normalized] = card_id
+            if " // " in normalized:
+                front = normalized.split(" // ", 1)[0]
+                # A front face shared by two cards can't be resolved.
+                front_faces[front] = None if front in front_faces else card_id
+        for front, card_id in front_faces.items():
+            if card_id is not None:
+                self.by_name.setdefault(front, card_id)
+        for alias, name in (aliases or {}).items():
+            card_id = self.by_name.get(normalize_card_name(name))
+            if card_id is not None:
+                self.by_name[normalize_card_name(alias)] = card_id
+        self.grams: Dict[str, list] = {}
+        self.gram_counts: Dict[str, int] = {}
+        for normalized in self.by_name:
+            name_grams = trigrams(normalized)
+            self.gram_counts[normalized] = len(name_grams)
+            for gram in name_grams:
+                self.grams.setdefault(gram, []).append(normalized)
+
+    def resolve(self, name: str) -> Optional[int]:
+        """Returns the ID of the card `name` is another way of writing (ignoring case,
+        accents and punctuation, by its front face, or by an alias), or None."""
+        normalized = normalize_card_name(name)
+        card_id = self.by_name.get(normalized)
+        if card_id is None and " // " in normalized:
+            card_id = self.by_name.get(normalized.split(" // ", 1)[0])
+        return card_id
+
+    def closest(self, name: str) -> Optional[int]:
+        """Returns the ID of the card whose name is most similar to `name`, if it's close
+        enough and the single best candidate, or None. It may be a different card."""
+        normalized = normalize_card_name(name)
+        query_grams = trigrams(normalized)
+        overlaps = Counter()
+        for gram in query_grams:
+            overlaps.update(self.grams.get(gram, ()))
+        best, best_score, runner_up = None, 0.0, 0.0
+        for candidate, overlap in overlaps.items():
+            score = 2 * overlap / (len(query_grams) + self.gram_counts[candidate])
+            if score > best_score:
+                best, best_score, runner_up = candidate, score, best_score
+            elif score > runner_up:
+                runner_up = score
+        if best is None or best_score < MIN_SIMILARITY or runner_up == best_score:
+            return None
+        return self.by_name[best]
@@ -1,10 +1,14 @@
 """Data model for Cubes, including the data about where in the spreadsheet to save them."""
-import os
-
-from typing import Sequence
+from typing import Dict, List, Sequence
 from collections import UserDict
 from json import JSONEncoder
 
+from models.carddictionary import CARD_DICTIONARY, contains_id, sorted_ids
+from models.cardnames import CardNameIndex
+
+BASIC_LANDS = frozenset(["Plains", "Island", "Swamp", "Mountain", "Forest"])
+BASIC_LAND_IDS = frozenset(CARD_DICTIONARY.ids_for(BASIC_LANDS))
+
 class CubeSubmissionInfo:
     """The set of spreadsheet locations to which
     to save information about drafts of this cube."""
@@ -21,19 +25,45 @@ class CubeSubmissionInfo:
 
 class Cube:
     """A list of cards in a cube,
-    Along with directions about which speadsheets locations to save to."""
+    Along with directions about which speadsheets locations to save to.
+    The cards are stored as a sorted array of IDs from CARD_DICTIONARY."""
     def __init__(self, cardList: Sequence[str], cube_cobra_id: str,
                  submission_info: CubeSubmissionInfo):
-        self.cards = set(cardList)
+        self.card_ids = sorted_ids(CARD_DICTIONARY.ids_for(cardList))
         self.cube_cobra_id = cube_cobra_id
         self.submission_info = submission_info
+
+    @property
+    def cards(self):
+        """The names of the cards in this cube."""
+        return CARD_DICTIONARY.names_for(self.card_ids)
+
+    @cards.setter
+    def cards(self, card_list: Sequence[str]):
+        self.card_ids = sorted_ids(CARD_DICTIONARY.ids_for(card_list))
+
     def contains(self, card_list: Sequence[str]):
         """Does this cube have all the cards in card_list?"""
-        draftable_cards = set(card_list) - set(["Plains", "Island", "Swamp", "Mountain", "Forest"])
-        does_contain = draftable_cards.issubset(self.cards)
-        if os.getenv("DEBUG") and not does_contain:
-            print(draftable_cards - self.cards)
-        return does_contain
+        return not self.missing_cards(card_list)
+
+    def missing_cards(self, card_list: Sequence[str]):
+        """Returns the set of (non-basic) cards in card_list that aren't in this cube."""
+        return set(CARD_DICTIONARY.names_for(
+            self.missing_card_ids(CARD_DICTIONARY.ids_for(card_list))))
+
+    def missing_card_ids(self, card_ids: Sequence[int]):
+        """Returns the set of (non-basic) card IDs in card_ids that aren't in this cube."""
+        return {card_id for card_id in set(card_ids) - BASIC_LAND_IDS
+                if not contains_id(self.card_ids, card_id)}
+
+    @classmethod
+    def from_card_ids(cls, card_ids: Sequence[int], cube_cobra_id: str,
+                      submission_info: CubeSubmissionInfo):
+        """Creates a Cube from an array of CARD_DICTIONARY IDs that's already sorted
+        and distinct (see sorted_ids)."""
+        cube = cls([], cube_cobra_id, submission_info)
+        cube.card_ids = card_ids
+        return cube
 
     @classmethod
     def from_json(cls, data: dict):
@@ -41,26 +71,236 @@ class Cube:
         return cls(data["cards"], data["cube_cobra_id"],
                    CubeSubmissionInfo.from_json(data["submission_info"]))
 
+class CubeMatchScore:
+    """How well a submission fits one cube: how many of its distinct non-basic cards the
+    cube has, out of how many, and the IDs of the ones it's missing."""
+    def __init__(self, cube_name: str, matched: int, total: int, missing_card_ids: List[int]):
+        self.cube_name = cube_name
+        self.matched = matched
+        self.total = total
+        self.missing_card_ids = missing_card_ids
+
+    @property
+    def fraction(self):
+        """The fraction of the submission's cards that are in the cube."""
+        return self.matched / self.total if self.total else 1.0
+
+    @property
+    def missing_cards(self):
+        """The names of the cards the cube is missing."""
+        return CARD_DICTIONARY.names_for(self.missing_card_ids)
+
+    def __repr__(self):
+        return f"CubeMatchScore({self.cube_name!r}, {self.matched}/{self.total})"
+
 class CubeList(UserDict):
     """A dictionary of cubes organized by name.
     This class extends UserDict, which means it's literally a dict
-    (and can do everything a dict can do)."""
+    (and can do everything a dict can do).
+
+    Matching goes through an inverted index from card ID to a bitmask of the cubes
+    containing that card (bit i is set for the i-th cube in cube_order). The index is
+    rebuilt lazily whenever cubes are added or removed; call rebuild_index() after
+    changing a cube's cards in place.
+
+    Card names that aren't in any cube can be resolved to other spellings of cube cards
+    through name_index (see get_near_matches), which is built on first use, and similar
+    cube cards can be suggested for the rest (see get_suggestions). card_aliases maps submitted
+    names to cube card names where they can't be worked out (such as Arena renames)."""
+    def __init__(self, *args, **kwargs):
+        self.cube_order: List[str] = []
+        self.card_index: Dict[int, int] = {}
+        self.card_aliases: Dict[str, str] = {}
+        self._name_index = None
+        self._index_is_stale = True
+        super().__init__(*args, **kwargs)
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self._index_is_stale = True
+
+    def __delitem__(self, key):
+        super().__delitem__(key)
+        self._index_is_stale = True
+
+    def rebuild_index(self):
+        """Rebuilds the card ID -> cube bitmask index from the current cubes."""
+        self.cube_order = list(self.keys())
+        card_index = {}
+        for bit, cube_name in enumerate(self.cube_order):
+            cube_bit = 1 << bit
+            for card_id in self[cube_name].card_ids:
+                card_index[card_id] = card_index.get(card_id, 0) | cube_bit
+        self.card_index = card_index
+        self._name_index = None
+        self._index_is_stale = False
+
+    @property
+    def name_index(self):
+        """A CardNameIndex over every card in every cube."""
+        if self._index_is_stale:
+            self.rebuild_index()
+        if self._name_index is None:
+            self._name_index = CardNameIndex(self.card_index, self.card_aliases)
+        return self._name_index
+
+    def set_card_aliases(self, card_aliases: Dict[str, str]):
+        """Sets the {submitted name: cube card name} aliases used by name_index."""
+        self.card_aliases = card_aliases
+        self._name_index = None
+
+    def set_cube_cards(self, cube_name: str, card_list: Sequence[str]):
+        """Replaces the cards in one cube, patching the index for just that cube."""
+        cube = self[cube_name]
+        old_card_ids = cube.card_ids
+        cube.cards = card_list
+        self._name_index = None
+        if self._index_is_stale:
+            return
+        card_index = self.card_index
+        cube_bit = 1 << self.cube_order.index(cube_name)
+        for card_id in old_card_ids:
+            mask = card_index[card_id] & ~cube_bit
+            if mask:
+                card_index[card_id] = mask
+            else:
+                del card_index[card_id]
+        for card_id in cube.card_ids:
+            card_index[card_id] = card_index.get(card_id, 0) | cube_bit
+
+    def _cube_mask(self, card_ids: Sequence[int]):
+        """Returns the bitmask of cubes that contain every (non-basic) card in card_ids."""
+        if self._index_is_stale:
+            self.rebuild_index()
+        mask = (1 << len(self.cube_order)) - 1
+        card_index = self.card_index
+        for card_id in set(card_ids) - BASIC_LAND_IDS:
+            mask &= card_index.get(card_id, 0)
+            if not mask:
+                break
+        return mask
+
+    def _names_for_mask(self, mask: int):
+        return [cube_name for bit, cube_name in enumerate(self.cube_order) if mask >> bit & 1]
+
     def get_matches(self, card_list: Sequence[str]):
         """Given a list of cards, returns a list of the names of cubes
         in this CubeList that contain all the cards in the list."""
-        return [cubeName for cubeName, cube in self.items()
-                if cube.contains(card_list)]
+        return self.get_matches_by_id(CARD_DICTIONARY.ids_for(card_list))
+
+    def get_matches_by_id(self, card_ids: Sequence[int]):
+        """Like get_matches, for a list of card IDs."""
+        return self._names_for_mask(self._cube_mask(card_ids))
+
+    def get_near_matches(self, card_list: Sequence[str]):
+        """Like get_matches, but if no cube has every card, cards that aren't in any cube
+        are replaced by the cube card they're another spelling of (see CardNameIndex.resolve)
+        and the match is tried again. Returns (cube names, {submitted name: cube card name})."""
+        matches, substitutions = self.get_near_matches_by_id(CARD_DICTIONARY.ids_for(card_list))
+        return matches, {CARD_DICTIONARY.name_for(submitted): CARD_DICTIONARY.name_for(card_id)
+                         for submitted, card_id in substitutions.items()}
+
+    def get_near_matches_by_id(self, card_ids: Sequence[int]):
+        """Like get_near_matches, for a list of card IDs.
+        Returns (cube names, {submitted card ID: cube card ID})."""
+        mask = self._cube_mask(card_ids)
+        if mask:
+            return self._names_for_mask(mask), {}
+        substitutions = {}
+        for card_id in set(card_ids) - BASIC_LAND_IDS:
+            if card_id not in self.card_index:
+                resolved = self.name_index.resolve(CARD_DICTIONARY.name_for(card_id))
+                if resolved is not None:
+                    substitutions[card_id] = resolved
+        if not substitutions:
+            return [], {}
+        mask = self._cube_mask([substitutions.get(card_id, card_id) for card_id in card_ids])
+        return (self._names_for_mask(mask), substitutions) if mask else ([], {})
+
+    def get_suggestions(self, card_list: Sequence[str]):
+        """For cards that aren't in any cube, and aren't another spelling of a cube card,
+        returns {submitted name: most similar cube card name} (see CardNameIndex.closest).
+        These may be different cards, so they're only for showing to the submitter."""
+        suggestions = self.get_suggestions_by_id(CARD_DICTIONARY.ids_for(card_list))
+        return {CARD_DICTIONARY.name_for(submitted): CARD_DICTIONARY.name_for(card_id)
+                for submitted, card_id in suggestions.items()}
+
+    def get_suggestions_by_id(self, card_ids: Sequence[int]):
+        """Like get_suggestions, for a list of card IDs.
+        Returns {submitted card ID: suggested cube card ID}."""
+        if self._index_is_stale:
+            self.rebuild_index()
+        suggestions = {}
+        for card_id in set(card_ids) - BASIC_LAND_IDS:
+            if card_id not in self.card_index:
+                name = CARD_DICTIONARY.name_for(card_id)
+                if self.name_index.resolve(name) is None:
+                    suggestion = self.name_index.closest(name)
+                    if suggestion is not None:
+                        suggestions[card_id] = suggestion
+        return suggestions
+
+    def get_exclusions(self, card_list: Sequence[str]):
+        """Given a list of cards, returns a dict mapping the name of each cube that
+        doesn't contain all of them to the cards that ruled it out."""
+        exclusions = self.get_exclusions_by_id(CARD_DICTIONARY.ids_for(card_list))
+        return {cube_name: CARD_DICTIONARY.names_for(card_ids)
+                for cube_name, card_ids in exclusions.items()}
+
+    def get_exclusions_by_id(self, card_ids: Sequence[int]):
+        """Like get_exclusions, for a list of card IDs."""
+        if self._index_is_stale:
+            self.rebuild_index()
+        exclusions = {}
+        card_index = self.card_index
+        for card_id in set(card_ids) - BASIC_LAND_IDS:
+            card_mask = card_index.get(card_id, 0)
+            for bit, cube_name in enumerate(self.cube_order):
+                if not card_mask >> bit & 1:
+                    exclusions.setdefault(cube_name, []).append(card_id)
+        return exclusions
+
+    def rank_cubes(self, card_list: Sequence[str]):
+        """Scores every cube by how much of card_list it contains (see CubeMatchScore).
+        Returns the scores, best first."""
+        return self.rank_cubes_by_id(CARD_DICTIONARY.ids_for(card_list))
+
+    def rank_cubes_by_id(self, card_ids: Sequence[int]):
+        """Like rank_cubes, for a list of card IDs."""
+        exclusions = self.get_exclusions_by_id(card_ids)
+        total = len(set(card_ids) - BASIC_LAND_IDS)
+        scores = [CubeMatchScore(cube_name, total - len(exclusions.get(cube_name, [])), total,
+                                 exclusions.get(cube_name, []))
+                  for cube_name in self.cube_order]
+        scores.sort(key=lambda score: score.matched, reverse=True)  # Stable, so ties keep order.
+        return scores
+
+    @staticmethod
+    def best_fit(scores: Sequence[CubeMatchScore], margin: float, min_fraction: float):
+        """Given scores from rank_cubes, returns the top cube's name if it's confidently the
+        right one: it has at least min_fraction of the cards, and beats the runner-up by more
+        than margin (as a fraction of the cards). Otherwise returns None."""
+        if not scores or scores[0].fraction < min_fraction:
+            return None
+        if len(scores) > 1 and scores[0].fraction - scores[1].fraction <= margin:
+            return None
+        return scores[0].cube_name
 
     @classmethod
     def from_json(cls, data: dict):
         """Given a cubes.json file, creates a new CubeList object from that json file."""
-        return cls({k: Cube.from_json(v) for k, v in data.items()})
+        cube_list = cls({k: Cube.from_json(v) for k, v in data.items()})
+        cube_list.rebuild_index()
+        return cube_list
 
 class CubeListEncoder(JSONEncoder):
     """JSON encoder for a CubeList."""
     def default(self, o):
         if isinstance(o, set):
             return list(o)
+        if isinstance(o, Cube):
+            return {"cards": o.cards, "cube_cobra_id": o.cube_cobra_id,
+                    "submission_info": o.submission_info}
         return o.__dict__
 
 if __name__ == "__main__":
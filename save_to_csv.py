@@ -0,0 +1,34 @@
+"""Utilities to save draft data to local CSV files instead of a Google Sheet."""
+
+import os
+import re
+import csv
+
+
+class CsvDraftDataSaver:
+    """Appends deck data to CSV files in a directory, one file per spreadsheet location.
+    Has the same write_to_sheet interface as GoogleDraftDataSaver."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def path_for(self, spreadsheet_id, location):
+        """The CSV file that stands in for a given sheet location."""
+        file_name = re.sub(r'[^\w.-]+', '_', f"{spreadsheet_id}__{location}")
+        return os.path.join(self.directory, file_name + ".csv")
+
+    def write_to_sheet(self, cell_data, spreadsheet_id, location):
+        """Saves a 2D array of data to the CSV file for the specified sheet location."""
+        if not spreadsheet_id or not location:
+            return
+        with open(self.path_for(spreadsheet_id, location), 'a', newline='',
+                  encoding='utf-8') as csv_file:
+            csv.writer(csv_file).writerows(cell_data)
+
+    def write_batch(self, appends, spreadsheet_id):
+        """Appends several 2D arrays of data to one spreadsheet's CSV files.
+        Returns a list of None (one per append), like GoogleDraftDataSaver.write_batch."""
+        for cell_data, location in appends:
+            self.write_to_sheet(cell_data, spreadsheet_id, location)
+        return [None] * len(appends)
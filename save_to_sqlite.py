@@ -0,0 +1,349 @@
+"""Utilities to save draft data to a local SQLite database for analytics."""
+
+import asyncio
+import sqlite3
+import datetime
+
+from models.cubelist import CubeList
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cards (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS submissions (
+    id INTEGER PRIMARY KEY,
+    cube TEXT NOT NULL,
+    kind TEXT NOT NULL,          -- 'deck' or 'draft'
+    user TEXT,                   -- the deck's owner (NULL for drafts; see picks.player)
+    timestamp TEXT NOT NULL,     -- '%Y-%m-%d %H:%M', as written to the sheets
+    recorded_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS decks (
+    submission_id INTEGER PRIMARY KEY REFERENCES submissions (id),
+    wins INTEGER,
+    companion TEXT
+);
+CREATE TABLE IF NOT EXISTS deck_cards (
+    submission_id INTEGER NOT NULL REFERENCES submissions (id),
+    card_id INTEGER NOT NULL REFERENCES cards (id),
+    board TEXT NOT NULL          -- 'main' or 'side'
+);
+CREATE TABLE IF NOT EXISTS picks (
+    submission_id INTEGER NOT NULL REFERENCES submissions (id),
+    seat INTEGER NOT NULL,
+    player TEXT NOT NULL,
+    pick_number INTEGER NOT NULL,
+    card_id INTEGER NOT NULL REFERENCES cards (id)
+);
+-- Running per-cube, per-card totals, updated with every save (see card_statistics).
+CREATE TABLE IF NOT EXISTS card_stats (
+    cube TEXT NOT NULL,
+    card_id INTEGER NOT NULL REFERENCES cards (id),
+    decks INTEGER NOT NULL,                -- decks with the card in the main or sideboard
+    maindecks INTEGER NOT NULL,
+    maindeck_wins INTEGER NOT NULL,        -- total wins of maindecks that reported wins
+    maindecks_with_wins INTEGER NOT NULL,
+    picks INTEGER NOT NULL,
+    pick_position_total INTEGER NOT NULL,
+    PRIMARY KEY (cube, card_id)
+);
+CREATE INDEX IF NOT EXISTS submissions_cube_timestamp ON submissions (cube, timestamp);
+CREATE INDEX IF NOT EXISTS submissions_timestamp ON submissions (timestamp);
+CREATE INDEX IF NOT EXISTS submissions_deck ON submissions (cube, user, timestamp);
+CREATE INDEX IF NOT EXISTS deck_cards_card ON deck_cards (card_id, board);
+CREATE INDEX IF NOT EXISTS deck_cards_submission ON deck_cards (submission_id);
+CREATE INDEX IF NOT EXISTS picks_card ON picks (card_id);
+CREATE INDEX IF NOT EXISTS picks_submission ON picks (submission_id);
+"""
+
+MAINDECK, SIDEBOARD, DRAFTLOG = "maindeck", "sideboard", "draftlog"
+
+# For each statistic: its value, how many observations it's based on, and the sort order
+# that puts the best cards first.
+CARD_STATISTICS = {
+    "maindeck_rate": ("1.0 * maindecks / decks", "decks", "DESC"),
+    "average_pick": ("1.0 * pick_position_total / picks", "picks", "ASC"),
+    "wins": ("1.0 * maindeck_wins / maindecks_with_wins", "maindecks_with_wins", "DESC"),
+}
+
+STATS_UPSERT = """
+INSERT INTO card_stats (cube, card_id, decks, maindecks, maindeck_wins, maindecks_with_wins,
+                        picks, pick_position_total)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (cube, card_id) DO UPDATE SET
+    decks = decks + excluded.decks,
+    maindecks = maindecks + excluded.maindecks,
+    maindeck_wins = maindeck_wins + excluded.maindeck_wins,
+    maindecks_with_wins = maindecks_with_wins + excluded.maindecks_with_wins,
+    picks = picks + excluded.picks,
+    pick_position_total = pick_position_total + excluded.pick_position_total
+"""
+
+STATS_REBUILD = """
+INSERT INTO card_stats
+SELECT cube, card_id, SUM(decks), SUM(maindecks), SUM(maindeck_wins), SUM(maindecks_with_wins),
+       SUM(picks), SUM(pick_position_total)
+FROM (
+    SELECT submissions.cube, deck_cards.card_id, 1 AS decks,
+           MAX(deck_cards.board = 'main') AS maindecks,
+           MAX(deck_cards.board = 'main') * IFNULL(decks.wins, 0) AS maindeck_wins,
+           MAX(deck_cards.board = 'main') * (decks.wins IS NOT NULL) AS maindecks_with_wins,
+           0 AS picks, 0 AS pick_position_total
+    FROM submissions JOIN deck_cards ON deck_cards.submission_id = submissions.id
+    LEFT JOIN decks ON decks.submission_id = submissions.id
+    GROUP BY submissions.id, deck_cards.card_id
+    UNION ALL
+    SELECT submissions.cube, picks.card_id, 0, 0, 0, 0, 1, picks.pick_number
+    FROM submissions JOIN picks ON picks.submission_id = submissions.id
+)
+GROUP BY cube, card_id
+"""
+
+
+class SQLiteDraftDataSaver:
+    """Saves deck and draft data into normalized tables in a SQLite database.
+
+    Has the same write_to_sheet interface as GoogleDraftDataSaver, so it can be passed
+    to save_to_spreadsheet. Rows are recognised by the spreadsheet location they were
+    addressed to, using the cube list's CubeSubmissionInfo; call set_cube_list after
+    reloading cubes. (The cube list can be left out when only reading.)
+
+    Every save also updates running per-card totals in card_stats, in the same
+    transaction, so card_statistics never has to rescan past submissions."""
+
+    def __init__(self, path: str, cube_list: CubeList = None):
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.executescript(SCHEMA)
+        self.locations = {}
+        if cube_list is not None:
+            self.set_cube_list(cube_list)
+        # Databases from before card_stats existed need their totals computed once.
+        if not self.connection.execute("SELECT 1 FROM card_stats LIMIT 1").fetchone():
+            self.rebuild_card_stats()
+
+    def set_cube_list(self, cube_list: CubeList):
+        """Updates which cube and kind of row each spreadsheet location holds.
+        Rows can only be told apart by location, so if several cubes (or kinds of row)
+        share one, it's reported and its rows are recorded under the first cube."""
+        locations = {}
+        for cube_name, cube in cube_list.items():
+            info = cube.submission_info
+            for kind, location in ((MAINDECK, info.maindeck), (SIDEBOARD, info.sideboard),
+                                   (DRAFTLOG, info.draftlog)):
+                if not info.spreadsheet_id or not location:
+                    continue  # Nothing is written there.
+                key = (info.spreadsheet_id, location)
+                if key in locations and locations[key] != (cube_name, kind):
+                    print(f"{cube_name} {kind} rows go to {location} in {info.spreadsheet_id}, "
+                          f"as {locations[key][0]} {locations[key][1]} rows do; the analytics "
+                          f"database will record them all as {locations[key][0]} "
+                          f"{locations[key][1]} rows.")
+                    continue
+                locations[key] = (cube_name, kind)
+        self.locations = locations
+
+    def write_to_sheet(self, cell_data, spreadsheet_id, location):
+        """Saves the rows that save_to_spreadsheet would have written to the given
+        sheet location."""
+        if not spreadsheet_id or not location:
+            return
+        with self.connection:
+            self._save(cell_data, spreadsheet_id, location)
+
+    def write_batch(self, appends, spreadsheet_id):
+        """Saves several appends to one spreadsheet in one transaction. Returns a list with
+        one entry per append, like GoogleDraftDataSaver.write_batch: None if it was saved,
+        or the exception it raised, in which case none of its rows were saved."""
+        results = []
+        if not spreadsheet_id:
+            return [None] * len(appends)
+        with self.connection:
+            if not self.connection.in_transaction:
+                self.connection.execute("BEGIN")
+            for cell_data, location in appends:
+                self.connection.execute("SAVEPOINT batch_append")
+                try:
+                    if location:
+                        self._save(cell_data, spreadsheet_id, location)
+                    results.append(None)
+                except Exception as ex:  # pylint: disable=broad-except
+                    self.connection.execute("ROLLBACK TO batch_append")
+                    results.append(ex)
+                self.connection.execute("RELEASE batch_append")
+        return results
+
+    def _save(self, cell_data, spreadsheet_id, location):
+        """Saves one append's rows, in the caller's transaction."""
+        cube, kind = self.locations.get((spreadsheet_id, location),
+                                        (spreadsheet_id, location))
+        if kind == MAINDECK:
+            for row in cell_data:
+                self._save_maindeck(cube, row)
+        elif kind == SIDEBOARD:
+            for row in cell_data:
+                self._save_sideboard(cube, row)
+        elif kind == DRAFTLOG:
+            self._save_draft(cube, cell_data)
+        else:
+            raise ValueError(f"Unknown spreadsheet location {spreadsheet_id} {location}.")
+
+    def card_ids(self, names):
+        """Returns the database IDs for card names, adding any new cards."""
+        distinct_names = list(set(names))
+        self.connection.executemany("INSERT OR IGNORE INTO cards (name) VALUES (?)",
+                                    ((name,) for name in distinct_names))
+        ids = {}
+        # Stay under SQLite's limit on the number of parameters in one statement.
+        for start in range(0, len(distinct_names), 500):
+            chunk = distinct_names[start:start + 500]
+            ids.update((name, card_id) for card_id, name in self.connection.execute(
+                f"SELECT id, name FROM cards WHERE name IN ({','.join('?' * len(chunk))})",
+                chunk))
+        return [ids[name] for name in names]
+
+    def _add_submission(self, cube, kind, user, timestamp):
+        return self.connection.execute(
+            "INSERT INTO submissions (cube, kind, user, timestamp, recorded_at) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (cube, kind, user, timestamp,
+             datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S'))).lastrowid
+
+    def _add_deck_cards(self, submission_id, names, board):
+        """Adds cards to a deck. Returns their IDs."""
+        card_ids = self.card_ids(names)
+        self.connection.executemany(
+            "INSERT INTO deck_cards (submission_id, card_id, board) VALUES (?, ?, ?)",
+            ((submission_id, card_id, board) for card_id in card_ids))
+        return card_ids
+
+    def _add_to_stats(self, cube, totals):
+        """Adds (card ID, decks, maindecks, maindeck wins, maindecks with wins, picks,
+        pick position total) tuples to the running card_stats totals."""
+        self.connection.executemany(STATS_UPSERT, ((cube,) + row for row in totals))
+
+    def _save_maindeck(self, cube, row):
+        # [user, wins, color placeholder, companion, timestamp, *maindeck]
+        user, wins, _, companion, timestamp = row[:5]
+        wins = wins if wins != "" else None
+        submission_id = self._add_submission(cube, "deck", user, timestamp)
+        self.connection.execute(
+            "INSERT INTO decks (submission_id, wins, companion) VALUES (?, ?, ?)",
+            (submission_id, wins, companion or None))
+        card_ids = self._add_deck_cards(submission_id, row[5:], "main")
+        self._add_to_stats(cube, ((card_id, 1, 1, wins or 0, int(wins is not None), 0, 0)
+                                  for card_id in set(card_ids)))
+
+    def _save_sideboard(self, cube, row):
+        # [user, timestamp, *sideboard]; belongs to the latest matching maindeck.
+        user, timestamp = row[:2]
+        found = self.connection.execute(
+            "SELECT id FROM submissions WHERE cube = ? AND kind = 'deck' AND user = ? "
+            "AND timestamp = ? ORDER BY id DESC LIMIT 1", (cube, user, timestamp)).fetchone()
+        submission_id = found[0] if found else self._add_submission(cube, "deck", user,
+                                                                    timestamp)
+        maindeck = {card_id for (card_id,) in self.connection.execute(
+            "SELECT card_id FROM deck_cards WHERE submission_id = ? AND board = 'main'",
+            (submission_id,))}
+        card_ids = self._add_deck_cards(submission_id, row[2:], "side")
+        self._add_to_stats(cube, ((card_id, 1, 0, 0, 0, 0, 0)
+                                  for card_id in set(card_ids) - maindeck))
+
+    def _save_draft(self, cube, rows):
+        # One [timestamp, player, *picks] row per seat, then a blank separator row.
+        # (Batched writers may have merged several drafts into one append.)
+        seats = []
+        for row in rows:
+            if len(row) >= 2:
+                seats.append(row)
+            elif seats:
+                self._save_seats(cube, seats)
+                seats = []
+        if seats:
+            self._save_seats(cube, seats)
+
+    def _save_seats(self, cube, seats):
+        submission_id = self._add_submission(cube, "draft", None, seats[0][0])
+        for seat, row in enumerate(seats):
+            card_ids = self.card_ids(row[2:])
+            self.connection.executemany(
+                "INSERT INTO picks (submission_id, seat, player, pick_number, card_id) "
+                "VALUES (?, ?, ?, ?, ?)",
+                ((submission_id, seat, row[1], pick_number, card_id)
+                 for pick_number, card_id in enumerate(card_ids, start=1)))
+            self._add_to_stats(cube, ((card_id, 0, 0, 0, 0, 1, pick_number)
+                                      for pick_number, card_id in enumerate(card_ids, start=1)))
+
+    def rebuild_card_stats(self):
+        """Recomputes card_stats from every saved submission."""
+        with self.connection:
+            self.connection.execute("DELETE FROM card_stats")
+            self.connection.execute(STATS_REBUILD)
+
+    def card_statistics(self, cube: str, statistic: str = "maindeck_rate", limit: int = 10,
+                        bottom: bool = False, min_samples: int = 1):
+        """Returns [(card name, value, number of observations)] for the best (or, with
+        bottom=True, worst) cards in a cube by one of CARD_STATISTICS, read from the
+        running totals. Cards with fewer than min_samples observations are left out."""
+        value, samples, order = CARD_STATISTICS[statistic]
+        if bottom:
+            order = "ASC" if order == "DESC" else "DESC"
+        return self.connection.execute(
+            f"SELECT cards.name, {value}, {samples} "
+            "FROM card_stats JOIN cards ON cards.id = card_stats.card_id "
+            f"WHERE cube = ? AND {samples} >= ? AND {samples} > 0 "
+            f"ORDER BY 2 {order}, 3 DESC LIMIT ?", (cube, min_samples, limit)).fetchall()
+
+    def maindeck_counts(self, cube: str, since: str = ""):
+        """Returns [(card name, times maindecked, number of decks with it in the main or
+        sideboard)] for decks of a cube, optionally only those from `since`
+        ('%Y-%m-%d %H:%M') on."""
+        return self.connection.execute(
+            "SELECT cards.name, SUM(deck_cards.board = 'main'), "
+            "COUNT(DISTINCT deck_cards.submission_id) "
+            "FROM submissions JOIN deck_cards ON deck_cards.submission_id = submissions.id "
+            "JOIN cards ON cards.id = deck_cards.card_id "
+            "WHERE submissions.cube = ? AND submissions.timestamp >= ? "
+            "GROUP BY cards.id ORDER BY 2 DESC", (cube, since)).fetchall()
+
+    def average_pick_positions(self, cube: str, since: str = ""):
+        """Returns [(card name, average pick number, times picked)] for drafts of a cube."""
+        return self.connection.execute(
+            "SELECT cards.name, AVG(picks.pick_number), COUNT(*) "
+            "FROM submissions JOIN picks ON picks.submission_id = submissions.id "
+            "JOIN cards ON cards.id = picks.card_id "
+            "WHERE submissions.cube = ? AND submissions.timestamp >= ? "
+            "GROUP BY cards.id ORDER BY 2", (cube, since)).fetchall()
+
+
+class MirroredDraftDataSaver:
+    """Writes to a primary saver, then mirrors the same rows to other savers (for example a
+    SheetWriteQueue in front of the Google Sheet). Returns the primary's result, so callers
+    don't wait on the mirrors; mirror failures are only logged.
+
+    With an executor, the primary write runs there instead, and write_to_sheet returns a
+    future for it; this must then be called from within the running event loop. Use a
+    single-threaded executor for a SQLiteDraftDataSaver, so its transactions don't overlap."""
+
+    def __init__(self, primary, *mirrors, executor=None):
+        self.primary = primary
+        self.mirrors = mirrors
+        self.executor = executor
+
+    def write_to_sheet(self, cell_data, spreadsheet_id, location):
+        """Saves a 2D array of data to the primary saver and every mirror."""
+        if self.executor is not None:
+            result = asyncio.get_event_loop().run_in_executor(
+                self.executor, self.primary.write_to_sheet, cell_data, spreadsheet_id, location)
+        else:
+            result = self.primary.write_to_sheet(cell_data, spreadsheet_id, location)
+        for mirror in self.mirrors:
+            mirrored = mirror.write_to_sheet(cell_data, spreadsheet_id, location)
+            if hasattr(mirrored, "add_done_callback"):
+                mirrored.add_done_callback(_log_mirror_failure)
+        return result
+
+
+def _log_mirror_failure(future):
+    if not future.cancelled() and future.exception() is not None:
+        print(f"Couldn't mirror a write: {future.exception()!r}")
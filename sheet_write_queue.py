@@ -0,0 +1,159 @@
+"""An asyncio queue that batches spreadsheet writes and sends them off the event loop."""
+
+import asyncio
+from collections import OrderedDict
+
+# HTTP statuses from the Sheets API that are worth retrying.
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+
+def is_retryable(exception: Exception):
+    """Is this failure transient (rate limiting, server trouble, dropped connection)?"""
+    status = getattr(getattr(exception, "resp", None), "status", None)
+    if status is not None:
+        return int(status) in RETRYABLE_STATUSES
+    return isinstance(exception, (OSError, TimeoutError))
+
+
+class SheetWriteQueue:
+    """Collects appends from the bot's coroutines and writes them in the background.
+
+    write_to_sheet has the same signature as GoogleDraftDataSaver.write_to_sheet, so a
+    SheetWriteQueue can be passed anywhere a saver is expected. Instead of blocking, it
+    returns a future that resolves once the rows have been written.
+
+    The worker waits `linger` seconds after the first pending append so that the writes
+    from one submission (draft seats, maindecks, sideboards) can be grouped. Appends to
+    the same location are concatenated into one append, and all the appends for one
+    spreadsheet are sent as one batch request from a worker thread. Transient failures
+    are retried with exponential backoff, without touching the event loop."""
+
+    def __init__(self, saver, linger: float = 0.5, max_retries: int = 5,
+                 backoff: float = 1.0, executor=None):
+        self.saver = saver
+        self.linger = linger
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.executor = executor
+        self._queue = None
+        self._worker = None
+
+    def start(self):
+        """Starts the background worker. Must be called from within the running event loop."""
+        if self._worker is None or self._worker.done():
+            if self._queue is None:
+                self._queue = asyncio.Queue()
+            self._worker = asyncio.ensure_future(self._run())
+
+    @property
+    def depth(self):
+        """The number of appends waiting to be sent."""
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def write_to_sheet(self, cell_data, spreadsheet_id, location):
+        """Queues a 2D array of data to be appended to the specified sheet location.
+        Returns a future that resolves when the data has been written."""
+        future = asyncio.get_event_loop().create_future()
+        if not spreadsheet_id or not location:
+            future.set_result(None)
+            return future
+        self.start()
+        self._queue.put_nowait((spreadsheet_id, location, cell_data, future))
+        return future
+
+    async def join(self):
+        """Waits until every queued append has been written (or has failed)."""
+        if self._queue is not None:
+            await self._queue.join()
+
+    async def close(self):
+        """Flushes the queue and stops the background worker."""
+        await self.join()
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+
+    async def _run(self):
+        while True:
+            pending = [await self._queue.get()]
+            if self.linger:
+                await asyncio.sleep(self.linger)
+            while not self._queue.empty():
+                pending.append(self._queue.get_nowait())
+            try:
+                by_spreadsheet = OrderedDict()
+                for spreadsheet_id, location, cell_data, future in pending:
+                    locations = by_spreadsheet.setdefault(spreadsheet_id, OrderedDict())
+                    rows, futures = locations.setdefault(location, ([], []))
+                    rows.extend(cell_data)
+                    futures.append(future)
+                await asyncio.gather(*[self._write_spreadsheet(spreadsheet_id, locations)
+                                       for spreadsheet_id, locations
+                                       in by_spreadsheet.items()])
+            finally:
+                for _ in pending:
+                    self._queue.task_done()
+
+    async def _write_spreadsheet(self, spreadsheet_id, locations):
+        """Writes every pending location for one spreadsheet, retrying the ones that fail."""
+        loop = asyncio.get_event_loop()
+        remaining = list(locations.items())
+        attempt = 0
+        while remaining:
+            appends = [(rows, location) for location, (rows, _) in remaining]
+            try:
+                results = await loop.run_in_executor(self.executor, self.saver.write_batch,
+                                                     appends, spreadsheet_id)
+            except Exception as ex:  # pylint: disable=broad-except
+                results = [ex] * len(appends)
+            failed = []
+            for (location, (rows, futures)), exception in zip(remaining, results):
+                if exception is None:
+                    _resolve(futures, None)
+                elif attempt < self.max_retries and is_retryable(exception):
+                    failed.append((location, (rows, futures)))
+                else:
+                    _resolve(futures, exception)
+            remaining = failed
+            if remaining:
+                await asyncio.sleep(self.backoff * 2 ** attempt)
+                attempt += 1
+
+
+def _resolve(futures, exception):
+    for future in futures:
+        if future.done():
+            continue
+        if exception is None:
+            future.set_result(None)
+        else:
+            future.set_exception(exception)
+
+
+class BufferedSheetWriter:
+    """A synchronous counterpart to SheetWriteQueue for batch jobs: write_to_sheet only
+    buffers the rows, and flush() sends everything as one write_batch per spreadsheet."""
+
+    def __init__(self, saver):
+        self.saver = saver
+        self.pending = OrderedDict()
+
+    def write_to_sheet(self, cell_data, spreadsheet_id, location):
+        """Buffers a 2D array of data to be appended to the specified sheet location."""
+        if not spreadsheet_id or not location:
+            return
+        locations = self.pending.setdefault(spreadsheet_id, OrderedDict())
+        locations.setdefault(location, []).extend(cell_data)
+
+    def flush(self):
+        """Writes every buffered row. Raises the first error any append reported."""
+        pending, self.pending = self.pending, OrderedDict()
+        for spreadsheet_id, locations in pending.items():
+            appends = [(rows, location) for location, rows in locations.items()]
+            for exception in self.saver.write_batch(appends, spreadsheet_id):
+                if exception is not None:
+                    raise exception
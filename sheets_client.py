@@ -0,0 +1,203 @@
+"""A thread-safe, pooled client for the Google Sheets API, shared by the savers that write
+to Google Sheets."""
+
+import os
+import json
+import time
+import queue
+import pickle
+import datetime
+import threading
+from contextlib import contextmanager
+from typing import Callable
+
+import httplib2
+import google_auth_httplib2
+from googleapiclient.discovery import build_from_document
+from google.auth.transport.requests import Request
+
+DISCOVERY_URL = "https://sheets.googleapis.com/$discovery/rest?version=v4"
+DISCOVERY_CACHE_PATH = "config/sheets_v4_discovery.json"
+SCOPES = ['https://www.googleapis.com/auth/spreadsheets']
+# Sheets allows 60 write requests per minute per user; a batch counts once per append.
+REQUESTS_PER_MINUTE = 60
+# Refresh the access token this many seconds before it expires.
+REFRESH_MARGIN = 5 * 60
+
+
+def load_credentials(token_path: str = "token.pickle", secrets_path: str = "credentials.json"):
+    """Returns the saved OAuth credentials, refreshing them or logging in (and saving the
+    result) if they aren't valid."""
+    # pylint: disable=import-outside-toplevel
+    from google_auth_oauthlib.flow import InstalledAppFlow
+    creds = None
+    # The token file stores the user's access and refresh tokens, and is created
+    # automatically when the authorization flow completes for the first time.
+    if os.path.exists(token_path):
+        with open(token_path, 'rb') as token:
+            creds = pickle.load(token)
+    # If there are no (valid) credentials available, let the user log in.
+    if not creds or not creds.valid:
+        if creds and creds.expired and creds.refresh_token:
+            creds.refresh(Request())
+        else:
+            flow = InstalledAppFlow.from_client_secrets_file(secrets_path, SCOPES)
+            creds = flow.run_local_server(port=0)
+        save_credentials(creds, token_path)
+    return creds
+
+
+def save_credentials(creds, token_path: str = "token.pickle"):
+    """Saves credentials for the next run."""
+    with open(token_path, 'wb') as token:
+        pickle.dump(creds, token)
+
+
+def load_discovery_document(cache_path: str = DISCOVERY_CACHE_PATH, url: str = DISCOVERY_URL):
+    """Returns the Sheets API discovery document, fetching it only if it isn't cached."""
+    if os.path.exists(cache_path):
+        with open(cache_path, 'r', encoding='utf-8') as cache_file:
+            return json.load(cache_file)
+    response, content = httplib2.Http(timeout=30).request(url)
+    if response.status != 200:
+        raise OSError(f"Couldn't fetch the Sheets discovery document: HTTP {response.status}")
+    document = json.loads(content)
+    if os.path.dirname(cache_path):
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    with open(cache_path, 'w', encoding='utf-8') as cache_file:
+        json.dump(document, cache_file)
+    return document
+
+
+class RateLimiter:
+    """A thread-safe token bucket: `rate` requests per second on average, in bursts of at
+    most `burst`. acquire() waits for room rather than letting requests fail on quota."""
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, count: int = 1):
+        """Blocks until `count` requests can be sent. Returns how long it waited."""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                # A request bigger than the bucket goes once the bucket is full.
+                needed = min(count, self.burst)
+                if self.tokens >= needed:
+                    self.tokens -= count
+                    return waited
+                delay = (needed - self.tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+
+class SheetsClient:
+    """Hands out Sheets API service objects from a pool, one thread at a time.
+
+    httplib2 connections aren't thread-safe, so each pooled service has its own, all
+    sharing one set of credentials. Nothing is loaded until setup() or the first session():
+    the credentials come from `get_credentials` (by default, load_credentials) and the API
+    description from a cached discovery document, so no discovery request is made once
+    the cache exists. start_refresh() keeps the access token fresh from a background
+    thread, and `limiter` paces requests to stay within the Sheets quota.
+
+    root_url points the client at another server (such as a local fake in tests)."""
+    def __init__(self, get_credentials: Callable = load_credentials, pool_size: int = 4,
+                 requests_per_minute: float = REQUESTS_PER_MINUTE, burst: int = 10,
+                 discovery_cache_path: str = DISCOVERY_CACHE_PATH, root_url: str = None,
+                 on_refresh: Callable = save_credentials):
+        self.get_credentials = get_credentials
+        self.pool_size = pool_size
+        self.discovery_cache_path = discovery_cache_path
+        self.root_url = root_url
+        self.on_refresh = on_refresh
+        self.limiter = RateLimiter(requests_per_minute / 60, burst)
+        self.credentials = None
+        self._document = None
+        self._pool = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._stop_refresh = threading.Event()
+        self._refresh_thread = None
+
+    def setup(self):
+        """Loads the credentials and the discovery document, if they aren't loaded yet.
+        Long-running callers should call this at startup: logging in may wait on a browser,
+        which would otherwise block whichever thread writes first."""
+        with self._lock:
+            if self.credentials is None:
+                self.credentials = self.get_credentials()
+            if self._document is None:
+                document = load_discovery_document(self.discovery_cache_path)
+                if self.root_url:
+                    document = dict(document, rootUrl=self.root_url,
+                                    baseUrl=self.root_url + document.get("servicePath", ""))
+                self._document = document
+
+    def _new_service(self):
+        http = google_auth_httplib2.AuthorizedHttp(self.credentials,
+                                                   http=httplib2.Http(timeout=60))
+        return build_from_document(self._document, http=http)
+
+    @contextmanager
+    def session(self):
+        """A context manager giving a service object for this thread's exclusive use.
+        Waits for one to be returned if pool_size are already in use."""
+        if self._document is None:
+            self.setup()
+        try:
+            service = self._pool.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                create = self._created < self.pool_size
+                if create:
+                    self._created += 1
+            service = self._new_service() if create else self._pool.get()
+        try:
+            yield service
+        finally:
+            self._pool.put(service)
+
+    def refresh_if_expiring(self, margin: float = REFRESH_MARGIN):
+        """Refreshes the access token if it expires within `margin` seconds.
+        Returns whether it was refreshed."""
+        if self.credentials is None:
+            self.setup()
+        with self._refresh_lock:
+            expiry = self.credentials.expiry
+            now = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+            # google-auth keeps expiry as a naive UTC datetime.
+            if expiry is not None and (expiry - now).total_seconds() > margin:
+                return False
+            self.credentials.refresh(Request())
+            if self.on_refresh is not None:
+                self.on_refresh(self.credentials)
+            return True
+
+    def start_refresh(self, interval: float = 60, margin: float = REFRESH_MARGIN):
+        """Starts a daemon thread that checks the token every `interval` seconds."""
+        if self._refresh_thread is not None:
+            return
+        def run():
+            while not self._stop_refresh.wait(interval):
+                try:
+                    self.refresh_if_expiring(margin)
+                except Exception as ex:  # pylint: disable=broad-except
+                    print(f"Couldn't refresh the Google credentials: {ex!r}")
+        self._refresh_thread = threading.Thread(target=run, name="sheets-token-refresh",
+                                                daemon=True)
+        self._refresh_thread.start()
+
+    def stop_refresh(self):
+        """Stops the background refresh thread."""
+        self._stop_refresh.set()
+        if self._refresh_thread is not None:
+            self._refresh_thread.join()
+            self._refresh_thread = None
@@ -0,0 +1,90 @@
+"""A persistent, bounded record of submissions that have already been saved."""
+
+import time
+import datetime
+import hashlib
+import sqlite3
+from typing import Optional
+
+from draftdata import DraftData, DeckList
+
+
+def content_key(data: DraftData):
+    """A hash of what a submission records: its kind, user, timestamp, and the multiset
+    of its cards (order and capitalisation don't matter)."""
+    kind = "deck" if isinstance(data, DeckList) else "draftlog"
+    cards = sorted(name.casefold() for name in data.card_list())
+    digest = hashlib.sha256()
+    for part in [kind, data.user, data.timestamp] + cards:
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def raw_key(user: str, timestamp: datetime.datetime, contents: bytes, *context: str):
+    """A hash of an uploaded file, its uploader, the timestamp it would be recorded with and
+    anything else that affects what gets recorded (such as the message text the win count is
+    read from), checked before parsing. It covers everything content_key does, so a match
+    never rejects a submission whose content_key is new."""
+    digest = hashlib.sha256()
+    for part in (user, timestamp.isoformat()) + context:
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    digest.update(contents)
+    return digest.hexdigest()
+
+
+class SubmissionCache:
+    """Remembers which submissions have been recorded, by content_key and, where known, the
+    raw_key of the file they came from. Backed by SQLite so it survives restarts; once it
+    holds more than max_size entries, the least recently seen are forgotten."""
+
+    def __init__(self, path: str = "submission_cache.db", max_size: int = 10000):
+        self.max_size = max_size
+        self.connection = sqlite3.connect(path)
+        with self.connection:
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS recorded ("
+                "content_key TEXT PRIMARY KEY, raw_key TEXT, "
+                "recorded_at REAL NOT NULL, last_seen REAL NOT NULL)")
+            self.connection.execute(
+                "CREATE INDEX IF NOT EXISTS recorded_raw_key ON recorded (raw_key)")
+            self.connection.execute(
+                "CREATE INDEX IF NOT EXISTS recorded_last_seen ON recorded (last_seen)")
+
+    def _lookup(self, column: str, key: str) -> Optional[float]:
+        row = self.connection.execute(
+            f"SELECT recorded_at FROM recorded WHERE {column} = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        with self.connection:
+            self.connection.execute(f"UPDATE recorded SET last_seen = ? WHERE {column} = ?",
+                                    (time.time(), key))
+        return row[0]
+
+    def lookup_raw(self, key: str) -> Optional[float]:
+        """Returns when the file with this raw_key was recorded, or None."""
+        return self._lookup("raw_key", key)
+
+    def lookup(self, key: str) -> Optional[float]:
+        """Returns when the submission with this content_key was recorded, or None."""
+        return self._lookup("content_key", key)
+
+    def add(self, key: str, raw: str = None):
+        """Records a submission by its content_key (and its file's raw_key, if known)."""
+        now = time.time()
+        with self.connection:
+            self.connection.execute(
+                "INSERT INTO recorded (content_key, raw_key, recorded_at, last_seen) "
+                "VALUES (?, ?, ?, ?) ON CONFLICT (content_key) DO UPDATE SET "
+                "raw_key = IFNULL(excluded.raw_key, raw_key), last_seen = excluded.last_seen",
+                (key, raw, now, now))
+            overflow = len(self) - self.max_size
+            if overflow > 0:
+                self.connection.execute(
+                    "DELETE FROM recorded WHERE content_key IN "
+                    "(SELECT content_key FROM recorded ORDER BY last_seen LIMIT ?)",
+                    (overflow,))
+
+    def __len__(self):
+        return self.connection.execute("SELECT COUNT(*) FROM recorded").fetchone()[0]
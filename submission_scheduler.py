@@ -0,0 +1,139 @@
+"""Runs submissions a few at a time, taking turns between users, so a burst of posts
+doesn't start a download, parse and write for every message at once."""
+
+import time
+import asyncio
+from collections import OrderedDict, deque
+from typing import Any, Awaitable, Callable, Hashable, NamedTuple
+
+# What submit() did with a submission (see Admission).
+STARTED, QUEUED, COALESCED, SHED = "started", "queued", "coalesced", "shed"
+
+
+class Admission(NamedTuple):
+    """The outcome of SubmissionScheduler.submit().
+
+    status is STARTED (it's being handled now), QUEUED (it's waiting, with `position`
+    submissions to be handled before it), COALESCED (it took the place of `replaced`,
+    the same user's earlier waiting post of the same submission) or SHED (the backlog,
+    or the user's share of it, was full, so it was dropped)."""
+    status: str
+    position: int = 0
+    replaced: Any = None
+
+
+class SubmissionScheduler:
+    """Hands submissions to `handle` (a coroutine function taking one submission), with
+    at most `concurrency` of them being handled at once.
+
+    Each user has their own queue, and waiting users take turns, one submission each,
+    so one user posting many decks can't hold up everyone else. A user only has one
+    submission handled at a time, and theirs are handled in the order they were posted.
+
+    A repost of a waiting submission (one with the same `key`) within `coalesce_window`
+    seconds replaces it. Other submissions are queued, unless the user already has
+    `max_per_user` waiting or `max_backlog` submissions are waiting in all, in which case
+    they're shed."""
+
+    def __init__(self, handle: Callable[[Any], Awaitable], concurrency: int = 2,
+                 max_backlog: int = 50, coalesce_window: float = 30,
+                 max_per_user: int = 3, clock: Callable[[], float] = time.monotonic):
+        self.handle = handle
+        self.concurrency = concurrency
+        self.max_backlog = max_backlog
+        self.coalesce_window = coalesce_window
+        self.max_per_user = max_per_user
+        self.clock = clock
+        # User -> deque of [submission, key, when it was submitted], in turn order.
+        self._waiting = OrderedDict()
+        self._running = set()
+        self._tasks = set()
+        self._idle = None
+
+    @property
+    def depth(self):
+        """The number of submissions waiting to be handled."""
+        return sum(len(queue) for queue in self._waiting.values())
+
+    @property
+    def active(self):
+        """The number of submissions being handled."""
+        return len(self._tasks)
+
+    def submit(self, user: Hashable, submission, key: Hashable = None) -> Admission:
+        """Schedules a submission from a user. `key` identifies what was submitted (such as
+        the attachment's name and size), so reposts can be recognised; without one, nothing
+        is coalesced. Must be called from within the running event loop. Returns an
+        Admission saying whether it started, is waiting, replaced a repost or was shed."""
+        now = self.clock()
+        queue = self._waiting.get(user, ())
+        if key is not None:
+            for index, waiting in enumerate(queue):
+                if waiting[1] == key and now - waiting[2] < self.coalesce_window:
+                    replaced = waiting[0]
+                    waiting[0], waiting[2] = submission, now
+                    return Admission(COALESCED, self._position(user, index), replaced)
+        if len(queue) >= self.max_per_user or self.depth >= self.max_backlog:
+            return Admission(SHED)
+        entry = [submission, key, now]
+        self._waiting.setdefault(user, deque()).append(entry)
+        self._dispatch()
+        queue = self._waiting.get(user)
+        if queue and any(waiting is entry for waiting in queue):
+            return Admission(QUEUED, self._position(user, len(queue) - 1))
+        return Admission(STARTED)
+
+    async def join(self):
+        """Waits until every scheduled submission has been handled."""
+        while self._tasks or self._waiting:
+            if self._idle is None:
+                self._idle = asyncio.get_event_loop().create_future()
+            await asyncio.shield(self._idle)
+
+    def _position(self, user: Hashable, index: int):
+        """How many submissions will be handled before the user's `index`th waiting one:
+        up to index + 1 from each user whose turn comes first, and up to index from the rest,
+        plus any that are being handled. Users with a submission being handled are skipped
+        by _dispatch and go to the back when it finishes, so their turns come last."""
+        ahead = self.active
+        before = True
+        turn_order = sorted(self._waiting.items(), key=lambda item: item[0] in self._running)
+        for other, queue in turn_order:
+            if other == user:
+                before = False
+                ahead += index
+            else:
+                ahead += min(len(queue), index + 1 if before else index)
+        return ahead
+
+    def _dispatch(self):
+        """Starts waiting submissions while there are free slots, taking one from each
+        user in turn (skipping users who already have one being handled)."""
+        while len(self._tasks) < self.concurrency:
+            user = next((user for user in self._waiting if user not in self._running), None)
+            if user is None:
+                break
+            queue = self._waiting[user]
+            submission = queue.popleft()[0]
+            if queue:
+                self._waiting.move_to_end(user)
+            else:
+                del self._waiting[user]
+            self._running.add(user)
+            task = asyncio.ensure_future(self._run(user, submission))
+            self._tasks.add(task)
+
+    async def _run(self, user: Hashable, submission):
+        try:
+            await self.handle(submission)
+        except Exception as ex:  # pylint: disable=broad-except
+            print(f"Couldn't handle a submission from {user}: {ex!r}")
+        finally:
+            self._running.discard(user)
+            if user in self._waiting:  # They've just had their turn.
+                self._waiting.move_to_end(user)
+            self._tasks.discard(asyncio.current_task())
+            self._dispatch()
+            if not self._tasks and not self._waiting and self._idle is not None:
+                self._idle.set_result(None)
+                self._idle = None
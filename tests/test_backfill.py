@@ -0,0 +1,118 @@
+import os
+import csv
+import json
+import zipfile
+import itertools
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from save_to_csv import CsvDraftDataSaver
+from sheet_write_queue import BufferedSheetWriter
+from utils.backfill import backfill, iter_submission_files, map_bounded
+
+RED_DECK = "Deck\n1 Shock\n2 Lightning Bolt\n\nSideboard\n1 Fireblast\n"
+MIXED_DECK = "Deck\n1 Shock\n1 Counterspell\n"
+SUBMISSIONS = {"red.txt": RED_DECK, "mixed.txt": MIXED_DECK, "empty.txt": "",
+               "broken.json": '{"users": 5}', "notes.md": "Not a submission."}
+
+
+@pytest.fixture
+def cube_file(tmp_path):
+    def info(prefix):
+        return {"spreadsheet_id": prefix, "maindeck": "Decks!A1", "sideboard": "Sideboards!A1",
+                "draftlog": "Drafts!A1"}
+    path = tmp_path / "cubes.json"
+    path.write_text(json.dumps({
+        "Red": {"cards": ["Shock", "Lightning Bolt", "Fireblast"], "cube_cobra_id": "red",
+                "submission_info": info("red")},
+        "Blue": {"cards": ["Counterspell", "Brainstorm"], "cube_cobra_id": "blue",
+                 "submission_info": info("blue")},
+    }))
+    return str(path)
+
+
+@pytest.fixture(params=["directory", "zip"])
+def submissions(request, tmp_path):
+    directory = tmp_path / "submissions"
+    directory.mkdir()
+    for name, contents in SUBMISSIONS.items():
+        (directory / name).write_text(contents)
+    if request.param == "directory":
+        return str(directory)
+    archive_path = str(tmp_path / "submissions.zip")
+    with zipfile.ZipFile(archive_path, "w") as archive:
+        for name, contents in SUBMISSIONS.items():
+            archive.writestr(name, contents)
+    return archive_path
+
+
+def read_rows(path):
+    with open(path, newline='', encoding='utf-8') as csv_file:
+        return list(csv.reader(csv_file))
+
+
+def test_iter_submission_files(submissions):
+    files = {os.path.basename(name): contents
+             for name, _, contents in iter_submission_files(submissions)}
+    assert files == {name: contents.encode() for name, contents in SUBMISSIONS.items()
+                     if not name.endswith(".md")}
+
+
+def test_backfill(submissions, cube_file, tmp_path):
+    output = str(tmp_path / "output")
+    saver = CsvDraftDataSaver(output)
+    counts = backfill(submissions, saver, os.path.join(output, "unmatched.csv"), cube_file,
+                      workers=1)
+
+    assert (counts["files"], counts["saved"], counts["unmatched"], counts["errors"]) == \
+        (4, 1, 1, 2)
+    maindecks = read_rows(saver.path_for("red", "Decks!A1"))
+    assert len(maindecks) == 1 and maindecks[0][0] == "Backfill"
+    assert "Shock" in maindecks[0] and "Lightning Bolt" in maindecks[0]
+    assert os.path.exists(saver.path_for("red", "Sideboards!A1"))
+    report = {os.path.basename(row[0]): row[1]
+              for row in read_rows(os.path.join(output, "unmatched.csv"))[1:]}
+    assert report["mixed.txt"] == "unmatched"
+    assert report["empty.txt"] == "File is empty."
+    assert "broken.json" in report
+
+
+def test_buffered_writer_groups_rows_per_location(tmp_path):
+    class RecordingSaver(CsvDraftDataSaver):
+        def __init__(self, directory):
+            super().__init__(directory)
+            self.batches = []
+
+        def write_batch(self, appends, spreadsheet_id):
+            self.batches.append((spreadsheet_id, [location for _, location in appends]))
+            return super().write_batch(appends, spreadsheet_id)
+
+    saver = RecordingSaver(str(tmp_path))
+    writer = BufferedSheetWriter(saver)
+    writer.write_to_sheet([["a"]], "sheet", "Decks!A1")
+    writer.write_to_sheet([["b"]], "sheet", "Sideboards!A1")
+    writer.write_to_sheet([["c"]], "sheet", "Decks!A1")
+    writer.write_to_sheet([["ignored"]], "", "Decks!A1")
+    assert saver.batches == []
+    writer.flush()
+
+    assert saver.batches == [("sheet", ["Decks!A1", "Sideboards!A1"])]
+    assert read_rows(saver.path_for("sheet", "Decks!A1")) == [["a"], ["c"]]
+
+
+def test_map_bounded_reads_ahead_at_most_the_window():
+    read = []
+
+    def items():
+        for i in itertools.count():
+            if i == 100:
+                return
+            read.append(i)
+            yield i
+
+    with ThreadPoolExecutor(2) as executor:
+        results = map_bounded(executor, lambda x: x * 2, items(), window=4)
+        assert next(results) == 0
+        assert len(read) <= 5
+        assert list(results) == [i * 2 for i in range(1, 100)]
@@ -0,0 +1,70 @@
+import datetime
+
+from draftdata import DeckList
+from models.carddictionary import CARD_DICTIONARY
+from models.cardnames import CardNameIndex, normalize_card_name
+from models.cubelist import Cube, CubeList, CubeSubmissionInfo
+
+
+def make_cube_list():
+    info = CubeSubmissionInfo("", "", "", "")
+    return CubeList({
+        "Vintage": Cube(["Fire // Ice", "Lim-Dûl's Vault", "Æther Vial", "Counterspell"],
+                        "vintage", info),
+        "Pauper": Cube(["Fire // Ice", "Counterspell", "Pestilence"], "pauper", info),
+    })
+
+
+def test_normalize_card_name():
+    assert normalize_card_name("Fire ////  Ice") == normalize_card_name("fire // ice")
+    assert normalize_card_name("LIM-DUL’S VAULT") == normalize_card_name("Lim-Dûl's Vault")
+    assert normalize_card_name("Aether Vial") == normalize_card_name("Æther Vial")
+
+
+def test_resolve():
+    index = CardNameIndex(CARD_DICTIONARY.ids_for(["Fire // Ice", "Counterspell",
+                                                   "Cryptic Command"]),
+                          aliases={"Arena Counterspell": "Counterspell"})
+    assert index.resolve("Fire") == CARD_DICTIONARY.id_for("Fire // Ice")
+    assert index.resolve("Arena Counterspell") == CARD_DICTIONARY.id_for("Counterspell")
+    # Misspellings are only suggestions.
+    assert index.resolve("Counterspel") is None
+    assert index.closest("Counterspel") == CARD_DICTIONARY.id_for("Counterspell")
+    assert index.closest("Lightning Bolt") is None
+
+
+def test_get_near_matches_reports_substitutions():
+    cube_list = make_cube_list()
+    assert cube_list.get_matches(["Fire //// Ice", "Pestilence"]) == []
+    matches, substitutions = cube_list.get_near_matches(["Fire //// Ice", "Pestilence"])
+    assert matches == ["Pauper"]
+    assert substitutions == {"Fire //// Ice": "Fire // Ice"}
+    # Exact matches don't substitute anything.
+    assert cube_list.get_near_matches(["Counterspell"]) == (["Vintage", "Pauper"], {})
+    # Cards that are in some cube are never replaced.
+    assert cube_list.get_near_matches(["Aether Vial", "Pestilence"]) == ([], {})
+
+
+def test_match_cubes_corrects_the_deck():
+    deck = DeckList("user", datetime.datetime(2022, 2, 26), maindeck=["Lim-Dul's Vault"],
+                    sideboard=["Aether Vial"])
+    assert deck.match_cubes(make_cube_list()) == ["Vintage"]
+    assert deck.maindeck == ["Lim-Dûl's Vault"] and deck.sideboard == ["Æther Vial"]
+    assert deck.substitutions == {"Lim-Dul's Vault": "Lim-Dûl's Vault",
+                                  "Aether Vial": "Æther Vial"}
+
+
+def test_similar_cards_are_suggested_but_not_substituted():
+    info = CubeSubmissionInfo("", "", "", "")
+    cube_list = CubeList({
+        "Pauper": Cube(["Goblin Guidepost", "Goblin Bombardier", "Shock"], "pauper", info),
+        "Vintage": Cube(["Black Lotus", "Shock"], "vintage", info),
+    })
+    deck = DeckList("user", datetime.datetime(2022, 2, 26),
+                    maindeck=["Goblin Guide", "Goblin Bombardment", "Shock"])
+    assert deck.match_cubes(cube_list) == []
+    assert deck.maindeck == ["Goblin Guide", "Goblin Bombardment", "Shock"]
+    assert deck.substitutions == {}
+    assert deck.suggestions == {"Goblin Guide": "Goblin Guidepost",
+                                "Goblin Bombardment": "Goblin Bombardier"}
+    assert cube_list.get_near_matches(["Goblin Guide", "Shock"]) == ([], {})
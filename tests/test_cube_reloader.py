@@ -0,0 +1,53 @@
+import os
+import json
+
+from utils.cube_reloader import CubeListReloader, ReloadStats
+
+INFO = {"spreadsheet_id": "sheet", "maindeck": "Decks!A1", "sideboard": "Sideboards!A1",
+        "draftlog": "Drafts!A1"}
+
+
+def write_cubes(path, cards, mtime_ns=None):
+    path.write_text(json.dumps({"Vintage": {"cards": cards, "cube_cobra_id": "vintage",
+                                            "submission_info": INFO}}))
+    if mtime_ns is not None:
+        os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+def test_has_changed_tracks_the_mtime(tmp_path):
+    path = tmp_path / "cubes.json"
+    reloader = CubeListReloader(str(path))
+    assert not reloader.has_changed()  # No file yet.
+
+    write_cubes(path, ["Shock"], mtime_ns=1_000_000_000_000)
+    assert reloader.has_changed()
+    reloader.reload()
+    assert not reloader.has_changed()
+
+    write_cubes(path, ["Shock", "Black Lotus"], mtime_ns=2_000_000_000_000)
+    assert reloader.has_changed()
+
+
+def test_reload_swaps_in_a_new_list(tmp_path):
+    path = tmp_path / "cubes.json"
+    write_cubes(path, ["Shock"], mtime_ns=1_000_000_000_000)
+    reloader = CubeListReloader(str(path))
+    old_list, _ = reloader.reload()
+    in_use = old_list  # A reference taken by a submission that's still being matched.
+
+    write_cubes(path, ["Shock", "Black Lotus"], mtime_ns=2_000_000_000_000)
+    new_list, stats = reloader.reload()
+
+    assert new_list is not in_use
+    assert new_list.get_matches(["Black Lotus"]) == ["Vintage"]
+    assert in_use.get_matches(["Black Lotus"]) == []
+    assert in_use.get_matches(["Shock"]) == ["Vintage"]
+    assert isinstance(stats, ReloadStats)
+    assert stats.cube_count == 1 and stats.duration >= 0
+    assert str(stats).startswith("Reloaded 1 cubes in ")
+
+
+def test_reload_stats_without_memory():
+    assert str(ReloadStats(3, 0.0125, None)) == \
+        "Reloaded 3 cubes in 12 ms (memory delta unknown)."
+    assert "+1.0 MiB" in str(ReloadStats(3, 0.0125, 1024 * 1024))
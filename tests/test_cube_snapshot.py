@@ -0,0 +1,73 @@
+import sys
+import hashlib
+import json
+import subprocess
+
+from models.cubelist import CubeList
+from utils.cube_reloader import load_cube_list
+from utils.cube_snapshot import MAGIC, load_snapshot, snapshot_path
+from utils.update_cube_cards import write_cube_list
+
+
+def make_cubes_json(prefix):
+    info = {"spreadsheet_id": "sheet", "maindeck": "Decks!A1", "sideboard": "Sideboards!A1",
+            "draftlog": "Drafts!A1"}
+    return {"Vintage": {"cards": [f"{prefix} {i}" for i in range(0, 30)] + ["Fire // Ice"],
+                        "cube_cobra_id": "vintage", "submission_info": info},
+            "Pauper": {"cards": [f"{prefix} {i}" for i in range(20, 50)],
+                       "cube_cobra_id": "pauper", "submission_info": info}}
+
+
+def assert_same_cubes(loaded, expected):
+    assert list(loaded) == list(expected)
+    for name, cube in expected.items():
+        assert loaded[name].card_ids == cube.card_ids
+        assert vars(loaded[name].submission_info) == vars(cube.submission_info)
+        assert loaded[name].cube_cobra_id == cube.cube_cobra_id
+    assert loaded.get_matches(["Fire // Ice"]) == ["Vintage"]
+
+
+def test_snapshot_round_trip(tmp_path):
+    cube_file_path = str(tmp_path / "cubes.json")
+    cube_list = CubeList.from_json(make_cubes_json("Snapshot Card"))
+    write_cube_list(cube_list, cube_file_path)
+    assert_same_cubes(load_snapshot(cube_file_path), cube_list)
+    assert_same_cubes(load_cube_list(cube_file_path), cube_list)
+
+
+def test_snapshot_remaps_ids_interned_in_another_order(tmp_path):
+    cube_file_path = str(tmp_path / "cubes.json")
+    write_cube_list(CubeList.from_json(make_cubes_json("Remapped Card")), cube_file_path)
+    # In a fresh process that has already seen some of the cards, in a different order.
+    script = ("import sys, json\n"
+              "from models.carddictionary import CARD_DICTIONARY\n"
+              "from utils.cube_snapshot import load_snapshot\n"
+              "for i in reversed(range(40)):\n"
+              "    CARD_DICTIONARY.id_for(f'Remapped Card {i}')\n"
+              "cube_list = load_snapshot(sys.argv[1])\n"
+              "print(json.dumps({name: sorted(cube.cards) for name, cube in cube_list.items()}))\n")
+    output = subprocess.run([sys.executable, "-c", script, cube_file_path], check=True,
+                            capture_output=True, text=True).stdout
+    expected = make_cubes_json("Remapped Card")
+    assert json.loads(output) == {name: sorted(cube["cards"]) for name, cube in expected.items()}
+
+
+def test_stale_snapshot_is_ignored(tmp_path):
+    cube_file_path = str(tmp_path / "cubes.json")
+    write_cube_list(CubeList.from_json(make_cubes_json("Stale Card")), cube_file_path)
+    edited = make_cubes_json("Stale Card")
+    edited["Pauper"]["cards"].append("Edited Card")
+    with open(cube_file_path, 'w') as cubes_file:
+        json.dump(edited, cubes_file)
+    assert load_snapshot(cube_file_path) is None
+    assert load_cube_list(cube_file_path).get_matches(["Edited Card"]) == ["Pauper"]
+
+
+def test_snapshot_checksum_covers_the_bytes_on_disk(tmp_path):
+    cube_file_path = str(tmp_path / "cubes.json")
+    write_cube_list(CubeList.from_json(make_cubes_json("Lim-Dûl's Card")), cube_file_path)
+    with open(cube_file_path, 'rb') as cubes_file:
+        json_bytes = cubes_file.read()
+    with open(snapshot_path(cube_file_path), 'rb') as snapshot_file:
+        snapshot = snapshot_file.read()
+    assert hashlib.sha256(json_bytes).digest() in snapshot[:len(MAGIC) + 32]
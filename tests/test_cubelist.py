@@ -0,0 +1,84 @@
+import json
+
+from models.cubelist import Cube, CubeList, CubeListEncoder, CubeSubmissionInfo
+
+
+def make_cube_list():
+    info = CubeSubmissionInfo("", "", "", "")
+    return CubeList({
+        "Vintage": Cube(["Shock", "Black Lotus", "Counterspell"], "vintage", info),
+        "Pauper": Cube(["Shock", "Counterspell", "Pestilence"], "pauper", info),
+        "Peasant": Cube(["Shock", "Pestilence"], "peasant", info),
+    })
+
+
+def test_get_matches_uses_running_intersection():
+    cube_list = make_cube_list()
+    assert cube_list.get_matches(["Shock"]) == ["Vintage", "Pauper", "Peasant"]
+    assert cube_list.get_matches(["Shock", "Counterspell"]) == ["Vintage", "Pauper"]
+    assert cube_list.get_matches(["Black Lotus", "Pestilence"]) == []
+
+
+def test_get_matches_ignores_basics():
+    cube_list = make_cube_list()
+    assert cube_list.get_matches(["Island", "Pestilence"]) == ["Pauper", "Peasant"]
+
+
+def test_get_exclusions_reports_offending_cards():
+    cube_list = make_cube_list()
+    exclusions = cube_list.get_exclusions(["Counterspell", "Pestilence", "Forest"])
+    assert exclusions == {"Vintage": ["Pestilence"], "Peasant": ["Counterspell"]}
+
+
+def test_index_is_rebuilt_after_cube_list_changes():
+    cube_list = make_cube_list()
+    assert cube_list.get_matches(["Lightning Bolt"]) == []
+    cube_list["Modern"] = Cube(["Lightning Bolt"], "modern", CubeSubmissionInfo("", "", "", ""))
+    assert cube_list.get_matches(["Lightning Bolt"]) == ["Modern"]
+    del cube_list["Vintage"]
+    assert cube_list.get_matches(["Shock"]) == ["Pauper", "Peasant"]
+
+
+def test_cube_stores_sorted_card_ids():
+    cube = make_cube_list()["Vintage"]
+    assert list(cube.card_ids) == sorted(cube.card_ids)
+    assert sorted(cube.cards) == ["Black Lotus", "Counterspell", "Shock"]
+    cube.cards = ["Ancestral Recall"]
+    assert cube.cards == ["Ancestral Recall"]
+
+
+def test_encoder_writes_card_names():
+    cube_list = make_cube_list()
+    data = json.loads(json.dumps(cube_list.data, cls=CubeListEncoder))
+    assert sorted(data["Peasant"]["cards"]) == ["Pestilence", "Shock"]
+    assert data["Peasant"]["submission_info"]["spreadsheet_id"] == ""
+
+
+def test_set_cube_cards_patches_the_index():
+    cube_list = make_cube_list()
+    cube_list.set_cube_cards("Peasant", ["Counterspell", "Lightning Bolt"])
+    assert cube_list.get_matches(["Pestilence"]) == ["Pauper"]
+    assert cube_list.get_matches(["Counterspell"]) == ["Vintage", "Pauper", "Peasant"]
+    assert cube_list.get_matches(["Lightning Bolt"]) == ["Peasant"]
+    rebuilt = CubeList(cube_list.data)
+    rebuilt.rebuild_index()
+    assert rebuilt.card_index == cube_list.card_index
+
+
+def test_rank_cubes_scores_overlap():
+    cube_list = make_cube_list()
+    scores = cube_list.rank_cubes(["Shock", "Counterspell", "Pestilence", "Island"])
+    assert [score.cube_name for score in scores] == ["Pauper", "Vintage", "Peasant"]
+    assert (scores[0].matched, scores[0].total, scores[0].fraction) == (3, 3, 1.0)
+    assert scores[1].missing_cards == ["Pestilence"]
+    assert scores[2].missing_cards == ["Counterspell"]
+
+
+def test_best_fit_needs_a_margin():
+    cube_list = make_cube_list()
+    # Pauper has 3 of the 4 cards, Vintage and Peasant 2.
+    scores = cube_list.rank_cubes(["Shock", "Counterspell", "Pestilence", "Lightning Bolt"])
+    assert scores[0].cube_name == "Pauper" and scores[0].fraction == 0.75
+    assert CubeList.best_fit(scores, margin=0.2, min_fraction=0.7) == "Pauper"
+    assert CubeList.best_fit(scores, margin=0.25, min_fraction=0.7) is None
+    assert CubeList.best_fit(scores, margin=0.2, min_fraction=0.8) is None
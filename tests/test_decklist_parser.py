@@ -0,0 +1,54 @@
+import io
+import asyncio
+import datetime
+
+from draftdata import DeckList
+
+NOW = datetime.datetime(2022, 2, 26, 12, 0)
+
+DECK = """Companion
+1 Lurrus of the Dream-Den (IKO) 226
+
+Deck
+1 Shock (M21) 159
+2 Lightning Bolt (M10) 146
+1 Fire /// Ice (MH2) 290
+17 Mountain (M21) 271
+
+Sideboard
+1 Lurrus of the Dream-Den (IKO) 226
+3 Counterspell
+"""
+
+
+def check_deck(deck):
+    assert deck.companion == "Lurrus of the Dream-Den"
+    assert deck.maindeck == ["Shock", "Lightning Bolt", "Lightning Bolt", "Fire // Ice"]
+    assert deck.sideboard == ["Counterspell"] * 3
+    assert deck.commander == ""
+
+
+def test_parse_string():
+    check_deck(DeckList("user", NOW, data_stream=DECK))
+
+
+def test_parse_lines():
+    deck = DeckList("user", NOW)
+    deck.parse(io.StringIO(DECK.replace("\n", "\r\n")))
+    check_deck(deck)
+
+
+def test_parse_byte_lines():
+    deck = DeckList("user", NOW)
+    deck.parse(io.BytesIO(DECK.encode("utf-8")))
+    check_deck(deck)
+
+
+def test_parse_async_stream():
+    async def stream():
+        for line in io.BytesIO(DECK.encode("utf-8")):
+            yield line
+
+    deck = DeckList("user", NOW)
+    asyncio.run(deck.parse_async(stream()))
+    check_deck(deck)
@@ -0,0 +1,23 @@
+import codecs
+
+from utils.decoding import decode_attachment, UTF8, UTF8_BOM, CHARDET
+
+DECK = "Deck\n1 Jötun Grunt (CSP) 8\n1 Lim-Dûl's Vault (ALL) 48\n"
+
+
+def test_utf8():
+    decoded = decode_attachment(DECK.encode("utf-8"))
+    assert decoded.text == DECK
+    assert decoded.path == UTF8
+
+
+def test_utf8_with_byte_order_mark():
+    decoded = decode_attachment(codecs.BOM_UTF8 + DECK.encode("utf-8"))
+    assert decoded.text == DECK
+    assert decoded.path == UTF8_BOM
+
+
+def test_falls_back_to_chardet():
+    decoded = decode_attachment(DECK.encode("utf-16"))
+    assert decoded.text == DECK
+    assert decoded.path == CHARDET
@@ -0,0 +1,112 @@
+import sqlite3
+import datetime
+from collections import Counter
+
+import pytest
+
+from draftdata import DeckList
+from disambiguation_store import (PendingSubmission, MemoryDisambiguationStore,
+                                  SQLiteDisambiguationStore, reacted_cube)
+
+REACTION_MAP = {"1️⃣": "Vintage", "2️⃣": "Pauper"}
+
+
+def make_entry(message_id, created_at=1000.0):
+    deck = DeckList("user", datetime.datetime(2022, 2, 26, 12, 0), wins=2,
+                    maindeck=["Shock", "Counterspell"], sideboard=["Pestilence"])
+    return PendingSubmission(message_id, 42, REACTION_MAP, deck, created_at)
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def make_store(request, tmp_path):
+    def make(max_size=10, ttl=100):
+        if request.param == "memory":
+            return MemoryDisambiguationStore(max_size, ttl)
+        return SQLiteDisambiguationStore(str(tmp_path / "pending.db"), max_size, ttl)
+    return make
+
+
+def test_round_trip(make_store):
+    store = make_store()
+    store.put(make_entry(1))
+    assert 1 in store and 2 not in store
+    assert store.get_reaction_map(1) == REACTION_MAP
+    entry = store.get(1)
+    assert entry.user_id == 42
+    assert entry.data.maindeck == ["Shock", "Counterspell"]
+    assert entry.data.sideboard == ["Pestilence"]
+    assert entry.data.timestamp == "2022-02-26 12:00"
+    store.remove(1)
+    assert len(store) == 0
+
+
+def test_least_recently_used_entries_are_evicted(make_store):
+    store = make_store(max_size=2)
+    assert store.put(make_entry(1)) == []
+    assert store.put(make_entry(2)) == []
+    store.get(1)
+    evicted = store.put(make_entry(3))
+    assert [entry.message_id for entry in evicted] == [2]
+    assert 1 in store and 3 in store
+
+
+def test_expired_entries_are_returned(make_store):
+    store = make_store(ttl=100)
+    store.put(make_entry(1, created_at=1000.0))
+    store.put(make_entry(2, created_at=1050.0))
+    expired = store.expire(now=1120.0)
+    assert [entry.message_id for entry in expired] == [1]
+    assert len(store) == 1
+
+
+def test_sqlite_entries_survive_reopening(tmp_path):
+    path = str(tmp_path / "pending.db")
+    SQLiteDisambiguationStore(path).put(make_entry(1))
+    assert SQLiteDisambiguationStore(path).get(1).data.wins == 2
+
+
+class FakeEmoji:
+    def __init__(self, name):
+        self.name = name
+
+
+class FakePayload:
+    def __init__(self, message_id, emoji, guild_id=None):
+        self.message_id = message_id
+        self.emoji = FakeEmoji(emoji)
+        self.guild_id = guild_id
+
+
+def test_reacted_cube_short_circuits_from_the_payload(make_store):
+    store = make_store()
+    store.put(make_entry(1))
+    counts = Counter()
+    assert reacted_cube(store, FakePayload(1, "2️⃣"), counts) == "Pauper"
+    assert reacted_cube(store, FakePayload(1, "2️⃣", guild_id=7), counts) is None
+    assert reacted_cube(store, FakePayload(2, "2️⃣"), counts) is None
+    assert reacted_cube(store, FakePayload(1, "👍"), counts) is None
+    assert counts == {"handled": 1, "short_circuited": 3}
+
+
+def test_submission_keys_round_trip(make_store):
+    store = make_store()
+    entry = make_entry(1)
+    entry.content_key, entry.raw_key = "content", "raw"
+    store.put(entry)
+    stored = store.get(1)
+    assert (stored.content_key, stored.raw_key) == ("content", "raw")
+
+
+def test_old_sqlite_databases_gain_the_key_columns(tmp_path):
+    path = str(tmp_path / "pending.db")
+    connection = sqlite3.connect(path)
+    connection.execute(
+        "CREATE TABLE pending (message_id INTEGER PRIMARY KEY, user_id INTEGER NOT NULL, "
+        "created_at REAL NOT NULL, last_used REAL NOT NULL, "
+        "cube_reaction_map TEXT NOT NULL, data TEXT NOT NULL)")
+    connection.commit()
+    connection.close()
+
+    store = SQLiteDisambiguationStore(path)
+    store.put(make_entry(1))
+    assert store.get(1).content_key is None
@@ -1,10 +1,10 @@
 import datetime
 from draftdata import DraftData
-import chardet
+from utils.decoding import decode_attachment
 
 def make_draft_data_from_file(file_name: str):
     data_bytes = open(file_name, 'rb').read()
-    data = data_bytes.decode(chardet.detect(data_bytes)["encoding"])
+    data = decode_attachment(data_bytes).text
     return DraftData.create(data, "Submitter", datetime.datetime.now())
 
 if __name__ == "__main__":
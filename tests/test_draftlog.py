@@ -0,0 +1,66 @@
+import json
+import pickle
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import pytest
+
+from draftdata import DraftLog, DeckList, DraftDataParseError
+from models.cubelist import Cube, CubeSubmissionInfo
+
+with open("tests/sample_DraftLog.json", encoding="utf-8") as sample_file:
+    SAMPLE_LOG = sample_file.read()
+
+
+def test_incremental_parse_matches_full_parse():
+    incremental = DraftLog(SAMPLE_LOG, "Submitter")
+    full = DraftLog(SAMPLE_LOG, "Submitter", incremental=False)
+    assert incremental.number_of_players == full.number_of_players == 8
+    assert incremental.to_json() == full.to_json()
+
+
+def test_incremental_parse_handles_carddata_before_users():
+    draft_log = json.loads(SAMPLE_LOG)
+    reordered = {"carddata": draft_log.pop("carddata"), **draft_log}
+    incremental = DraftLog(json.dumps(reordered), "Submitter")
+    assert incremental.to_json() == DraftLog(SAMPLE_LOG, "Submitter").to_json()
+    assert len(incremental.deck_lists) == 2
+
+
+def test_concurrent_parse_matches_sequential_parse():
+    sequential = DraftLog(SAMPLE_LOG, "Submitter")
+    with ProcessPoolExecutor(max_workers=2) as executor:
+        concurrent = DraftLog(SAMPLE_LOG, "Submitter", executor=executor)
+    assert concurrent.to_json() == sequential.to_json()
+
+
+def test_concurrent_parse_attributes_errors_to_the_player(monkeypatch):
+    def fail(self, _data):
+        raise DraftDataParseError(self.user)
+    monkeypatch.setattr(DeckList, "parse", fail)
+    with ThreadPoolExecutor(max_workers=2) as executor, \
+            pytest.raises(DraftDataParseError) as raised:
+        DraftLog(SAMPLE_LOG, "Submitter", executor=executor)
+    first_player = json.loads(SAMPLE_LOG)["users"]
+    first_player = next(iter(first_player.values()))["userName"]
+    assert raised.value.message.endswith(f"in the exportString for user {first_player}.")
+    # Errors from worker processes keep their message.
+    assert pickle.loads(pickle.dumps(raised.value)).message == raised.value.message
+
+
+def test_save_writes_each_location_once():
+    class RecordingSaver:
+        def __init__(self):
+            self.writes = []
+
+        def write_to_sheet(self, cell_data, spreadsheet_id, location):
+            self.writes.append((location, cell_data))
+
+    cube = Cube([], "test", CubeSubmissionInfo("sheet", "Decks!A1", "Sideboards!A1",
+                                               "Drafts!A1"))
+    draft_log = DraftLog(SAMPLE_LOG, "Submitter")
+    saver = RecordingSaver()
+    draft_log.save_to_spreadsheet(saver, cube)
+    assert [location for location, _ in saver.writes] == ["Drafts!A1", "Decks!A1",
+                                                           "Sideboards!A1"]
+    assert saver.writes[1][1] == [deck.maindeck_row() for deck in draft_log.deck_lists]
+    assert len(saver.writes[2][1]) == len(draft_log.deck_lists) == 2
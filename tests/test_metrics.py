@@ -0,0 +1,60 @@
+import asyncio
+
+import pytest
+
+from metrics import Metrics, NULL_SPAN, serve_metrics
+
+
+def test_span_records_latency_and_errors():
+    metrics = Metrics()
+    with metrics.span("parse"):
+        pass
+    with pytest.raises(ValueError), metrics.span("parse"):
+        raise ValueError
+    histogram = metrics.histograms["parse"]
+    assert histogram.count == 2 and histogram.counts[0] == 2
+    assert metrics.counters["parse.errors"] == 1
+
+
+def test_disabled_metrics_record_nothing():
+    metrics = Metrics(enabled=False)
+    assert metrics.span("parse") is NULL_SPAN
+    with metrics.span("parse"):
+        metrics.count("saved")
+    assert not metrics.histograms and not metrics.counters
+
+
+def test_render():
+    metrics = Metrics()
+    metrics.observe("save", 0.3)
+    metrics.observe("save", 20)
+    metrics.count("saved")
+    metrics.gauge("write_queue_depth", lambda: 4)
+    text = metrics.render()
+    assert 'jankdiver_stage_seconds_bucket{stage="save",le="0.25"} 0' in text
+    assert 'jankdiver_stage_seconds_bucket{stage="save",le="0.5"} 1' in text
+    assert 'jankdiver_stage_seconds_bucket{stage="save",le="+Inf"} 2' in text
+    assert 'jankdiver_stage_seconds_count{stage="save"} 2' in text
+    assert 'jankdiver_events_total{event="saved"} 1' in text
+    assert "jankdiver_write_queue_depth 4" in text
+    assert metrics.summary() == "save 10150.0ms x2; saved=1; write_queue_depth=4"
+
+
+def test_serve_metrics():
+    metrics = Metrics()
+    metrics.count("saved")
+
+    async def scrape():
+        server = await serve_metrics(metrics, port=0)
+        port = server.sockets[0].getsockname()[1]
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(b"GET /metrics HTTP/1.1\r\nHost: localhost\r\n\r\n")
+        response = await reader.read()
+        writer.close()
+        server.close()
+        await server.wait_closed()
+        return response.decode("utf-8")
+
+    response = asyncio.run(scrape())
+    assert response.startswith("HTTP/1.1 200 OK")
+    assert 'jankdiver_events_total{event="saved"} 1' in response
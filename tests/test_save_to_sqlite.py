@@ -0,0 +1,125 @@
+import os
+import asyncio
+import inspect
+import datetime
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from draftdata import DeckList, DraftLog
+from models.cubelist import Cube, CubeList, CubeSubmissionInfo
+from save_to_csv import CsvDraftDataSaver
+from save_to_sqlite import SQLiteDraftDataSaver, MirroredDraftDataSaver, MAINDECK
+
+with open("tests/sample_DraftLog.json", encoding="utf-8") as sample_file:
+    SAMPLE_LOG = sample_file.read()
+
+
+def make_saver(tmp_path):
+    info = CubeSubmissionInfo("sheet", "Maindecks", "Sideboards", "Draft Logs")
+    cube_list = CubeList({"Sample": Cube([], "sample", info)})
+    return SQLiteDraftDataSaver(str(tmp_path / "analytics.db"), cube_list), cube_list["Sample"]
+
+
+def test_decks_are_normalized(tmp_path):
+    saver, cube = make_saver(tmp_path)
+    now = datetime.datetime(2022, 2, 26, 12, 0)
+    DeckList("alice", now, wins=3, maindeck=["Shock", "Counterspell"],
+             sideboard=["Pestilence"]).save_to_spreadsheet(saver, cube)
+    DeckList("bob", now, wins=1, maindeck=["Shock"],
+             sideboard=["Counterspell"]).save_to_spreadsheet(saver, cube)
+
+    assert saver.connection.execute("SELECT COUNT(*) FROM submissions").fetchone() == (2,)
+    assert sorted(saver.connection.execute("SELECT wins FROM decks")) == [(1,), (3,)]
+    assert sorted(saver.maindeck_counts("Sample")) == [
+        ("Counterspell", 1, 2), ("Pestilence", 0, 1), ("Shock", 2, 2)]
+
+
+def test_draft_picks_are_recorded_in_order(tmp_path):
+    saver, cube = make_saver(tmp_path)
+    draft_log = DraftLog(SAMPLE_LOG, "Submitter")
+    draft_log.save_to_spreadsheet(saver, cube)
+
+    kinds = dict(saver.connection.execute(
+        "SELECT kind, COUNT(*) FROM submissions GROUP BY kind"))
+    assert kinds == {"draft": 1, "deck": len(draft_log.deck_lists)}
+    first_seat = draft_log.data[0]
+    picks = [name for (name,) in saver.connection.execute(
+        "SELECT cards.name FROM picks JOIN cards ON cards.id = picks.card_id "
+        "WHERE seat = 0 ORDER BY pick_number")]
+    assert picks == draft_log.card_list()[:len(first_seat["picks"])]
+    positions = dict((name, position) for name, position, _
+                     in saver.average_pick_positions("Sample"))
+    assert positions[picks[0]] == 1
+
+
+def test_running_card_stats_match_a_rebuild(tmp_path):
+    saver, cube = make_saver(tmp_path)
+    now = datetime.datetime(2022, 2, 26, 12, 0)
+    DeckList("alice", now, wins=3, maindeck=["Shock", "Counterspell"],
+             sideboard=["Pestilence", "Shock"]).save_to_spreadsheet(saver, cube)
+    DeckList("bob", now, wins=1, maindeck=["Shock"],
+             sideboard=["Counterspell"]).save_to_spreadsheet(saver, cube)
+    DraftLog(SAMPLE_LOG, "Submitter").save_to_spreadsheet(saver, cube)
+
+    running = saver.connection.execute("SELECT * FROM card_stats ORDER BY card_id").fetchall()
+    saver.rebuild_card_stats()
+    assert saver.connection.execute(
+        "SELECT * FROM card_stats ORDER BY card_id").fetchall() == running
+
+    assert saver.card_statistics("Sample", "wins", limit=1) == [("Counterspell", 3.0, 1)]
+    assert saver.card_statistics("Sample", "maindeck_rate", limit=1, bottom=True) == \
+        [("Pestilence", 0.0, 1)]
+    assert saver.card_statistics("Sample", "average_pick", limit=1)[0][1] == 1.0
+
+
+def test_shared_locations_are_reported(tmp_path, capsys):
+    info = CubeSubmissionInfo("sheet", "Maindecks", "Sideboards", "Draft Logs")
+    cube_list = CubeList({"First": Cube([], "first", info), "Second": Cube([], "second", info),
+                          "Unsaved": Cube([], "unsaved", CubeSubmissionInfo("", "", "", ""))})
+    saver = SQLiteDraftDataSaver(str(tmp_path / "analytics.db"), cube_list)
+
+    output = capsys.readouterr().out
+    assert "Second maindeck rows go to Maindecks in sheet" in output
+    assert "Unsaved" not in output
+    assert saver.locations[("sheet", "Maindecks")] == ("First", MAINDECK)
+
+
+def test_mirrored_writes_run_in_the_executor(tmp_path):
+    saver, cube = make_saver(tmp_path)
+    mirror = CsvDraftDataSaver(str(tmp_path / "mirror"))
+    threads = []
+    write_to_sheet = saver.write_to_sheet
+
+    def record_thread(*args):
+        threads.append(threading.current_thread().name)
+        return write_to_sheet(*args)
+    saver.write_to_sheet = record_thread
+
+    async def save():
+        with ThreadPoolExecutor(1, thread_name_prefix="analytics") as executor:
+            mirrored = MirroredDraftDataSaver(saver, mirror, executor=executor)
+            writes = DeckList("alice", datetime.datetime(2022, 2, 26, 12, 0), wins=3,
+                              maindeck=["Shock"], sideboard=["Pestilence"]
+                              ).save_to_spreadsheet(mirrored, cube)
+            await asyncio.gather(*[write for write in writes if inspect.isawaitable(write)])
+
+    asyncio.run(save())
+    assert threads and all(name.startswith("analytics") for name in threads)
+    assert saver.connection.execute("SELECT COUNT(*) FROM submissions").fetchone() == (1,)
+    assert os.path.exists(mirror.path_for("sheet", "Maindecks"))
+
+
+def test_write_batch_reports_failures_per_append(tmp_path):
+    saver, cube = make_saver(tmp_path)
+    deck = DeckList("alice", datetime.datetime(2022, 2, 26, 12, 0), wins=3,
+                    maindeck=["Shock"], sideboard=["Pestilence"])
+    bad_sideboard = [["bob", "2022-02-26 12:00", "Counterspell"], ["truncated"]]
+    results = saver.write_batch([([deck.maindeck_row()], "Maindecks"),
+                                 ([["row"]], "Nowhere"),
+                                 (bad_sideboard, "Sideboards")], "sheet")
+
+    assert results[0] is None
+    assert isinstance(results[1], ValueError) and isinstance(results[2], ValueError)
+    # Only the append that succeeded was saved, and none of the failed one's rows.
+    assert saver.connection.execute("SELECT COUNT(*) FROM submissions").fetchone() == (1,)
+    assert not saver.connection.in_transaction
@@ -0,0 +1,79 @@
+import asyncio
+
+from sheet_write_queue import SheetWriteQueue
+
+
+class FakeResponse:
+    def __init__(self, status):
+        self.status = status
+
+
+class FakeHttpError(Exception):
+    def __init__(self, status):
+        super().__init__(status)
+        self.resp = FakeResponse(status)
+
+
+class FakeSaver:
+    """Records batches instead of talking to Google; fails the first `failures` batches."""
+    def __init__(self, failures=0, status=503):
+        self.batches = []
+        self.failures = failures
+        self.status = status
+
+    def write_batch(self, appends, spreadsheet_id):
+        if self.failures:
+            self.failures -= 1
+            return [FakeHttpError(self.status)] * len(appends)
+        self.batches.append((spreadsheet_id, appends))
+        return [None] * len(appends)
+
+
+def test_appends_are_grouped_per_spreadsheet_and_location():
+    saver = FakeSaver()
+
+    async def submit():
+        queue = SheetWriteQueue(saver, linger=0.01)
+        writes = [queue.write_to_sheet([["seat 1"]], "sheet", "Draft Log"),
+                  queue.write_to_sheet([["deck 1"]], "sheet", "Maindeck"),
+                  queue.write_to_sheet([["deck 2"]], "sheet", "Maindeck"),
+                  queue.write_to_sheet([["other"]], "other sheet", "Maindeck")]
+        await asyncio.gather(*writes)
+        await queue.close()
+
+    asyncio.run(submit())
+    assert saver.batches == [
+        ("sheet", [([["seat 1"]], "Draft Log"), ([["deck 1"], ["deck 2"]], "Maindeck")]),
+        ("other sheet", [([["other"]], "Maindeck")]),
+    ]
+
+
+def test_transient_failures_are_retried():
+    saver = FakeSaver(failures=2)
+
+    async def submit():
+        queue = SheetWriteQueue(saver, linger=0, backoff=0.001)
+        await queue.write_to_sheet([["deck"]], "sheet", "Maindeck")
+        await queue.close()
+
+    asyncio.run(submit())
+    assert saver.batches == [("sheet", [([["deck"]], "Maindeck")])]
+
+
+def test_permanent_failures_reach_the_caller():
+    saver = FakeSaver(failures=1, status=400)
+
+    async def submit():
+        queue = SheetWriteQueue(saver, linger=0, backoff=0.001)
+        try:
+            await queue.write_to_sheet([["deck"]], "sheet", "Maindeck")
+        finally:
+            await queue.close()
+
+    try:
+        asyncio.run(submit())
+    except FakeHttpError as ex:
+        assert ex.resp.status == 400
+    else:
+        raise AssertionError("Expected the write to fail.")
+    assert saver.batches == []
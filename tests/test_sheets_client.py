@@ -0,0 +1,175 @@
+import os
+import json
+import time
+import shutil
+import datetime
+import threading
+import email.parser
+import email.policy
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote, urlparse
+
+import pytest
+import googleapiclient
+from google.oauth2.credentials import Credentials
+
+from sheets_client import SheetsClient, RateLimiter
+from save_to_google_sheet import GoogleDraftDataSaver
+
+BUNDLED_DISCOVERY = os.path.join(os.path.dirname(googleapiclient.__file__),
+                                 "discovery_cache", "documents", "sheets.v4.json")
+
+
+class FakeSheets(BaseHTTPRequestHandler):
+    """Handles token refreshes, values.append calls, and batches of them."""
+    appends = []
+    token_requests = 0
+    lock = threading.Lock()
+
+    def do_POST(self):  # pylint: disable=invalid-name
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        path = urlparse(self.path).path
+        if path == "/token":
+            with self.lock:
+                FakeSheets.token_requests += 1
+                token = f"token-{FakeSheets.token_requests}"
+            self.reply("application/json",
+                       json.dumps({"access_token": token, "expires_in": 3600}).encode())
+        elif path == "/batch":
+            self.reply_to_batch(body)
+        else:
+            self.record_append(path, self.headers.get("Authorization"), body)
+            self.reply("application/json", b"{}")
+
+    def record_append(self, path, authorization, body):
+        spreadsheet_id, location = unquote(path).split("/")[3::2]
+        with self.lock:
+            self.appends.append((spreadsheet_id, location.rsplit(":", 1)[0],
+                                 json.loads(body)["values"], authorization))
+
+    def reply_to_batch(self, body):
+        message = email.parser.BytesParser(policy=email.policy.HTTP).parsebytes(
+            b"Content-Type: " + self.headers["Content-Type"].encode() + b"\r\n\r\n" + body)
+        boundary = "response-boundary"
+        parts = []
+        for part in message.iter_parts():
+            request = part.get_payload(decode=True).decode()
+            head, request_body = request.split("\r\n\r\n", 1) if "\r\n\r\n" in request \
+                else request.split("\n\n", 1)
+            lines = head.splitlines()
+            headers = dict(line.split(": ", 1) for line in lines[1:])
+            self.record_append(urlparse(lines[0].split(" ")[1]).path,
+                               headers.get("authorization", headers.get("Authorization")),
+                               request_body.encode())
+            content_id = part["Content-ID"].strip("<>")
+            parts.append(f"--{boundary}\r\nContent-Type: application/http\r\n"
+                         f"Content-ID: <response-{content_id}>\r\n\r\n"
+                         "HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n\r\n{}\r\n")
+        self.reply(f"multipart/mixed; boundary={boundary}",
+                   ("".join(parts) + f"--{boundary}--\r\n").encode())
+
+    def reply(self, content_type, body):
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):  # pylint: disable=arguments-differ
+        pass
+
+
+@pytest.fixture
+def sheets_url():
+    FakeSheets.appends = []
+    FakeSheets.token_requests = 0
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeSheets)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/"
+    server.shutdown()
+
+
+@pytest.fixture
+def make_client(sheets_url, tmp_path):
+    discovery_cache_path = str(tmp_path / "sheets_v4_discovery.json")
+    shutil.copy(BUNDLED_DISCOVERY, discovery_cache_path)
+    refreshed = []
+
+    def make(expiry=None, **kwargs):
+        def get_credentials():
+            return Credentials("token-0", refresh_token="refresh", client_id="id",
+                               client_secret="secret", token_uri=sheets_url + "token",
+                               expiry=expiry)
+        return SheetsClient(get_credentials, discovery_cache_path=discovery_cache_path,
+                            root_url=sheets_url, on_refresh=refreshed.append, **kwargs)
+    make.refreshed = refreshed
+    return make
+
+
+def test_write_to_sheet(make_client):
+    saver = GoogleDraftDataSaver(make_client())
+    saver.write_to_sheet([["Alice", "Black Lotus"]], "sheet-id", "Maindeck!A1")
+
+    assert FakeSheets.appends == [("sheet-id", "Maindeck!A1", [["Alice", "Black Lotus"]],
+                                   "Bearer token-0")]
+
+
+def test_write_batch(make_client):
+    saver = GoogleDraftDataSaver(make_client())
+    results = saver.write_batch([([["Alice"]], "Maindeck!A1"), ([["Bob"]], "Sideboard!A1")],
+                                "sheet-id")
+
+    assert results == [None, None]
+    assert sorted(FakeSheets.appends) == [("sheet-id", "Maindeck!A1", [["Alice"]], "Bearer token-0"),
+                                          ("sheet-id", "Sideboard!A1", [["Bob"]], "Bearer token-0")]
+
+
+def test_concurrent_writes_share_the_pool(make_client):
+    client = make_client(pool_size=2, requests_per_minute=60 * 1000, burst=100)
+    saver = GoogleDraftDataSaver(client)
+    threads = [threading.Thread(target=saver.write_to_sheet,
+                                args=([[str(i)]], "sheet-id", "Maindeck!A1"))
+               for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(values[0][0] for _, _, values, _ in FakeSheets.appends) == \
+        [str(i) for i in range(8)]
+    assert client._created <= 2  # pylint: disable=protected-access
+
+
+def test_rate_limiter_paces_after_the_burst():
+    limiter = RateLimiter(rate=100, burst=2)
+    start = time.monotonic()
+    assert limiter.acquire() == 0
+    assert limiter.acquire() == 0
+    limiter.acquire(3)
+    # The bucket was empty, so 3 tokens at 100 per second take about 30ms.
+    assert time.monotonic() - start >= 0.015
+
+
+def test_refresh_if_expiring(make_client):
+    client = make_client(expiry=datetime.datetime.utcnow() + datetime.timedelta(hours=1))
+    assert not client.refresh_if_expiring(margin=60)
+    assert FakeSheets.token_requests == 0
+
+    client.credentials.expiry = datetime.datetime.utcnow() + datetime.timedelta(seconds=30)
+    assert client.refresh_if_expiring(margin=60)
+    assert client.credentials.token == "token-1"
+    assert make_client.refreshed == [client.credentials]
+
+    GoogleDraftDataSaver(client).write_to_sheet([["Alice"]], "sheet-id", "Maindeck!A1")
+    assert FakeSheets.appends[-1][3] == "Bearer token-1"
+
+
+def test_setup_loads_credentials_up_front(make_client):
+    client = make_client()
+    client.setup()
+    credentials = client.credentials
+    assert credentials is not None
+    with client.session():
+        pass
+    assert client.credentials is credentials
@@ -0,0 +1,57 @@
+import datetime
+
+from draftdata import DeckList
+from submission_cache import SubmissionCache, content_key, raw_key
+
+
+def make_deck(maindeck, minute=0):
+    return DeckList("user", datetime.datetime(2022, 2, 26, 12, minute), wins=2,
+                    maindeck=maindeck, sideboard=["Pestilence"])
+
+
+def test_content_key_ignores_order_and_case():
+    key = content_key(make_deck(["Shock", "Counterspell", "Shock"]))
+    assert key == content_key(make_deck(["counterspell", "Shock", "shock"]))
+    assert key != content_key(make_deck(["Shock", "Counterspell"]))
+    assert key != content_key(make_deck(["Shock", "Counterspell", "Shock"], minute=1))
+
+
+def test_raw_key_includes_context():
+    date = datetime.datetime(2022, 2, 26, 12)
+    assert raw_key("user", date, b"1 Shock") == raw_key("user", date, b"1 Shock")
+    assert raw_key("user", date, b"1 Shock", "2-1") != raw_key("user", date, b"1 Shock", "3-0")
+    assert raw_key("user", date, b"1 Shock") != raw_key("other", date, b"1 Shock")
+
+
+def test_repost_on_a_later_date_is_not_a_duplicate(tmp_path):
+    cache = SubmissionCache(str(tmp_path / "recorded.db"))
+    first_date, later_date = datetime.datetime(2022, 2, 26), datetime.datetime(2022, 3, 30)
+    first = DeckList("user", first_date, wins=2, maindeck=["Shock"], sideboard=["Pestilence"])
+    cache.add(content_key(first), raw_key("user", first_date, b"1 Shock", "2-1"))
+    assert cache.lookup_raw(raw_key("user", first_date, b"1 Shock", "2-1")) is not None
+    assert cache.lookup_raw(raw_key("user", later_date, b"1 Shock", "2-1")) is None
+    later = DeckList("user", later_date, wins=2, maindeck=["Shock"], sideboard=["Pestilence"])
+    assert cache.lookup(content_key(later)) is None
+
+
+def test_lookup_and_persistence(tmp_path):
+    path = str(tmp_path / "recorded.db")
+    cache = SubmissionCache(path)
+    assert cache.lookup("content") is None
+    cache.add("content")
+    cache.add("content", "raw")  # Seen again from a different file: remembers both keys.
+    assert cache.lookup("content") is not None
+    reopened = SubmissionCache(path)
+    assert reopened.lookup_raw("raw") == reopened.lookup("content")
+    assert len(reopened) == 1
+
+
+def test_bounded(tmp_path):
+    cache = SubmissionCache(str(tmp_path / "recorded.db"), max_size=2)
+    cache.add("a")
+    cache.add("b")
+    cache.lookup("a")  # "b" is now the least recently seen.
+    cache.add("c")
+    assert len(cache) == 2
+    assert cache.lookup("b") is None
+    assert cache.lookup("a") is not None and cache.lookup("c") is not None
@@ -0,0 +1,165 @@
+import asyncio
+
+from submission_scheduler import SubmissionScheduler, STARTED, QUEUED, COALESCED, SHED
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_scheduler(**kwargs):
+    """A scheduler whose handled submissions are recorded, and which only finish
+    when release() is called."""
+    handled = []
+    gate = asyncio.Event()
+
+    async def handle(submission):
+        handled.append(submission)
+        await gate.wait()
+
+    scheduler = SubmissionScheduler(handle, clock=kwargs.pop("clock", FakeClock()), **kwargs)
+    return scheduler, handled, gate.set
+
+
+def test_users_take_turns():
+    async def run():
+        scheduler, handled, release = make_scheduler(concurrency=1, coalesce_window=0)
+        statuses = [scheduler.submit("alice", "alice 1").status,
+                    scheduler.submit("alice", "alice 2").status,
+                    scheduler.submit("alice", "alice 3").status,
+                    scheduler.submit("bob", "bob 1").status]
+        assert scheduler.depth == 3
+        release()
+        await scheduler.join()
+        return statuses, handled
+
+    statuses, handled = asyncio.run(run())
+    assert statuses == [STARTED, QUEUED, QUEUED, QUEUED]
+    assert handled == ["alice 1", "bob 1", "alice 2", "alice 3"]
+
+
+def test_one_submission_per_user_at_a_time():
+    async def run():
+        scheduler, handled, release = make_scheduler(concurrency=2, coalesce_window=0)
+        statuses = [scheduler.submit("alice", "alice 1").status,
+                    scheduler.submit("alice", "alice 2").status]
+        await asyncio.sleep(0)
+        running = list(handled)
+        release()
+        await scheduler.join()
+        return statuses, running, handled
+
+    statuses, running, handled = asyncio.run(run())
+    assert statuses == [STARTED, QUEUED]
+    assert running == ["alice 1"]
+    assert handled == ["alice 1", "alice 2"]
+
+
+def test_rapid_reposts_are_coalesced():
+    async def run():
+        clock = FakeClock()
+        scheduler, handled, release = make_scheduler(concurrency=1, coalesce_window=10,
+                                                     clock=clock)
+        scheduler.submit("bob", "bob 1", key="bob.txt")
+        scheduler.submit("alice", "alice 1", key="deck.txt")
+        clock.now = 5
+        admission = scheduler.submit("alice", "alice 2", key="deck.txt")
+        clock.now = 30
+        later = scheduler.submit("alice", "alice 3", key="deck.txt")
+        release()
+        await scheduler.join()
+        return admission, later, handled
+
+    admission, later, handled = asyncio.run(run())
+    assert admission.status == COALESCED
+    assert admission.replaced == "alice 1"
+    assert admission.position == 1
+    assert later.status == QUEUED
+    assert handled == ["bob 1", "alice 2", "alice 3"]
+
+
+def test_different_submissions_are_not_coalesced():
+    async def run():
+        scheduler, handled, release = make_scheduler(concurrency=1, coalesce_window=10)
+        scheduler.submit("bob", "bob 1", key="bob.txt")
+        admissions = [scheduler.submit("alice", "draft log", key="draft_log.json"),
+                      scheduler.submit("alice", "deck", key="my_deck.txt")]
+        release()
+        await scheduler.join()
+        return admissions, handled
+
+    admissions, handled = asyncio.run(run())
+    assert [admission.status for admission in admissions] == [QUEUED, QUEUED]
+    assert handled == ["bob 1", "draft log", "deck"]
+
+
+def test_max_per_user_sheds_further_submissions():
+    async def run():
+        scheduler, handled, release = make_scheduler(concurrency=1, max_per_user=2)
+        scheduler.submit("bob", "bob 1")
+        admissions = [scheduler.submit("alice", f"alice {i}", key=i) for i in range(1, 4)]
+        release()
+        await scheduler.join()
+        return admissions, handled
+
+    admissions, handled = asyncio.run(run())
+    assert [admission.status for admission in admissions] == [QUEUED, QUEUED, SHED]
+    assert handled == ["bob 1", "alice 1", "alice 2"]
+
+
+def test_full_backlog_sheds_submissions():
+    async def run():
+        scheduler, handled, release = make_scheduler(concurrency=1, max_backlog=2,
+                                                     coalesce_window=0)
+        admissions = [scheduler.submit(user, user) for user in ("a", "b", "c", "d")]
+        release()
+        await scheduler.join()
+        return admissions, handled
+
+    admissions, handled = asyncio.run(run())
+    assert [admission.status for admission in admissions] == [STARTED, QUEUED, QUEUED, SHED]
+    assert [admission.position for admission in admissions] == [0, 1, 2, 0]
+    assert handled == ["a", "b", "c"]
+
+
+def test_failures_do_not_stop_the_scheduler():
+    handled = []
+
+    async def handle(submission):
+        if submission == "bad":
+            raise ValueError(submission)
+        handled.append(submission)
+
+    async def run():
+        scheduler = SubmissionScheduler(handle, concurrency=1, coalesce_window=0)
+        scheduler.submit("alice", "bad")
+        scheduler.submit("bob", "good")
+        await scheduler.join()
+        return scheduler
+
+    scheduler = asyncio.run(run())
+    assert handled == ["good"]
+    assert scheduler.depth == 0 and scheduler.active == 0
+
+
+def test_positions_follow_the_dispatch_order():
+    async def run():
+        clock = FakeClock()
+        scheduler, handled, release = make_scheduler(concurrency=1, coalesce_window=10,
+                                                     clock=clock)
+        for i in range(1, 4):
+            scheduler.submit("alice", f"alice {i}", key=i)
+        bob = scheduler.submit("bob", "bob 1", key="bob")
+        repost = scheduler.submit("alice", "alice 2 again", key=2)
+        release()
+        await scheduler.join()
+        return bob, repost, handled
+
+    bob, repost, handled = asyncio.run(run())
+    assert handled == ["alice 1", "bob 1", "alice 2 again", "alice 3"]
+    assert (bob.status, bob.position) == (QUEUED, 1)
+    assert (repost.status, repost.position) == (COALESCED, 2)
@@ -0,0 +1,110 @@
+import os
+import json
+import stat
+import asyncio
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from utils.update_cube_cards import sync_cube_cards, sync_state_path
+
+
+class StubCubeCobra(BaseHTTPRequestHandler):
+    """Serves /<cube id> as a plaintext card list, with the list's length as its ETag."""
+    cubes = {}
+    requests = []
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        cube_id = self.path.strip("/")
+        self.requests.append((cube_id, self.headers.get("If-None-Match")))
+        if cube_id not in self.cubes:
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        body = "\n".join(self.cubes[cube_id]).encode("utf-8")
+        etag = f'"{len(self.cubes[cube_id])}"'
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("ETag", etag)
+        self.send_header("Content-Type", "text/plain; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):  # pylint: disable=arguments-differ
+        pass
+
+
+@pytest.fixture
+def cube_cobra():
+    StubCubeCobra.cubes = {"vintage": ["Black Lotus", "Shock"], "pauper": ["Shock"]}
+    StubCubeCobra.requests = []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubCubeCobra)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/{{}}"
+    server.shutdown()
+
+
+@pytest.fixture
+def cube_file(tmp_path):
+    info = {"spreadsheet_id": "", "maindeck": "", "sideboard": "", "draftlog": ""}
+    path = tmp_path / "cubes.json"
+    path.write_text(json.dumps({
+        "Vintage": {"cards": [], "cube_cobra_id": "vintage", "submission_info": info},
+        "Pauper": {"cards": [], "cube_cobra_id": "pauper", "submission_info": info},
+    }))
+    return str(path)
+
+
+def read_cards(cube_file):
+    with open(cube_file) as cubes:
+        return {name: sorted(cube["cards"]) for name, cube in json.load(cubes).items()}
+
+
+def test_sync_fetches_changed_cubes_only(cube_cobra, cube_file):
+    changed = asyncio.run(sync_cube_cards(cube_file, url_template=cube_cobra))
+    assert sorted(changed) == ["Pauper", "Vintage"]
+    assert read_cards(cube_file) == {"Vintage": ["Black Lotus", "Shock"], "Pauper": ["Shock"]}
+
+    StubCubeCobra.requests = []
+    StubCubeCobra.cubes["pauper"] = ["Shock", "Pestilence"]
+    changed = asyncio.run(sync_cube_cards(cube_file, url_template=cube_cobra))
+    assert changed == ["Pauper"]
+    assert sorted(StubCubeCobra.requests) == [("pauper", '"1"'), ("vintage", '"2"')]
+    assert read_cards(cube_file)["Pauper"] == ["Pestilence", "Shock"]
+
+
+def test_unchanged_sync_leaves_files_alone(cube_cobra, cube_file):
+    asyncio.run(sync_cube_cards(cube_file, url_template=cube_cobra))
+    with open(cube_file) as cubes, open(sync_state_path(cube_file)) as state:
+        before = cubes.read(), state.read()
+    assert asyncio.run(sync_cube_cards(cube_file, url_template=cube_cobra)) == []
+    with open(cube_file) as cubes, open(sync_state_path(cube_file)) as state:
+        assert (cubes.read(), state.read()) == before
+
+
+def test_failed_cube_keeps_its_cards_and_state(cube_cobra, cube_file):
+    asyncio.run(sync_cube_cards(cube_file, url_template=cube_cobra))
+    with open(sync_state_path(cube_file)) as state:
+        vintage_state = json.load(state)["Vintage"]
+
+    del StubCubeCobra.cubes["vintage"]
+    StubCubeCobra.cubes["pauper"] = ["Shock", "Pestilence"]
+    changed = asyncio.run(sync_cube_cards(cube_file, url_template=cube_cobra))
+    assert changed == ["Pauper"]
+    assert read_cards(cube_file) == {"Vintage": ["Black Lotus", "Shock"],
+                                     "Pauper": ["Pestilence", "Shock"]}
+    with open(sync_state_path(cube_file)) as state:
+        assert json.load(state)["Vintage"] == vintage_state
+
+
+def test_sync_keeps_file_permissions(cube_cobra, cube_file):
+    os.chmod(cube_file, 0o644)
+    asyncio.run(sync_cube_cards(cube_file, url_template=cube_cobra))
+    assert stat.S_IMODE(os.stat(cube_file).st_mode) == 0o644
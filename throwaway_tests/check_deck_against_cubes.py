@@ -5,9 +5,9 @@ sys.path.insert(0, parent_dir)
 
 from models.cubelist import CubeList
 from draftdata import DraftData
+from utils.decoding import decode_attachment
 
 import json
-import chardet
 import datetime
 import save_to_google_sheet
 
@@ -16,7 +16,7 @@ with open("config/cubes.json", 'r') as cubes_file:
 
 DECK_FILE_PATH = r"C:\Users\sgold\Downloads\Uusi_tekstiasiakirja.txt"
 deck_bytes = open(DECK_FILE_PATH, 'rb').read()
-deck = deck_bytes.decode(chardet.detect(deck_bytes)["encoding"])     
+deck = decode_attachment(deck_bytes).text     
 deck_data = DraftData.create(deck, "Deck Submitter", datetime.datetime.now())
 candidates = deck_data.match_cubes(CUBE_LIST)
 print(deck_data.card_list())
@@ -1,4 +1,3 @@
-
-from utils.update_cube_cards import update_cube_cards
-update_cube_cards(cube_file_path="config/cubes.json")
-    
\ No newline at end of file
+import asyncio
+from utils.update_cube_cards import sync_cube_cards
+print(asyncio.run(sync_cube_cards(cube_file_path="config/cubes.json")))
@@ -0,0 +1,175 @@
+"""Offline backfill: parses and matches a directory or archive of submissions in parallel.
+
+Usage (from the repository root):
+    python -m utils.backfill SUBMISSIONS [--csv OUTPUT_DIR | --sheets] [--workers N]
+
+SUBMISSIONS is a directory, .zip or .tar(.gz) archive of .txt decks and .json draft logs.
+Submissions that match exactly one cube are written through one batched writer, either to
+CSV files (one per spreadsheet location) or to the cubes' Google Sheets. The rest are listed
+in unmatched.csv in the output directory (or the working directory, with --sheets).
+"""
+import os
+import csv
+import time
+import tarfile
+import zipfile
+import argparse
+import datetime
+import functools
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from draftdata import DraftData, DraftDataParseError
+from sheet_write_queue import BufferedSheetWriter
+from utils.cube_reloader import load_cube_list
+from utils.decoding import decode_attachment
+
+SUBMISSION_EXTENSIONS = (".txt", ".json")
+# Files are handed to the worker processes in chunks of this many, with at most
+# CHUNKS_PER_WORKER chunks per worker read in and waiting at once.
+CHUNK_SIZE = 16
+CHUNKS_PER_WORKER = 2
+
+def iter_submission_files(path: str):
+    """Yields (file name, modification time, contents) for every deck or draft log
+    in a directory or a zip/tar archive."""
+    if os.path.isdir(path):
+        for root, _, file_names in os.walk(path):
+            for file_name in sorted(file_names):
+                if file_name.lower().endswith(SUBMISSION_EXTENSIONS):
+                    file_path = os.path.join(root, file_name)
+                    with open(file_path, 'rb') as submission_file:
+                        yield file_path, os.path.getmtime(file_path), submission_file.read()
+    elif zipfile.is_zipfile(path):
+        with zipfile.ZipFile(path) as archive:
+            for info in archive.infolist():
+                if info.filename.lower().endswith(SUBMISSION_EXTENSIONS):
+                    yield info.filename, time.mktime(info.date_time + (0, 0, -1)), \
+                        archive.read(info)
+    elif tarfile.is_tarfile(path):
+        with tarfile.open(path) as archive:
+            for member in archive:
+                if member.isfile() and member.name.lower().endswith(SUBMISSION_EXTENSIONS):
+                    yield member.name, member.mtime, archive.extractfile(member).read()
+    else:
+        raise ValueError(f"{path} is not a directory or a zip/tar archive.")
+
+WORKER_CUBE_LIST = None
+
+def init_worker(cube_file_path: str):
+    """Loads the cube list once in each worker process."""
+    global WORKER_CUBE_LIST  # pylint: disable=global-statement
+    WORKER_CUBE_LIST = load_cube_list(cube_file_path)
+
+def process_submission(file_name: str, mtime: float, contents: bytes, user: str):
+    """Parses and matches one submission in a worker process. Returns
+    (file name, DraftData.to_json() or None, candidate cube names, error message or None).
+    Card IDs are per-process, so the submission is passed back by card name."""
+    try:
+        text = decode_attachment(contents).text
+        if not text:
+            return file_name, None, [], "File is empty."
+        data = DraftData.create(text, user, datetime.datetime.fromtimestamp(mtime))
+        candidate_cubes = data.match_cubes(WORKER_CUBE_LIST)  # May correct card names.
+        return file_name, data.to_json(), candidate_cubes, None
+    except DraftDataParseError as ex:
+        return file_name, None, [], ex.message
+    except Exception as ex:  # pylint: disable=broad-except
+        # A malformed file can fail in any number of ways; report it and carry on.
+        return file_name, None, [], repr(ex)
+
+def process_chunk(chunk, user: str):
+    """Runs process_submission over a list of (file name, mtime, contents)."""
+    return [process_submission(file_name, mtime, contents, user)
+            for file_name, mtime, contents in chunk]
+
+def iter_chunks(iterable, size: int):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def map_bounded(executor, function, iterable, window: int):
+    """Like executor.map, but only reads ahead `window` items of the iterable, so a large
+    input isn't read into memory (and pickled) before the first result comes back.
+    Yields results in order."""
+    pending = deque()
+    for item in iterable:
+        if len(pending) >= window:
+            yield pending.popleft().result()
+        pending.append(executor.submit(function, item))
+    while pending:
+        yield pending.popleft().result()
+
+def backfill(submissions_path: str, saver, report_path: str,
+             cube_file_path: str = "config/cubes.json", workers: int = None,
+             user: str = "Backfill"):
+    """Parses, matches and saves every submission under submissions_path.
+    Returns a dict of counts and timings."""
+    start = time.perf_counter()
+    cube_list = load_cube_list(cube_file_path)
+    writer = BufferedSheetWriter(saver)
+    counts = {"files": 0, "saved": 0, "unmatched": 0, "ambiguous": 0, "errors": 0}
+    with open(report_path, 'w', newline='', encoding='utf-8') as report_file, \
+            ProcessPoolExecutor(max_workers=workers, initializer=init_worker,
+                                initargs=(cube_file_path,)) as executor:
+        report = csv.writer(report_file)
+        report.writerow(["file", "problem", "candidate cubes"])
+        chunks = iter_chunks(iter_submission_files(submissions_path), CHUNK_SIZE)
+        results = map_bounded(executor, functools.partial(process_chunk, user=user), chunks,
+                              CHUNKS_PER_WORKER * (workers or os.cpu_count() or 1))
+        for chunk_results in results:
+            for file_name, data, candidate_cubes, error in chunk_results:
+                counts["files"] += 1
+                if error:
+                    counts["errors"] += 1
+                    report.writerow([file_name, error, ""])
+                elif len(candidate_cubes) == 1:
+                    counts["saved"] += 1
+                    DraftData.from_json(data).save_to_spreadsheet(
+                        writer, cube_list[candidate_cubes[0]])
+                else:
+                    problem = "unmatched" if not candidate_cubes else "ambiguous"
+                    counts[problem] += 1
+                    report.writerow([file_name, problem, ";".join(candidate_cubes)])
+    parsed = time.perf_counter()
+    writer.flush()
+    finished = time.perf_counter()
+    counts["parse_seconds"] = parsed - start
+    counts["write_seconds"] = finished - parsed
+    counts["files_per_second"] = counts["files"] / (finished - start) if finished > start else 0
+    return counts
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("submissions", help="directory, .zip or .tar archive of submissions")
+    sink = parser.add_mutually_exclusive_group(required=True)
+    sink.add_argument("--csv", metavar="OUTPUT_DIR", help="write rows to CSV files here")
+    sink.add_argument("--sheets", action="store_true", help="write rows to the Google Sheets")
+    parser.add_argument("--cubes", default="config/cubes.json", help="cube list to match against")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes")
+    parser.add_argument("--user", default="Backfill", help="submitter name for decklists")
+    args = parser.parse_args(argv)
+
+    if args.csv:
+        from save_to_csv import CsvDraftDataSaver  # pylint: disable=import-outside-toplevel
+        saver = CsvDraftDataSaver(args.csv)
+        report_path = os.path.join(args.csv, "unmatched.csv")
+    else:
+        from save_to_google_sheet import GoogleDraftDataSaver  # pylint: disable=import-outside-toplevel
+        saver = GoogleDraftDataSaver()
+        report_path = "unmatched.csv"
+
+    counts = backfill(args.submissions, saver, report_path, args.cubes, args.workers, args.user)
+    print(f"{counts['files']} files: {counts['saved']} saved, {counts['unmatched']} unmatched, "
+          f"{counts['ambiguous']} ambiguous, {counts['errors']} errors.")
+    print(f"Parsed and matched in {counts['parse_seconds']:.2f} s, "
+          f"wrote in {counts['write_seconds']:.2f} s "
+          f"({counts['files_per_second']:.1f} files/s).")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,33 @@
+"""Prints the best or worst cards in a cube from the analytics database's running totals.
+
+Usage (from the repository root):
+    python -m utils.card_stats DATABASE CUBE [--statistic maindeck_rate|average_pick|wins]
+                               [--bottom] [--limit N] [--min-samples N]
+"""
+import argparse
+
+from save_to_sqlite import SQLiteDraftDataSaver, CARD_STATISTICS
+
+def format_card_statistics(rows, statistic: str):
+    """Formats card_statistics rows as one line per card."""
+    value_format = "{:.1%}" if statistic == "maindeck_rate" else "{:.2f}"
+    return "\n".join(f"{position:3}. {name}: {value_format.format(value)} (n={samples})"
+                     for position, (name, value, samples) in enumerate(rows, start=1))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("database", help="the bot's ANALYTICS_DB file")
+    parser.add_argument("cube", help="cube name")
+    parser.add_argument("--statistic", choices=sorted(CARD_STATISTICS), default="maindeck_rate")
+    parser.add_argument("--bottom", action="store_true", help="show the worst cards instead")
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--min-samples", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    store = SQLiteDraftDataSaver(args.database)
+    rows = store.card_statistics(args.cube, args.statistic, args.limit, args.bottom,
+                                 args.min_samples)
+    print(format_card_statistics(rows, args.statistic) or f"No statistics for {args.cube}.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""Loading and reloading the cube list while the bot is running."""
+import os
+import json
+import time
+
+from models.cubelist import CubeList
+from utils.cube_snapshot import load_snapshot
+
+# Optional {submitted name: cube card name} aliases, read from beside cubes.json.
+CARD_ALIASES_FILE_NAME = "card_aliases.json"
+
+def load_cube_list(cube_file_path: str = "config/cubes.json"):
+    """Reads a cubes.json file into a CubeList, with its match index built, along with
+    any card_aliases.json in the same directory. If the file has an up-to-date binary
+    snapshot (see utils.cube_snapshot), the cubes are loaded from that instead."""
+    with open(cube_file_path, 'rb') as cubes_file:
+        json_bytes = cubes_file.read()
+    cube_list = load_snapshot(cube_file_path, json_bytes)
+    if cube_list is None:
+        cube_list = CubeList.from_json(json.loads(json_bytes))
+    aliases_path = os.path.join(os.path.dirname(cube_file_path), CARD_ALIASES_FILE_NAME)
+    if os.path.exists(aliases_path):
+        with open(aliases_path, 'r', encoding='utf-8') as aliases_file:
+            cube_list.set_card_aliases(json.load(aliases_file))
+    return cube_list
+
+def resident_memory():
+    """Returns the process's resident set size in bytes, or None if it can't be read."""
+    try:
+        with open("/proc/self/statm", 'r') as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+class ReloadStats:
+    """How long a reload took, and how much resident memory it added
+    (None where the platform doesn't expose it)."""
+    def __init__(self, cube_count: int, duration: float, memory_delta):
+        self.cube_count = cube_count
+        self.duration = duration
+        self.memory_delta = memory_delta
+
+    def __str__(self):
+        memory = "unknown" if self.memory_delta is None \
+            else f"{self.memory_delta / (1024 * 1024):+.1f} MiB"
+        return f"Reloaded {self.cube_count} cubes in {self.duration * 1000:.0f} ms " \
+               f"(memory delta {memory})."
+
+class CubeListReloader:
+    """Tracks a cubes.json file and builds a fresh CubeList when asked or when it changes.
+
+    reload() does all the work and is meant to run in an executor thread; the caller then
+    swaps the returned CubeList in with a single assignment. Code that's matching against
+    the old CubeList keeps its reference, so it finishes against a consistent snapshot."""
+    def __init__(self, cube_file_path: str = "config/cubes.json"):
+        self.cube_file_path = cube_file_path
+        self.loaded_mtime = None
+
+    def current_mtime(self):
+        """The file's modification time, or None if it doesn't exist."""
+        try:
+            return os.stat(self.cube_file_path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def has_changed(self):
+        """Has the file changed since it was last loaded?"""
+        mtime = self.current_mtime()
+        return mtime is not None and mtime != self.loaded_mtime
+
+    def reload(self):
+        """Loads the cube list. Returns (CubeList, ReloadStats)."""
+        memory_before = resident_memory()
+        start = time.perf_counter()
+        mtime = self.current_mtime()
+        cube_list = load_cube_list(self.cube_file_path)
+        # Build the near-miss name index here too, rather than on the first submission.
+        cube_list.name_index  # pylint: disable=pointless-statement
+        duration = time.perf_counter() - start
+        memory_after = resident_memory()
+        self.loaded_mtime = mtime
+        memory_delta = None if memory_before is None or memory_after is None \
+            else memory_after - memory_before
+        return cube_list, ReloadStats(len(cube_list), duration, memory_delta)
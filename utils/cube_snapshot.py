@@ -0,0 +1,125 @@
+"""A compiled binary snapshot of cubes.json, which loads without parsing JSON card lists
+or looking up every card name once per cube.
+
+Usage (from the repository root), to (re)build the snapshot for a cube list:
+    python -m utils.cube_snapshot [config/cubes.json]
+
+The snapshot sits next to the cube list (see snapshot_path) and holds, in order:
+    MAGIC
+    the SHA-256 of the cubes.json it was built from (32 bytes)
+    the length of the header (4 bytes, little-endian) and the header, as UTF-8 JSON:
+        {"cubes": [{"name", "cube_cobra_id", "submission_info", "count"}, ...],
+         "card_table_length": bytes}
+    the card table: every distinct card name, UTF-8, separated by newlines
+    each cube's cards as sorted, distinct indexes into the card table
+        (4-byte little-endian unsigned ints, "count" of them per cube, in header order)
+It's only used while the checksum matches the current cubes.json; otherwise, the cube list
+is parsed from the JSON as before. Every cube is read in full, because the match index needs
+all of their cards as soon as the list is loaded.
+"""
+import os
+import sys
+import json
+import struct
+import hashlib
+from array import array
+
+from models.carddictionary import CARD_DICTIONARY, CARD_ID_TYPECODE, sorted_ids
+from models.cubelist import Cube, CubeList, CubeSubmissionInfo
+
+MAGIC = b"JDCUBES1"
+HEADER_LENGTH = struct.Struct("<I")
+
+
+def snapshot_path(cube_file_path: str):
+    """Where the snapshot for a cubes.json file is kept."""
+    return os.path.splitext(cube_file_path)[0] + ".snapshot"
+
+
+def _little_endian(ids: array):
+    if sys.byteorder == "big":
+        ids = array(ids.typecode, ids)
+        ids.byteswap()
+    return ids
+
+
+def build_snapshot(cube_list: CubeList, json_bytes: bytes):
+    """Returns the snapshot of a cube list, given the cubes.json contents it matches."""
+    # The card table is in CARD_DICTIONARY ID order (see load_snapshot).
+    all_ids = sorted_ids(card_id for cube in cube_list.values() for card_id in cube.card_ids)
+    table_index = {card_id: i for i, card_id in enumerate(all_ids)}
+    card_table = "\n".join(CARD_DICTIONARY.names_for(all_ids)).encode("utf-8")
+    cubes, arrays = [], []
+    for name, cube in cube_list.items():
+        cubes.append({"name": name, "cube_cobra_id": cube.cube_cobra_id,
+                      "submission_info": vars(cube.submission_info),
+                      "count": len(cube.card_ids)})
+        # cube.card_ids is sorted, and table_index preserves ID order, so this is sorted too.
+        arrays.append(_little_endian(array(CARD_ID_TYPECODE,
+                                           (table_index[card_id] for card_id in cube.card_ids))))
+    header = json.dumps({"cubes": cubes, "card_table_length": len(card_table)}).encode("utf-8")
+    return b"".join([MAGIC, hashlib.sha256(json_bytes).digest(), HEADER_LENGTH.pack(len(header)),
+                     header, card_table] + [ids.tobytes() for ids in arrays])
+
+
+def write_snapshot(cube_list: CubeList, cube_file_path: str, json_bytes: bytes = None):
+    """Writes the snapshot for a cube list next to its cubes.json file
+    (whose contents are read unless given)."""
+    from utils.update_cube_cards import write_atomically  # pylint: disable=import-outside-toplevel
+    if json_bytes is None:
+        with open(cube_file_path, 'rb') as cubes_file:
+            json_bytes = cubes_file.read()
+    write_atomically(snapshot_path(cube_file_path), build_snapshot(cube_list, json_bytes))
+
+
+def load_snapshot(cube_file_path: str, json_bytes: bytes = None):
+    """Loads a cube list from its snapshot, with its match index built. Returns None if
+    there's no snapshot, or it wasn't built from the current cubes.json."""
+    try:
+        with open(snapshot_path(cube_file_path), 'rb') as snapshot_file:
+            snapshot = snapshot_file.read()
+    except FileNotFoundError:
+        return None
+    if json_bytes is None:
+        with open(cube_file_path, 'rb') as cubes_file:
+            json_bytes = cubes_file.read()
+    checksum_end = len(MAGIC) + hashlib.sha256().digest_size
+    if snapshot[:len(MAGIC)] != MAGIC or \
+            snapshot[len(MAGIC):checksum_end] != hashlib.sha256(json_bytes).digest():
+        return None
+    pos = checksum_end + HEADER_LENGTH.size
+    header_length, = HEADER_LENGTH.unpack_from(snapshot, checksum_end)
+    header = json.loads(snapshot[pos:pos + header_length])
+    pos += header_length
+    card_table = snapshot[pos:pos + header["card_table_length"]].decode("utf-8")
+    pos += header["card_table_length"]
+
+    table_ids = CARD_DICTIONARY.ids_for(card_table.split("\n") if card_table else [])
+    # Table order is ID order in the process that built the snapshot. Names new to this
+    # process get increasing IDs in that order, so the cube arrays usually stay sorted.
+    still_sorted = table_ids.tolist() == sorted(table_ids)
+    cubes = {}
+    for cube in header["cubes"]:
+        indexes = array(CARD_ID_TYPECODE)
+        indexes.frombytes(snapshot[pos:pos + cube["count"] * indexes.itemsize])
+        pos += cube["count"] * indexes.itemsize
+        ids = array(CARD_ID_TYPECODE, map(table_ids.__getitem__, _little_endian(indexes)))
+        cubes[cube["name"]] = Cube.from_card_ids(
+            ids if still_sorted else sorted_ids(ids), cube["cube_cobra_id"],
+            CubeSubmissionInfo.from_json(cube["submission_info"]))
+    cube_list = CubeList(cubes)
+    cube_list.rebuild_index()
+    return cube_list
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    cube_file_path = argv[0] if argv else "config/cubes.json"
+    with open(cube_file_path, 'rb') as cubes_file:
+        json_bytes = cubes_file.read()
+    write_snapshot(CubeList.from_json(json.loads(json_bytes)), cube_file_path, json_bytes)
+    print(f"Wrote {snapshot_path(cube_file_path)}.")
+
+
+if __name__ == "__main__":
+    main()
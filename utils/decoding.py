@@ -0,0 +1,35 @@
+"""Turning uploaded attachments into text."""
+import codecs
+from typing import NamedTuple
+
+import chardet
+
+# chardet is pure Python and slow, so when it's needed it only looks at this many bytes.
+CHARDET_SAMPLE_SIZE = 16 * 1024
+
+# The ways decode_attachment can decode a file.
+UTF8, UTF8_BOM, CHARDET = "utf-8", "utf-8-sig", "chardet"
+
+class DecodedAttachment(NamedTuple):
+    """The decoded text, the encoding used, and which path (UTF8, UTF8_BOM or CHARDET)
+    found it."""
+    text: str
+    encoding: str
+    path: str
+
+def decode_attachment(data: bytes, sample_size: int = CHARDET_SAMPLE_SIZE):
+    """Decodes an attachment, trying UTF-8 (with and without a byte order mark) strictly
+    before falling back to running chardet over the first `sample_size` bytes."""
+    if data.startswith(codecs.BOM_UTF8):
+        try:
+            return DecodedAttachment(data.decode("utf-8-sig"), "utf-8-sig", UTF8_BOM)
+        except UnicodeDecodeError:
+            pass
+    else:
+        try:
+            return DecodedAttachment(data.decode("utf-8"), "utf-8", UTF8)
+        except UnicodeDecodeError:
+            pass
+    encoding = chardet.detect(data[:sample_size])["encoding"] or "latin-1"
+    # The sample might not be representative of the whole file, so don't fail on the rest.
+    return DecodedAttachment(data.decode(encoding, errors="replace"), encoding, CHARDET)
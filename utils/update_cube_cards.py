@@ -1,28 +1,135 @@
 """Cube list maintenance utilities."""
+import os
 import json
+import asyncio
+import shutil
+import hashlib
+import tempfile
+
+import aiohttp
 import requests
 from models.cubelist import CubeList, CubeListEncoder
+from utils.cube_snapshot import write_snapshot
+
+CUBE_COBRA_URL = "https://cubecobra.com/cube/download/plaintext/{}"
 
 def update_cube_cards(cube_file_path: str = "config/cubes.json", cube_name: str=None):
     """Updates a given cube list
     with the current contents of the CubeCobra list."""
     with open(cube_file_path, 'r') as cubes_file:
         cube_list = CubeList.from_json(json.load(cubes_file))
-        if cube_name: 
+        if cube_name:
             update_cards_for_cube(cube_list, cube_name)
         else:
             for cube_name in cube_list:
                 update_cards_for_cube(cube_list, cube_name)
 
-    with open(cube_file_path, 'w') as cubes_file:
-        cubes_file.write(json.dumps(cube_list.__dict__["data"],
-                                    cls=CubeListEncoder,
-                                    indent=4, separators=(',', ': ')))
+    write_cube_list(cube_list, cube_file_path)
 
-def update_cards_for_cube(cube_list: CubeList, cube_name: str): 
+def update_cards_for_cube(cube_list: CubeList, cube_name: str):
     if not cube_name in cube_list:
         print(f"Couldn't find list {cube_name}")
         return
     cube_cobra_id = cube_list[cube_name].cube_cobra_id
-    req = requests.get(f"https://cubecobra.com/cube/download/plaintext/{cube_cobra_id}")
-    cube_list[cube_name].cards = req.text.splitlines()
\ No newline at end of file
+    req = requests.get(CUBE_COBRA_URL.format(cube_cobra_id))
+    cube_list[cube_name].cards = req.text.splitlines()
+
+def write_atomically(path: str, contents):
+    """Writes a file (str or bytes) via a temporary file and a rename, so a crash
+    mid-write can't leave a half-written file behind. An existing file keeps its permissions."""
+    directory = os.path.dirname(os.path.abspath(path))
+    file_descriptor, temp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(file_descriptor, 'wb' if isinstance(contents, bytes) else 'w') \
+                as temp_file:
+            temp_file.write(contents)
+            temp_file.flush()
+            os.fsync(temp_file.fileno())
+        if os.path.exists(path):
+            shutil.copymode(path, temp_path)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.remove(temp_path)
+        raise
+
+def write_cube_list(cube_list: CubeList, cube_file_path: str):
+    """Atomically writes a cube list out as a cubes.json file, and its binary snapshot."""
+    # Written as bytes, so the file holds exactly what the snapshot's checksum covers
+    # (text mode would translate newlines on Windows).
+    contents = json.dumps(cube_list.data, cls=CubeListEncoder, indent=4,
+                          separators=(',', ': ')).encode("utf-8")
+    write_atomically(cube_file_path, contents)
+    write_snapshot(cube_list, cube_file_path, contents)
+
+def sync_state_path(cube_file_path: str):
+    """Where sync_cube_cards keeps the ETags and content hashes for a cubes.json file."""
+    return os.path.splitext(cube_file_path)[0] + ".sync.json"
+
+async def sync_cube_cards(cube_file_path: str = "config/cubes.json", cube_name: str = None,
+                          concurrency: int = 8, url_template: str = CUBE_COBRA_URL):
+    """Updates a cube list with the current contents of the CubeCobra lists,
+    fetching every cube concurrently (at most `concurrency` connections at once).
+
+    Each cube's ETag and content hash are kept next to the cube list (see sync_state_path),
+    so unchanged cubes cost a 304 or a hash comparison and are left alone. A cube that can't
+    be fetched is reported and keeps its cards and sync state. The cube list is only
+    rewritten if a cube changed, and then atomically. Returns the names of the cubes
+    that changed."""
+    with open(cube_file_path, 'r') as cubes_file:
+        cube_list = CubeList.from_json(json.load(cubes_file))
+    state_path = sync_state_path(cube_file_path)
+    sync_state = {}
+    if os.path.exists(state_path):
+        with open(state_path, 'r') as state_file:
+            sync_state = json.load(state_file)
+
+    if cube_name:
+        if cube_name not in cube_list:
+            print(f"Couldn't find list {cube_name}")
+            return []
+        cube_names = [cube_name]
+    else:
+        cube_names = list(cube_list)
+
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        fetched = await asyncio.gather(*[
+            fetch_cube_cards(session, url_template.format(cube_list[name].cube_cobra_id),
+                             sync_state.get(name, {}))
+            for name in cube_names], return_exceptions=True)
+
+    changed = []
+    new_sync_state = dict(sync_state)
+    for name, result in zip(cube_names, fetched):
+        if isinstance(result, Exception):
+            print(f"Couldn't fetch the cards for {name}: {result!r}")
+            continue
+        cards, state = result
+        new_sync_state[name] = state
+        if cards is not None:
+            cube_list.set_cube_cards(name, cards)
+            changed.append(name)
+
+    if changed:
+        write_cube_list(cube_list, cube_file_path)
+    if new_sync_state != sync_state:
+        write_atomically(state_path, json.dumps(new_sync_state, indent=4))
+    return changed
+
+async def fetch_cube_cards(session: aiohttp.ClientSession, url: str, state: dict):
+    """Fetches one cube's card list, if it changed since `state` was recorded.
+    Returns (cards, new state), or (None, state) if the cube is unchanged."""
+    headers = {}
+    if state.get("etag"):
+        headers["If-None-Match"] = state["etag"]
+    async with session.get(url, headers=headers) as response:
+        if response.status == 304:
+            return None, state
+        response.raise_for_status()
+        text = await response.text()
+        etag = response.headers.get("ETag")
+    content_hash = hashlib.sha256(text.encode("utf-8")).hexdigest()
+    new_state = {"etag": etag, "content_hash": content_hash}
+    if content_hash == state.get("content_hash"):
+        return None, new_state
+    return text.splitlines(), new_state